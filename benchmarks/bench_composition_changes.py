@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark the composition change detection over multi-year ranges.
+
+Compares the former per-day set comparison loop with `compute_composition_changes` on synthetic
+constituents (best of --repeat runs per range). With --db, also times the dashboard path on a
+copy of the DB in a temporary dir, where the constituents are first computed if it has none:
+reconstructing the compositions and diffing them vs reading the persisted changes.
+
+    python benchmarks/bench_composition_changes.py --years 1 5 20 --db /path/to/equiwix.db
+"""
+
+import argparse
+
+# First, as it puts the equiwix sources on the path
+from synthetic_market import compute_constituents, copy_db, temp_dir, timed
+
+import numpy as np
+import pandas as pd
+
+from equiwix.index_engine.composition_changes import compute_composition_changes
+
+
+def getargs():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--years", type=int, nargs='+', default=[1, 5, 20], help="Range lengths.")
+    parser.add_argument("--num-stocks", type=int, default=500, help="Constituents per day.")
+    parser.add_argument("--univ-size", type=int, default=2000, help="Tickers in the universe.")
+    parser.add_argument(
+        "--change-prob", type=float, default=0.2, help="Probability of a replacement per day."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs.")
+    parser.add_argument("--db", type=str, help="Path of the sqlite DB to copy and benchmark.")
+    return parser.parse_args()
+
+
+def make_constituents(num_years, num_stocks, univ_size, change_prob, seed=0):
+    """Return a Series of ticker lists per business day, with one replacement on some days."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2024-12-31', periods=252 * num_years)
+    univ = np.array([f'T{i:05d}' for i in range(univ_size)], dtype=object)
+
+    members = rng.choice(univ_size, num_stocks, replace=False)
+    compositions = []
+    for _ in dates:
+        if rng.random() < change_prob:
+            candidate = rng.integers(univ_size)
+            if candidate not in members:
+                members = members.copy()
+                members[rng.integers(num_stocks)] = candidate
+        compositions.append(list(univ[members]))
+
+    return pd.Series(compositions, index=dates)
+
+
+def loop_change_dates(constituents):
+    """Former `detect_composition_changes`: dates only."""
+    change_dates = []
+    prev = None
+    for date, tickers in constituents.items():
+        if prev is not None and set(tickers) != set(prev):
+            change_dates.append(date)
+        prev = tickers
+    return change_dates
+
+
+def loop_changes(constituents):
+    """Per-day set differences producing the same added/removed rows as the engine."""
+    rows = []
+    prev = None
+    for date, tickers in constituents.items():
+        tickers = set(tickers)
+        if prev is not None:
+            rows.extend((date, ticker, 'add') for ticker in tickers - prev)
+            rows.extend((date, ticker, 'remove') for ticker in prev - tickers)
+        prev = tickers
+    return rows
+
+
+def bench_synthetic(args):
+    print(f'{"years":>6}{"days":>8}{"changes":>9}{"loop dates s":>14}{"loop diff s":>13}'
+          f'{"engine s":>10}')
+    for num_years in args.years:
+        constituents = make_constituents(
+            num_years, args.num_stocks, args.univ_size, args.change_prob
+        )
+        loop_dates_times, _ = timed(lambda: loop_change_dates(constituents), args.repeat)
+        loop_times, rows = timed(lambda: loop_changes(constituents), args.repeat)
+        engine_times, changes = timed(
+            lambda: compute_composition_changes(constituents), args.repeat
+        )
+        assert len(rows) == len(changes)
+
+        print(f'{num_years:>6}{len(constituents):>8}{len(changes):>9}'
+              f'{min(loop_dates_times):>14.3f}{min(loop_times):>13.3f}{min(engine_times):>10.3f}')
+
+
+def bench_db(args):
+    # Imported once the DB path is set
+    from equiwix.index_engine.selectors import (IndexCompositionChangesDateSelector,
+                                                IndexConstituentsDateSelector)
+
+    compute_constituents()
+
+    def recompute():
+        selector = IndexConstituentsDateSelector('yfinance', cache=None)
+        return compute_composition_changes(selector.select())
+
+    def persisted():
+        return IndexCompositionChangesDateSelector('yfinance', cache=None).select()
+
+    recompute_times, changes = timed(recompute, args.repeat)
+    persisted_times, persisted_changes = timed(persisted, args.repeat)
+    assert len(changes) == len(persisted_changes)
+
+    print(f'\nDB full history, {len(changes)} changes')
+    print(f'{"reconstruct + diff":<20}{min(recompute_times):>8.3f} s')
+    print(f'{"persisted changes":<20}{min(persisted_times):>8.3f} s')
+
+
+def main():
+    args = getargs()
+    bench_synthetic(args)
+    if args.db:
+        with temp_dir('equiwix_bench_composition_changes_') as work_dir:
+            copy_db(work_dir, args.db)
+            bench_db(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark the interval encoding of the index constituents against their per-day rows.
+
+On a copy of the DB (the equiwix one or --db) in a temporary dir, where the constituents are first
+computed if it has none, `index_constituents` (one row per constituent per day) and
+`index_constituent_interval` (one row per membership period) are compared: their rows and on-disk
+size (tables and indexes, from the dbstat virtual table), and the time (best of --repeat) to read
+the compositions of the last date and of the whole range from either table, and through
+`IndexConstituentsDateSelector`, which reconstructs them from the intervals.
+
+    python benchmarks/bench_constituent_intervals.py --db /path/to/equiwix.db
+"""
+
+import argparse
+
+# First, as it puts the equiwix sources on the path
+from synthetic_market import best_time, compute_constituents, copy_db, temp_dir
+
+import pandas as pd
+from sqlalchemy import func, select
+
+from equiwix.db import get_session
+from equiwix.db.tables import IndexConstituentInterval, IndexConstituents
+from equiwix.index_engine.constants import DEFAULT_INDEX
+
+SOURCE = 'yfinance'
+
+
+def getargs():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", type=str, help="Path of the sqlite DB to copy.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per read.")
+    return parser.parse_args()
+
+
+def get_storage(table):
+    """Return the number of rows of `table` and the bytes of its b-trees (table and indexes)."""
+    session = get_session()
+    num_rows = session.execute(select(func.count()).select_from(table)).scalar()
+    num_bytes = session.connection().exec_driver_sql(
+        'SELECT sum(pgsize) FROM dbstat WHERE name IN '
+        '(SELECT name FROM sqlite_master WHERE tbl_name = ?)',
+        (table.__tablename__,),
+    ).scalar()
+    session.close()
+    return num_rows, num_bytes
+
+
+def read_daily_rows(dates):
+    """Read the constituents of `dates` from the per-day rows."""
+    tbl = IndexConstituents
+    session = get_session()
+    qry = select(tbl.date, tbl.ticker_id).where(
+        tbl.source == SOURCE,
+        tbl.index_name == DEFAULT_INDEX,
+        tbl.date.between(dates[0], dates[-1]),
+    )
+    df = pd.DataFrame(session.execute(qry).all(), columns=['date', 'ticker_id'])
+    session.close()
+    return df
+
+
+def main():
+    args = getargs()
+
+    with temp_dir('equiwix_bench_constituent_intervals_') as work_dir:
+        copy_db(work_dir, args.db)
+
+        # Imported once the DB path is set
+        from equiwix.index_engine.constituent_intervals import IndexConstituentIntervalDAO
+        from equiwix.index_engine.selectors import IndexConstituentsDateSelector
+
+        days = compute_constituents()
+
+        print(f'{"layout":<28}{"rows":>10}{"KiB":>10}')
+        for table in (IndexConstituents, IndexConstituentInterval):
+            num_rows, num_bytes = get_storage(table)
+            print(f'{table.__tablename__:<28}{num_rows:>10}{num_bytes / 1024:>10.0f}')
+
+        interval_dao = IndexConstituentIntervalDAO(SOURCE)
+        selector = IndexConstituentsDateSelector(SOURCE, cache=None)
+
+        def read_intervals(dates):
+            session = get_session()
+            interval_dao.get_constituents(session, dates)
+            session.close()
+
+        # The constituents are dated from the day after the first market cap
+        session = get_session()
+        first_date, last_date = interval_dao.get_coverage(session)
+        session.close()
+        ranges = {
+            'last date': [last_date],
+            'whole range': [day for day in days if first_date <= day <= last_date],
+        }
+        reads = {
+            'per-day rows': read_daily_rows,
+            'intervals': read_intervals,
+            'selector': lambda dates: selector.select(f'{dates[0]}:{dates[-1]}'),
+        }
+        print(f'\n{"read":<28}' + ''.join(f'{name + " s":>16}' for name in ranges))
+        for name, read in reads.items():
+            times = [best_time(lambda: read(dates), args.repeat) for dates in ranges.values()]
+            print(f'{name:<28}' + ''.join(f'{t:>16.3f}' for t in times))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark the date filters of the index computers and selectors with and without their indexes.
+
+On a copy of the DB (the equiwix one or --db) in a temporary dir, the select queries of the SQL
+constituents and levels computers (daily and historical runs, without writing their rows) and a
+month of the level selector are timed (best of --repeat) with the indexes on the materialized
+`date` columns, then after dropping them. The constituents and levels are first computed in the
+copy if it has none. A point lookup filtering on the `date` column is also compared with the same
+filter on `date(datetime_utc)`, as the queries were written before the column, which no index can
+serve. The query plans are printed with --plans.
+
+    python benchmarks/bench_date_filters.py --db /path/to/equiwix.db --plans
+"""
+
+import argparse
+
+# First, as it puts the equiwix sources on the path
+from synthetic_market import best_time, copy_db, get_days, temp_dir
+
+import numpy as np
+from sqlalchemy import func as F
+from sqlalchemy import select
+
+from equiwix.db import atomic_session, dispose_engines, get_session
+from equiwix.db.tables import IndexConstituents, IndexLevel, YFinanceTickerData
+
+# Indexes serving the date filters, see `equiwix.db.tables`
+DATE_INDEXES = [
+    index for table in (YFinanceTickerData, IndexLevel) for index in table.__table__.indexes
+]
+
+
+def getargs():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", type=str, help="Path of the sqlite DB to copy.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per query.")
+    parser.add_argument("--plans", action="store_true", help="Print the query plans.")
+    return parser.parse_args()
+
+
+def execute(qry):
+    session = get_session()
+    rows = session.execute(qry).all()
+    session.close()
+    return rows
+
+
+def count(table):
+    return execute(select(F.count()).select_from(table))[0][0]
+
+
+def get_plan(qry):
+    """Return the lines of the EXPLAIN QUERY PLAN of `qry`."""
+    session = get_session()
+    conn = session.connection()
+    compiled = qry.compile(dialect=conn.dialect)
+    # Numpy scalars, e.g. the divisor, can't be bound by sqlite3
+    params = tuple(
+        value.item() if isinstance(value, np.generic) else value
+        for value in (compiled.params[name] for name in compiled.positiontup)
+    )
+    plan = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).all()
+    session.close()
+    return [detail for _, _, _, detail in plan]
+
+
+def get_queries(days):
+    """Return the benchmarked queries as a dict of name -> (select query or None, run)."""
+    # Imported once the DB path is set
+    from equiwix.index_engine.selectors import IndexLevelDateSelector
+    from equiwix.index_engine.yfinance_computer import (YFinanceIndexConstituentsComputer,
+                                                        YFinanceIndexLevelComputer)
+
+    start_date, end_date = days[0], days[-1]
+    month_start = days[-21]
+
+    def computer_query(computer_cls, start):
+        return computer_cls(end_date, start).get_select_query()
+
+    queries = {
+        'date column point lookup': select(F.count()).where(YFinanceTickerData.date == end_date),
+        'date(datetime_utc) point lookup': select(F.count()).where(
+            F.date(YFinanceTickerData.datetime_utc) == end_date
+        ),
+        'constituents daily': computer_query(YFinanceIndexConstituentsComputer, end_date),
+        'levels daily': computer_query(YFinanceIndexLevelComputer, end_date),
+        'levels historical': computer_query(YFinanceIndexLevelComputer, start_date),
+    }
+    selector = IndexLevelDateSelector('yfinance', cache=None)
+    runs = {name: (qry, lambda qry=qry: execute(qry)) for name, qry in queries.items()}
+    runs['level selector, 1 month'] = (None, lambda: selector.select(f'{month_start}:{end_date}'))
+    return runs
+
+
+def bench(queries, args):
+    """Return the best time of each query, printing their plans with --plans."""
+    times = {}
+    for name, (qry, run) in queries.items():
+        if args.plans and qry is not None:
+            print(f'  {name}:')
+            for detail in get_plan(qry):
+                print(f'    {detail}')
+        times[name] = best_time(run, args.repeat)
+    return times
+
+
+def main():
+    args = getargs()
+
+    with temp_dir('equiwix_bench_date_filters_') as work_dir:
+        copy_db(work_dir, args.db)
+
+        # Imported once the DB path is set
+        from equiwix.index_engine.yfinance_computer import (YFinanceIndexConstituentsComputer,
+                                                            YFinanceIndexLevelComputer)
+
+        days = get_days()
+        print(f'{count(YFinanceTickerData)} rows of ticker data over {len(days)} days')
+
+        # The levels queries join the constituents, and the level selector reads the levels
+        if count(IndexConstituents) == 0:
+            YFinanceIndexConstituentsComputer(days[-1], days[0]).sync()
+        if count(IndexLevel) == 0:
+            YFinanceIndexLevelComputer(days[-1], days[0]).sync()
+        queries = get_queries(days)
+
+        if args.plans:
+            print('with the date indexes')
+        indexed = bench(queries, args)
+
+        with atomic_session() as session:
+            for index in DATE_INDEXES:
+                index.drop(session.connection())
+        # The statement caches of the pooled connections would return the plans with the indexes
+        dispose_engines()
+        if args.plans:
+            print('without the date indexes')
+        not_indexed = bench(queries, args)
+
+        print(f'{"query":<34}{"indexed s":>12}{"not indexed s":>16}')
+        for name in queries:
+            print(f'{name:<34}{indexed[name]:>12.3f}{not_indexed[name]:>16.3f}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-query overhead of the DB sessions and the effect of the SQLite pragmas.
+
+On a copy of the DB (the equiwix one or --db) in a temporary dir, times --queries small queries
+(get_session and fetch_query_results of the ticker universe) through the cached engine and
+session factory versus a new engine per query, as equiwix did before they were cached. The
+pragmas of `SQLITE_PRAGMAS` are then compared with the SQLite defaults on a second copy in
+rollback journal mode, for a full scan of the ticker data and for --commits small write
+transactions.
+
+    python benchmarks/bench_db_overhead.py --db /path/to/equiwix.db
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import time
+
+# First, as it puts the equiwix sources on the path
+from synthetic_market import best_time, copy_db, temp_dir
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from equiwix.db import fetch_query_results, get_session
+from equiwix.db.tables import TickerUniverse, YFinanceTickerData
+from equiwix.db.util import get_db_uri, get_engine
+
+
+def getargs():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", type=str, help="Path of the sqlite DB to copy.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of timed small queries.")
+    parser.add_argument("--commits", type=int, default=200, help="Number of timed commits.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed full scans.")
+    return parser.parse_args()
+
+
+def universe_query(session):
+    return session.query(TickerUniverse.univ, TickerUniverse.ticker_id)
+
+
+def scan_query(session):
+    tbl = YFinanceTickerData
+    return session.query(tbl.ticker_id, tbl.datetime_utc, tbl.close, tbl.num_shares_outstanding)
+
+
+def query_cached():
+    session = get_session()
+    fetch_query_results(session, universe_query(session))
+    session.close()
+
+
+def query_new_engine():
+    engine = create_engine(get_db_uri())
+    session = Session(bind=engine)
+    fetch_query_results(session, universe_query(session))
+    session.close()
+    engine.dispose()
+
+
+def mean_ms(fn, num_calls):
+    start = time.perf_counter()
+    for _ in range(num_calls):
+        fn()
+    return (time.perf_counter() - start) / num_calls * 1000
+
+
+def bench_pragmas(engine, args):
+    """Return the best full scan time and the mean commit time (in ms) with `engine`."""
+
+    def scan():
+        with Session(bind=engine) as session:
+            fetch_query_results(session, scan_query(session))
+
+    def commit():
+        with Session(bind=engine) as session:
+            session.connection().exec_driver_sql('INSERT INTO bench_commit VALUES (1)')
+            session.commit()
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE bench_commit (n INTEGER)')
+    return best_time(scan, args.repeat), mean_ms(commit, args.commits)
+
+
+def main():
+    args = getargs()
+
+    with temp_dir('equiwix_bench_db_overhead_') as work_dir:
+        db_path = copy_db(work_dir, args.db)
+        default_db_path = os.path.join(work_dir, 'default.db')
+        # WAL is persistent, so the defaults are measured on a copy in rollback journal mode
+        shutil.copy(db_path, default_db_path)
+        with sqlite3.connect(default_db_path) as conn:
+            conn.execute('PRAGMA journal_mode=DELETE')
+
+        # Warm up the OS cache and the imports
+        query_cached()
+        query_new_engine()
+        print(f'{"query":<28}{"ms/query":>10}')
+        print(f'{"cached engine and session":<28}{mean_ms(query_cached, args.queries):>10.2f}')
+        print(f'{"new engine per query":<28}{mean_ms(query_new_engine, args.queries):>10.2f}')
+
+        engines = {
+            'SQLITE_PRAGMAS': get_engine(),
+            'sqlite defaults': create_engine(f'sqlite:///{default_db_path}'),
+        }
+        print(f'\n{"pragmas":<28}{"scan s":>10}{"ms/commit":>10}')
+        for name, engine in engines.items():
+            scan_s, commit_ms = bench_pragmas(engine, args)
+            print(f'{name:<28}{scan_s:>10.3f}{commit_ms:>10.2f}')
+
+
+if __name__ == "__main__":
+    main()
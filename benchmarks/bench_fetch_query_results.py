@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark `fetch_query_results` on the full `yfinance_ticker_data` table.
+
+Times every loading variant (best of --repeat runs, reported per million rows) and measures its
+peak traced memory in a separate run.
+
+    python benchmarks/bench_fetch_query_results.py --db /path/to/equiwix.db
+"""
+
+import argparse
+import os
+import tracemalloc
+
+# First, as it puts the equiwix sources on the path
+from synthetic_market import timed
+
+from equiwix.db.util import DB_PATH_ENV_VAR
+
+# Keyword arguments of fetch_query_results per variant
+VARIANTS = {
+    'default': {},
+    'categorical': {'categorical': ['ticker']},
+    'pyarrow': {'dtype_backend': 'pyarrow', 'categorical': ['ticker']},
+    'columns': {'columns': ['ticker', 'datetime_utc', 'close']},
+    'chunked': {'chunksize': 100_000},
+}
+
+
+def getargs():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", type=str, help="Path of the sqlite DB to read from.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per variant.")
+    parser.add_argument(
+        "--variants", nargs='+', choices=list(VARIANTS), default=list(VARIANTS), help="Variants."
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = getargs()
+    if args.db:
+        os.environ[DB_PATH_ENV_VAR] = args.db
+
+    from equiwix.db import fetch_query_results, get_session
+    from equiwix.db.tables import Ticker
+    from equiwix.db.tables import YFinanceTickerData as tbl
+
+    session = get_session()
+    qry = session.query(
+        Ticker.ticker,
+        tbl.datetime_utc,
+        tbl.open,
+        tbl.high,
+        tbl.low,
+        tbl.close,
+        tbl.num_shares_outstanding,
+    ).join(Ticker, Ticker.ticker_id == tbl.ticker_id)
+
+    def load(kwargs):
+        result = fetch_query_results(session, qry, parse_dates=['datetime_utc'], **kwargs)
+        if 'chunksize' not in kwargs:
+            return len(result)
+        # Consume the chunks one at a time as a streaming caller would
+        return sum(len(chunk) for chunk in result)
+
+    print(f'{"variant":<14}{"rows":>10}{"s / 1M rows":>14}{"peak MiB":>10}')
+    for name in args.variants:
+        kwargs = VARIANTS[name]
+        times, num_rows = timed(lambda: load(kwargs), args.repeat)
+
+        tracemalloc.start()
+        load(kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        per_million = min(times) / num_rows * 1e6
+        print(f'{name:<14}{num_rows:>10}{per_million:>14.3f}{peak / 2**20:>10.1f}')
+
+    session.close()
+
+
+if __name__ == '__main__':
+    main()
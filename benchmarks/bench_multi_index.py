@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark computing K indexes in one ranking pass vs K separate runs.
+
+Indexes of --sizes constituents are registered, and their constituents are computed by the SQL
+and NumPy engines over the range, all at once and one index per run (best of --repeat runs). The
+NumPy engine also computes the levels from the constituents in memory. Nothing is written to the
+DB (`EQUIWIX_DB_PATH` or --db).
+
+    python benchmarks/bench_multi_index.py --db /path/to/equiwix.db --sizes 50 100 250
+"""
+
+import argparse
+import os
+
+# First, as it puts the equiwix sources on the path
+from synthetic_market import timed
+
+import pandas as pd
+
+from equiwix.db.util import DB_PATH_ENV_VAR
+from equiwix.index_engine.definitions import IndexDefinition, register_index
+from equiwix.util import EQUIWIX_END_OF_TIME, EQUIWIX_START_OF_TIME
+
+
+def getargs():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", type=str, help="Path of the sqlite DB to read the prices from.")
+    parser.add_argument("--start", type=str, default='2023-01-01', help="First date of the range.")
+    parser.add_argument("--end", type=str, default='2024-12-31', help="Last date of the range.")
+    parser.add_argument(
+        "--sizes", type=int, nargs='+', default=[50, 100, 250], help="Constituents per index."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs.")
+    return parser.parse_args()
+
+
+def main():
+    args = getargs()
+    if args.db:
+        os.environ[DB_PATH_ENV_VAR] = args.db
+
+    # Imported once the DB path is set
+    from equiwix.index_engine.numpy_computer import YFinanceNumpyIndexEngine, read_frame
+    from equiwix.index_engine.yfinance_computer import YFinanceIndexConstituentsComputer
+
+    definitions = [register_index(IndexDefinition(f'bench{size}', size)) for size in args.sizes]
+    index_names = [definition.name for definition in definitions]
+
+    def sql_constituents(names):
+        computer = YFinanceIndexConstituentsComputer(args.end, args.start, index_names=names)
+        return read_frame(computer.get_select_query())
+
+    def numpy_run(index_definitions):
+        engine = YFinanceNumpyIndexEngine(args.start, args.end, index_definitions)
+        constituents = engine.compute_constituents()
+        timeline = pd.DataFrame(
+            {
+                'start_date': [str(EQUIWIX_START_OF_TIME)],
+                'end_date': [str(EQUIWIX_END_OF_TIME)],
+                'divisor': [1.0],
+            }
+        )
+        timelines = {definition.name: timeline for definition in index_definitions}
+        return constituents, engine.compute_levels(constituents, timelines)
+
+    runs = {
+        'sql constituents': (
+            lambda: sql_constituents(index_names),
+            lambda: pd.concat([sql_constituents([name]) for name in index_names]),
+        ),
+        'numpy constituents + levels': (
+            lambda: numpy_run(definitions)[0],
+            lambda: pd.concat([numpy_run([definition])[0] for definition in definitions]),
+        ),
+    }
+
+    print(f'{len(definitions)} indexes of {args.sizes} constituents, {args.start} to {args.end}')
+    print(f'{"engine":<30}{"rows":>10}{"at once (s)":>13}{"separate (s)":>14}{"speedup":>9}')
+    for name, (at_once, separate) in runs.items():
+        at_once_times, at_once_rows = timed(at_once, args.repeat)
+        separate_times, separate_rows = timed(separate, args.repeat)
+        at_once_time, separate_time = min(at_once_times), min(separate_times)
+        assert len(at_once_rows) == len(separate_rows)
+        print(f'{name:<30}{len(at_once_rows):>10}{at_once_time:>13.3f}{separate_time:>14.3f}'
+              f'{separate_time / at_once_time:>8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
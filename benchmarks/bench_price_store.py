@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark full-history and range scans of the ticker price history: SQLite vs the Parquet store.
+
+The `yfinance_ticker_data` rows of the DB (`EQUIWIX_DB_PATH` or --db) are first exported to a
+Parquet store in a temporary dir (or --parquet-path), then every scan is timed --repeat times.
+
+    python benchmarks/bench_price_store.py --db /path/to/equiwix.db
+"""
+
+import argparse
+import os
+
+# First, as it puts the equiwix sources on the path
+from synthetic_market import best_time, temp_dir, timed
+
+import pandas as pd
+from sqlalchemy import func, select
+
+from equiwix.db.tables import Ticker, YFinanceTickerData
+from equiwix.db.util import DB_PATH_ENV_VAR, get_engine
+
+SCAN_COLUMNS = ['ticker', 'date', 'close', 'num_shares_outstanding']
+
+
+def getargs():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", type=str, help="Path of the sqlite DB to read the prices from.")
+    parser.add_argument("--parquet-path", type=str, help="Root dir of the Parquet store.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per scan.")
+    return parser.parse_args()
+
+
+def export_to_parquet(store, chunk_size=200_000):
+    engine = get_engine()
+    tbl = YFinanceTickerData
+    qry = select(
+        *[Ticker.ticker if col == 'ticker' else getattr(tbl, col) for col in store.columns]
+    ).join(Ticker, Ticker.ticker_id == tbl.ticker_id)
+    for chunk in pd.read_sql(qry, engine, chunksize=chunk_size):
+        store.write(chunk)
+    store.compact()
+
+
+def main():
+    args = getargs()
+    if args.db:
+        os.environ[DB_PATH_ENV_VAR] = args.db
+
+    # Imported once the DB path is set
+    from equiwix.data_ingestion.parquet_store import ParquetPriceStore
+    from equiwix.index_engine.numpy_computer import read_frame
+
+    # The store is written into the temporary dir unless --parquet-path is given
+    with temp_dir('equiwix_parquet_') as work_dir:
+        store = ParquetPriceStore(args.parquet_path or work_dir)
+
+        export_time = best_time(lambda: export_to_parquet(store), 1)
+        parquet_bytes = sum(
+            os.path.getsize(os.path.join(root, f))
+            for root, _, files in os.walk(store.root)
+            for f in files
+        )
+
+        tbl = YFinanceTickerData
+        with get_engine().connect() as conn:
+            qry = select(func.min(tbl.date), func.max(tbl.date))
+            first_date, last_date = conn.execute(qry).one()
+        month_start = str(pd.Timestamp(last_date).replace(day=1).date())
+
+        def sqlite_scan(columns, start_date=first_date):
+            # The table holds ticker ids where the Parquet store holds the symbols
+            columns = ['ticker_id' if col == 'ticker' else col for col in columns]
+            qry = select(*[getattr(tbl, col) for col in columns]).where(
+                tbl.date.between(start_date, last_date)
+            )
+            return lambda: read_frame(qry)
+
+        def parquet_scan(columns, start_date=first_date):
+            return lambda: store.read(start_date, last_date, columns=columns)
+
+        scans = {
+            'full history, all columns': (store.columns, first_date),
+            'full history, 4 columns': (SCAN_COLUMNS, first_date),
+            'last month, 4 columns': (SCAN_COLUMNS, month_start),
+        }
+
+        print(f'Parquet export: {export_time:.2f}s, {parquet_bytes / 2**20:.1f} MiB')
+        print(f'{"scan":<28}{"rows":>10}{"sqlite (s)":>12}{"parquet (s)":>13}')
+        for name, (columns, start_date) in scans.items():
+            sqlite_times, sqlite_data = timed(sqlite_scan(columns, start_date), args.repeat)
+            parquet_times, parquet_data = timed(parquet_scan(columns, start_date), args.repeat)
+            assert len(sqlite_data) == len(parquet_data)
+            print(
+                f'{name:<28}{len(sqlite_data):>10}{min(sqlite_times):>12.3f}'
+                f'{min(parquet_times):>13.3f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ingestion, index engine and dashboard data paths on synthetic markets.
+
+For every --scales market (see `synthetic_market`), a fresh DB is loaded in a temporary dir and
+each benchmark is timed --repeat times, its setup (e.g. clearing the table it writes) excluded.
+The results are written as JSON with --output, and compared with the results of another commit
+with --compare, which exits with status 1 if a benchmark got slower by more than --threshold.
+
+    python benchmarks/bench_suite.py --scales small medium --output new.json --compare old.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+# First, as it puts the equiwix sources on the path
+from synthetic_market import generate_market, load_market, temp_dir, timed
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy import delete, func, select
+
+from equiwix.base_sync import DataFrameSync
+from equiwix.db import atomic_session, create_db_and_tables, dispose_engines, get_session
+from equiwix.db.tables import (IndexCompositionChange, IndexConstituentInterval,
+                               IndexConstituents, IndexLevel, Ticker, YFinanceTickerData)
+from equiwix.db.util import DB_PATH_ENV_VAR
+from equiwix.trading_calendar import get_trading_calendar
+
+# Scale name -> (number of tickers, number of trading days)
+SCALES = {
+    'small': (250, 250),
+    'medium': (500, 500),
+    'large': (1000, 1000),
+}
+
+# Last trading day of the synthetic markets
+END_DATE = '2024-12-31'
+
+BENCHMARKS = (
+    'dataframe_sync',
+    'sql_constituents',
+    'sql_levels',
+    'numpy_constituents',
+    'numpy_levels',
+    'recompute_levels',
+    'constituents_selector',
+    'level_selector',
+    'fetch_query_results',
+    'detect_composition_changes',
+)
+
+
+def getargs():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--scales", nargs='+', choices=list(SCALES), default=['small', 'medium'], help="Markets."
+    )
+    parser.add_argument(
+        "--benchmarks", nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS), help="Benchmarks."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic markets.")
+    parser.add_argument("--output", type=str, help="Path of the JSON results to write.")
+    parser.add_argument("--compare", type=str, help="Path of the JSON results to compare with.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative slowdown of the best time above which --compare reports a regression.",
+    )
+    return parser.parse_args()
+
+
+def clear(*tables):
+    with atomic_session() as session:
+        for table in tables:
+            session.execute(delete(table))
+
+
+def count(table):
+    session = get_session()
+    num_rows = session.execute(select(func.count()).select_from(table)).scalar()
+    session.close()
+    return num_rows
+
+
+def get_environment():
+    """Return the commit and the versions the results were measured with."""
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def git(*args):
+        return subprocess.run(
+            ['git', *args], cwd=repo, capture_output=True, text=True
+        ).stdout.strip()
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'created_at_utc': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sqlalchemy': sqlalchemy.__version__,
+    }
+
+
+class SyntheticBarsSync(DataFrameSync):
+    """Sync of the bars of a synthetic market into the ticker data table."""
+
+    def __init__(self, bars, run_date, sync_start_date):
+        super().__init__(run_date, sync_start_date)
+        self.bars = bars
+
+    @property
+    def table(self):
+        return YFinanceTickerData
+
+    def get_data_to_sync(self):
+        return self.bars
+
+
+def get_benchmarks(market, start_date, end_date):
+    """
+    Return the benchmarks of the loaded `market` as a dict of name -> (setup, run, table). The
+    number of rows of a benchmark is the row count of `table` after its runs if given, the length
+    of the result of `run` otherwise.
+    """
+    # Imported once the DB path is set
+    from equiwix.dashboard_viz.metrics import detect_composition_changes
+    from equiwix.db import fetch_query_results
+    from equiwix.index_engine.divisor import IndexLevelDivisorDAO
+    from equiwix.index_engine.numpy_computer import (YFinanceNumpyIndexConstituentsComputer,
+                                                     YFinanceNumpyIndexLevelComputer)
+    from equiwix.index_engine.selectors import (IndexConstituentsDateSelector,
+                                                IndexLevelDateSelector)
+    from equiwix.index_engine.yfinance_computer import (YFinanceIndexConstituentsComputer,
+                                                        YFinanceIndexLevelComputer)
+
+    def compute(computer_cls):
+        return lambda: computer_cls(end_date, start_date).sync()
+
+    def ensure_computed():
+        # So that the benchmarks reading the index tables can run without the compute ones
+        if count(IndexConstituents) == 0:
+            compute(YFinanceNumpyIndexConstituentsComputer)()
+        if count(IndexLevel) == 0:
+            compute(YFinanceNumpyIndexLevelComputer)()
+
+    def clear_constituents():
+        clear(IndexConstituents, IndexCompositionChange, IndexConstituentInterval)
+
+    def clear_levels():
+        if count(IndexConstituents) == 0:
+            compute(YFinanceNumpyIndexConstituentsComputer)()
+        clear(IndexLevel)
+
+    # Divisor set in the middle of the range, so that half of the levels are recomputed
+    days = get_trading_calendar().range(start_date, end_date)
+    divisor_date = str(days[len(days) // 2])
+    divisor_dao = IndexLevelDivisorDAO('yfinance')
+
+    def set_divisor():
+        ensure_computed()
+        divisor_dao.set(2.0, divisor_date)
+
+    session = get_session()
+    ticker_data_qry = session.query(
+        Ticker.ticker,
+        YFinanceTickerData.datetime_utc,
+        YFinanceTickerData.close,
+        YFinanceTickerData.num_shares_outstanding,
+    ).join(Ticker, Ticker.ticker_id == YFinanceTickerData.ticker_id)
+
+    constituents = {}
+
+    def select_constituents():
+        ensure_computed()
+        constituents['series'] = IndexConstituentsDateSelector('yfinance', cache=None).select()
+
+    return {
+        'dataframe_sync': (
+            lambda: clear(YFinanceTickerData),
+            SyntheticBarsSync(market['bars'], end_date, start_date).sync,
+            YFinanceTickerData,
+        ),
+        'sql_constituents': (
+            clear_constituents,
+            compute(YFinanceIndexConstituentsComputer),
+            IndexConstituents,
+        ),
+        'sql_levels': (clear_levels, compute(YFinanceIndexLevelComputer), IndexLevel),
+        'numpy_constituents': (
+            clear_constituents,
+            compute(YFinanceNumpyIndexConstituentsComputer),
+            IndexConstituents,
+        ),
+        'numpy_levels': (clear_levels, compute(YFinanceNumpyIndexLevelComputer), IndexLevel),
+        'recompute_levels': (
+            set_divisor,
+            lambda: divisor_dao.recompute_levels(divisor_date),
+            IndexLevel,
+        ),
+        'constituents_selector': (
+            ensure_computed,
+            IndexConstituentsDateSelector('yfinance', cache=None).select,
+            None,
+        ),
+        'level_selector': (
+            ensure_computed,
+            IndexLevelDateSelector('yfinance', cache=None).select,
+            None,
+        ),
+        'fetch_query_results': (
+            None,
+            lambda: fetch_query_results(
+                session, ticker_data_qry, categorical=['ticker'], parse_dates=['datetime_utc']
+            ),
+            None,
+        ),
+        'detect_composition_changes': (
+            select_constituents,
+            lambda: detect_composition_changes(constituents['series']),
+            None,
+        ),
+    }
+
+
+def bench_scale(scale, template_db, work_dir, args):
+    num_tickers, num_days = SCALES[scale]
+    db_path = os.path.join(work_dir, f'{scale}.db')
+    shutil.copy(template_db, db_path)
+    os.environ[DB_PATH_ENV_VAR] = db_path
+
+    days = get_trading_calendar().range('2000-01-01', END_DATE)[-num_days:]
+    start_date, end_date = str(days[0]), str(days[-1])
+    market = generate_market(num_tickers, days, seed=args.seed)
+    # The bars are written by the sync benchmark when it runs first
+    load_market(market, load_bars='dataframe_sync' not in args.benchmarks)
+
+    benchmarks = get_benchmarks(market, start_date, end_date)
+    results = []
+    for name in BENCHMARKS:
+        if name not in args.benchmarks:
+            continue
+
+        setup, run, table = benchmarks[name]
+        times, result = timed(run, args.repeat, setup)
+        num_rows = count(table) if table is not None else len(result)
+        results.append(
+            {
+                'benchmark': name,
+                'scale': scale,
+                'num_tickers': num_tickers,
+                'num_days': num_days,
+                'rows': num_rows,
+                'best_s': min(times),
+                'times_s': times,
+            }
+        )
+        print(f'{scale:<8}{name:<28}{num_rows:>10}{min(times):>10.3f}')
+
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """Print the results next to the baseline ones, and return the number of regressions."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    baseline_times = {(r['benchmark'], r['scale']): r['best_s'] for r in baseline['results']}
+
+    print(f'\nvs {baseline["environment"]["commit"][:10]} ({baseline_path})')
+    print(f'{"scale":<8}{"benchmark":<28}{"before s":>10}{"after s":>10}{"ratio":>8}')
+    num_regressions = 0
+    for result in results:
+        before = baseline_times.get((result['benchmark'], result['scale']))
+        if before is None:
+            continue
+
+        ratio = result['best_s'] / before
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  regression'
+            num_regressions += 1
+        print(
+            f'{result["scale"]:<8}{result["benchmark"]:<28}{before:>10.3f}'
+            f'{result["best_s"]:>10.3f}{ratio:>7.2f}x{flag}'
+        )
+
+    return num_regressions
+
+
+def main():
+    args = getargs()
+
+    with temp_dir('equiwix_bench_') as work_dir:
+        # Created once, as generating the trading calendar dominates the creation
+        template_db = os.path.join(work_dir, 'template.db')
+        os.environ[DB_PATH_ENV_VAR] = template_db
+        create_db_and_tables()
+        dispose_engines()
+        with sqlite3.connect(template_db) as conn:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+        print(f'{"scale":<8}{"benchmark":<28}{"rows":>10}{"best s":>10}')
+        results = []
+        for scale in args.scales:
+            results.extend(bench_scale(scale, template_db, work_dir, args))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            output = {
+                'environment': get_environment(),
+                'repeat': args.repeat,
+                'seed': args.seed,
+                'results': results,
+            }
+            json.dump(output, f, indent=2)
+
+    if args.compare and compare(results, args.compare, args.threshold) > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark keying the fact tables on integer ticker ids rather than on ticker symbols.
+
+On a copy of the DB (the equiwix one or --db) in a temporary dir, where the constituents are first
+computed if it has none, the prices and constituents are copied into one SQLite file per layout of
+`yfinance_ticker_data` and `index_constituents`: keyed on the symbols in rowid tables (the layout
+before the ticker dimension), on the symbols WITHOUT ROWID, and on the ids WITHOUT ROWID (the
+current layout). The size of each file after VACUUM is compared, as well as the time (best of
+--repeat) of the full constituents/prices join before and after ANALYZE.
+
+    python benchmarks/bench_ticker_ids.py --db /path/to/equiwix.db
+"""
+
+import argparse
+import os
+import sqlite3
+
+# First, as it puts the equiwix sources on the path
+from synthetic_market import best_time, compute_constituents, copy_db, temp_dir
+
+from equiwix.db import dispose_engines
+
+# Layout name -> (ticker column, its type, table options)
+LAYOUTS = {
+    'symbols, rowid': ('ticker', 'VARCHAR(20)', ''),
+    'symbols, without rowid': ('ticker', 'VARCHAR(20)', ' WITHOUT ROWID'),
+    'ids, without rowid': ('ticker_id', 'INTEGER', ' WITHOUT ROWID'),
+}
+
+DDL = """
+CREATE TABLE yfinance_ticker_data (
+    {col} {type} NOT NULL, datetime_utc TEXT NOT NULL, source VARCHAR(20) NOT NULL, date TEXT,
+    open REAL, high REAL, low REAL, close REAL, num_shares_outstanding INTEGER,
+    PRIMARY KEY ({col}, datetime_utc, source)
+){options};
+CREATE INDEX ix_yfinance_ticker_data_date_ticker ON yfinance_ticker_data (date, {col}, source);
+CREATE TABLE index_constituents (
+    date TEXT NOT NULL, {col} {type} NOT NULL, source VARCHAR(20) NOT NULL,
+    index_name VARCHAR(20) NOT NULL, PRIMARY KEY (date, {col}, source, index_name)
+){options};
+"""
+
+COPY = """
+INSERT INTO yfinance_ticker_data
+SELECT {key}, datetime_utc, source, date, open, high, low, close, num_shares_outstanding
+FROM src.yfinance_ticker_data AS p JOIN src.ticker AS t ON t.ticker_id = p.ticker_id
+ORDER BY {key}, datetime_utc, source;
+INSERT INTO index_constituents
+SELECT date, {key}, source, index_name
+FROM src.index_constituents AS p JOIN src.ticker AS t ON t.ticker_id = p.ticker_id
+ORDER BY date, {key}, source, index_name;
+"""
+
+JOIN = """
+SELECT count(*), sum(p.close * p.num_shares_outstanding)
+FROM index_constituents AS c
+JOIN yfinance_ticker_data AS p
+    ON p.date = c.date AND p.{col} = c.{col} AND p.source = c.source
+"""
+
+
+def getargs():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", type=str, help="Path of the sqlite DB to copy.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed joins.")
+    return parser.parse_args()
+
+
+def create_layout(path, src_path, col, type_, options):
+    """Create the SQLite file of a layout at `path`, with the rows of the DB at `src_path`."""
+    key = f't.{col}' if col == 'ticker' else f'p.{col}'
+    conn = sqlite3.connect(path)
+    conn.executescript(DDL.format(col=col, type=type_, options=options))
+    conn.execute('ATTACH DATABASE ? AS src', (src_path,))
+    conn.executescript(COPY.format(key=key))
+    conn.commit()
+    conn.execute('DETACH DATABASE src')
+    conn.execute('VACUUM')
+    return conn
+
+
+def main():
+    args = getargs()
+
+    with temp_dir('equiwix_bench_ticker_ids_') as work_dir:
+        db_path = copy_db(work_dir, args.db)
+        compute_constituents()
+        # The layouts read the copy through their own connections
+        dispose_engines()
+
+        print(f'{"layout":<26}{"MiB":>8}{"join s":>10}{"analyzed join s":>18}')
+        for i, (name, (col, type_, options)) in enumerate(LAYOUTS.items()):
+            path = os.path.join(work_dir, f'layout_{i}.db')
+            conn = create_layout(path, db_path, col, type_, options)
+            size_mib = os.path.getsize(path) / 2**20
+
+            def join():
+                conn.execute(JOIN.format(col=col)).fetchall()
+
+            join_s = best_time(join, args.repeat)
+            conn.execute('ANALYZE')
+            analyzed_join_s = best_time(join, args.repeat)
+            conn.close()
+            print(f'{name:<26}{size_mib:>8.1f}{join_s:>10.3f}{analyzed_join_s:>18.3f}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark the rerun of a sync over rows already in the ticker data table, per write mode.
+
+The `yfinance_ticker_data` rows of the DB (the equiwix one or --db) from --start onwards are
+written again into a copy of the DB in a temporary dir (best of --repeat runs): by deleting and
+re-inserting them, and with the upsert and upsert_changed write modes. --changed is the fraction
+of the rerun rows whose close differs from the stored one.
+
+    python benchmarks/bench_write_modes.py --db /path/to/equiwix.db --start 2023-01-01
+"""
+
+import argparse
+
+# First, as it puts the equiwix sources on the path
+from synthetic_market import best_time, copy_db, temp_dir
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from equiwix.base_sync import DataFrameSync
+from equiwix.db import get_engine
+from equiwix.db.tables import YFinanceTickerData
+
+
+def getargs():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", type=str, help="Path of the sqlite DB to copy the rows from.")
+    parser.add_argument("--start", type=str, default='1900-01-01', help="First date rerun.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per mode.")
+    parser.add_argument(
+        "--changed",
+        type=float,
+        nargs='+',
+        default=[0.0, 0.1],
+        help="Fractions of the rerun rows with a changed close.",
+    )
+    return parser.parse_args()
+
+
+class BarsSync(DataFrameSync):
+    def __init__(self, bars, write_mode):
+        super().__init__('2099-12-31', '1900-01-01', write_mode=write_mode)
+        self.bars = bars
+
+    @property
+    def table(self):
+        return YFinanceTickerData
+
+    def get_data_to_sync(self):
+        return self.bars
+
+
+def main():
+    args = getargs()
+
+    with temp_dir('equiwix_bench_write_modes_') as work_dir:
+        engine = get_engine(f'sqlite:///{copy_db(work_dir, args.db)}')
+
+        tbl = YFinanceTickerData
+        is_rerun = tbl.datetime_utc >= args.start
+        bars = pd.read_sql(select(tbl).where(is_rerun), engine)
+        print(f'{len(bars)} rows already synced')
+
+        # The rows are written the way DataFrameSync.sync does, into the copy of the DB
+        def write(data, write_mode):
+            with Session(bind=engine) as session:
+                if write_mode is None:
+                    session.execute(delete(tbl).where(is_rerun))
+                BarsSync(data, write_mode or 'insert')._write(session, data)
+                session.commit()
+
+        rng = np.random.default_rng(0)
+        print(f'{"changed":<10}{"mode":<22}{"best s":>10}')
+        for changed in args.changed:
+            is_changed = rng.random(len(bars)) < changed
+            rerun = bars.assign(close=np.where(is_changed, bars['close'] * 1.01, bars['close']))
+
+            modes = {
+                'delete-then-insert': None,
+                'upsert': 'upsert',
+                'upsert_changed': 'upsert_changed',
+            }
+            for mode, write_mode in modes.items():
+                # Every run starts from the original rows
+                best = best_time(
+                    lambda: write(rerun, write_mode), args.repeat, lambda: write(bars, 'upsert')
+                )
+                print(f'{changed:<10.0%}{mode:<22}{best:>10.3f}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Check the import time of the console entry points against their startup budget.
+
+Each entry point module is imported in a fresh interpreter under `python -X importtime`, the best
+cumulative time of --repeat runs is compared with its budget, and the heavy modules it imported
+are checked against the ones it must leave to the actions. Exits with status 1 on any violation.
+
+    python benchmarks/check_import_time.py
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from synthetic_market import SRC_PATH
+
+# Imported by the actions only. The DB stack is also left out of the commands which parse
+# arguments before touching the DB.
+HEAVY_MODULES = ('yfinance', 'pandas_market_calendars', 'pyarrow')
+DB_MODULES = ('sqlalchemy', 'pandas', 'numpy')
+
+# Entry point module -> (budget in ms or None, modules it must not import)
+ENTRY_POINTS = {
+    'scripts.add_ticker_to_univ': (200, HEAVY_MODULES + DB_MODULES),
+    'scripts.update_divisor': (200, HEAVY_MODULES + DB_MODULES),
+    'scripts.launch_dashboard': (200, HEAVY_MODULES + DB_MODULES),
+    'scripts.create_db_and_tables': (None, HEAVY_MODULES + ('pandas', 'numpy')),
+    'scripts.sync_yfinance_data': (200, HEAVY_MODULES + DB_MODULES),
+    'scripts.run_daily_pipeline': (200, HEAVY_MODULES + DB_MODULES),
+}
+
+
+def getargs():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed imports per module.")
+    parser.add_argument(
+        "modules", nargs='*', help="Entry point modules to check, all of them by default."
+    )
+    return parser.parse_args()
+
+
+def import_module(module):
+    """
+    Import `module` in a fresh interpreter.
+
+    :return: Cumulative import time of `module` in ms, and the set of the top-level packages
+        imported along with it.
+    """
+    env = dict(os.environ, PYTHONPATH=SRC_PATH)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f'Importing {module} failed:\n{proc.stderr}')
+
+    cumulative, imported = None, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative_us, name = line.split('|')
+        name = name.strip()
+        imported.add(name.split('.')[0])
+        if name == module:
+            cumulative = int(cumulative_us) / 1000
+
+    return cumulative, imported
+
+
+def main():
+    args = getargs()
+    modules = args.modules or list(ENTRY_POINTS)
+
+    failures = []
+    for module in modules:
+        budget, forbidden = ENTRY_POINTS[module]
+        runs = [import_module(module) for _ in range(args.repeat)]
+        best = min(cumulative for cumulative, _ in runs)
+        imported = sorted(set(forbidden) & runs[0][1])
+
+        status = 'ok'
+        if budget is not None and best > budget:
+            status = f'over budget ({budget} ms)'
+        if imported:
+            status = f'imports {", ".join(imported)}'
+        if status != 'ok':
+            failures.append(module)
+
+        print(f'{module:<32} {best:8.1f} ms  {status}')
+
+    if failures:
+        print(f'{len(failures)} entry points failed the startup check')
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Local fake market data provider of the benchmarks and tests.
+
+Generates deterministic synthetic daily bars so that ingestion can be exercised without network
+access. Latency and transient failures of a real provider can be simulated. Importing the module
+registers the provider as `fake`, the source of the rows synced from it.
+"""
+
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from equiwix.data_ingestion.providers import MarketDataProvider, register_provider
+
+
+class FakeProviderError(ConnectionError):
+    pass
+
+
+@register_provider('fake')
+class FakeProvider(MarketDataProvider):
+    """
+    Fake drop-in replacement for `YFinanceProvider`.
+
+    :param latency: Seconds slept on every call.
+    :param failure_rate: Probability in [0, 1] that a call raises `FakeProviderError`.
+    :param seed: Seed of the failure generator.
+    :param supports_batch: Whether multi-ticker `history` calls are accepted.
+    :param failing_tickers: Tickers whose `history` calls always raise `FakeProviderError`, along
+        with the batches including them.
+    """
+
+    def __init__(
+        self, latency=0.0, failure_rate=0.0, seed=0, supports_batch=True, failing_tickers=()
+    ):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.supports_batch = supports_batch
+        self.failing_tickers = set(failing_tickers)
+        self.num_calls = {'history': 0, 'shares_outstanding': 0}
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        with self._lock:
+            self.num_calls[name] += 1
+            fail = self._rng.random() < self.failure_rate
+
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise FakeProviderError(f'Simulated {name} failure')
+
+    @staticmethod
+    def _ticker_seed(ticker):
+        return zlib.crc32(ticker.encode())
+
+    def _bars(self, ticker, start, end):
+        dates = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1), name='Date')
+        if len(dates) == 0:
+            return pd.DataFrame()
+
+        # Seed the random walk from the ticker and the absolute day number so that overlapping
+        # ranges return identical bars.
+        day_nums = (dates - pd.Timestamp('2000-01-01')).days.to_numpy()
+        rng = np.random.default_rng(self._ticker_seed(ticker))
+        base = 10 + rng.random() * 490
+        drift = np.sin(day_nums / (50 + self._ticker_seed(ticker) % 200)) * 0.2
+        close = base * (1 + drift)
+        open_ = close * (1 + np.cos(day_nums) * 0.005)
+
+        index = dates.tz_localize('America/New_York')
+        return pd.DataFrame(
+            {
+                'Open': open_,
+                'High': np.maximum(open_, close) * 1.01,
+                'Low': np.minimum(open_, close) * 0.99,
+                'Close': close,
+                'Volume': 1_000_000,
+            },
+            index=index,
+        )
+
+    def history(self, tickers, start, end):
+        if len(tickers) > 1 and not self.supports_batch:
+            raise ValueError('Batch downloads not supported.')
+
+        self._call('history')
+        failing = self.failing_tickers.intersection(tickers)
+        if failing:
+            raise FakeProviderError(f'Simulated history failure of {sorted(failing)}')
+
+        result = {}
+        for ticker in tickers:
+            bars = self._bars(ticker, start, end)
+            if not bars.empty:
+                result[ticker] = bars
+        return result
+
+    def shares_outstanding(self, ticker):
+        self._call('shares_outstanding')
+        return 10_000_000 + self._ticker_seed(ticker) % 5_000_000_000
@@ -0,0 +1,241 @@
+"""
+Deterministic synthetic market of N tickers over M trading days, loaded straight into the tables of
+`equiwix.db.tables`.
+
+Market caps follow per-ticker random walks from a log-normal spread, so that the tickers around
+the 100th rank keep swapping places and the index constituents churn. Some tickers are listed or
+delisted during the range, and splits (and reverse splits) scale the prices and the shares
+outstanding while keeping the market caps continuous. The same arguments always generate the same
+market.
+
+The module also holds the helpers shared by the benchmarks, which import it first to put the
+equiwix sources on the path.
+
+    market = generate_market(500, get_trading_calendar().range('2023-01-01', '2024-12-31'))
+    load_market(market)
+"""
+
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# The benchmarks import equiwix from the checkout, and import this module before it
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python')
+sys.path.insert(0, SRC_PATH)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from equiwix.constants import DEFAULT_SOURCE  # noqa: E402
+from equiwix.db import atomic_session, dispose_engines, get_db_path, get_session  # noqa: E402
+from equiwix.db.tables import (IndexConstituents, IndexLevelDivisor,  # noqa: E402
+                               SharesOutstanding, Ticker, TickerUniverse, YFinanceTickerData)
+from equiwix.db.util import DB_PATH_ENV_VAR  # noqa: E402
+from equiwix.index_engine.constants import DEFAULT_INDEX  # noqa: E402
+from equiwix.util import EQUIWIX_END_OF_TIME, EQUIWIX_START_OF_TIME  # noqa: E402
+
+# Split ratios, applied to the shares outstanding. 0.1 is a 1-for-10 reverse split.
+SPLIT_RATIOS = (2, 3, 4, 0.1)
+
+# Universe the synthetic tickers are added to
+SYNTHETIC_UNIVERSE = 'sp500'
+
+
+def generate_market(
+    num_tickers,
+    trading_days,
+    seed=0,
+    daily_vol=0.02,
+    splits_per_year=0.05,
+    listing_rate=0.1,
+    delisting_rate=0.05,
+):
+    """
+    Generate the ticker data of a synthetic market.
+
+    :param trading_days: Sorted datetime64[D] array of the trading days of the market.
+    :param daily_vol: Average daily volatility of the market caps.
+    :param splits_per_year: Average number of splits per ticker and year.
+    :param listing_rate: Fraction of the tickers listed after the first day.
+    :param delisting_rate: Fraction of the tickers delisted before the last day.
+    :return: Dict of DataFrames: tickers (ticker_id, ticker), bars (rows of
+        `yfinance_ticker_data`) and shares (rows of `shares_outstanding`).
+    """
+    rng = np.random.default_rng(seed)
+    num_days = len(trading_days)
+    shape = (num_tickers, num_days)
+
+    vol = daily_vol * rng.uniform(0.5, 1.5, num_tickers)[:, None]
+    log_mcap = np.log(rng.lognormal(np.log(2e10), 1.2, num_tickers))[:, None]
+    log_mcap = log_mcap + np.cumsum(rng.normal(0, vol, shape), axis=1)
+
+    is_split = rng.random(shape) < splits_per_year / 252
+    split_factor = np.cumprod(np.where(is_split, rng.choice(SPLIT_RATIOS, shape), 1), axis=1)
+    initial_shares = np.exp(log_mcap[:, 0]) / rng.uniform(10, 500, num_tickers)
+    shares = np.maximum(np.rint(initial_shares[:, None] * split_factor), 1).astype(np.int64)
+
+    close = np.exp(log_mcap) / shares
+    open_ = close * np.exp(rng.normal(0, vol / 2, shape))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, vol / 2, shape)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, vol / 2, shape)))
+
+    first_day = np.where(
+        rng.random(num_tickers) < listing_rate, rng.integers(1, num_days, num_tickers), 0
+    )
+    last_day = np.where(
+        rng.random(num_tickers) < delisting_rate,
+        rng.integers(first_day, num_days),
+        num_days - 1,
+    )
+    day_nums = np.arange(num_days)
+    is_listed = (day_nums >= first_day[:, None]) & (day_nums <= last_day[:, None])
+
+    ticker_ids = np.arange(1, num_tickers + 1)
+    tickers = pd.DataFrame(
+        {'ticker_id': ticker_ids, 'ticker': [f'SYN{i:05d}' for i in range(num_tickers)]}
+    )
+
+    # Daily bars are dated at midnight New York time
+    days = pd.DatetimeIndex(trading_days)
+    dates = np.asarray(days.strftime('%Y-%m-%d'))
+    datetimes = np.asarray(
+        days.tz_localize('America/New_York').tz_convert('UTC').strftime('%Y-%m-%d %H:%M:%S')
+    )
+
+    ticker_idx, day_idx = np.nonzero(is_listed)
+    bars = pd.DataFrame(
+        {
+            'ticker_id': ticker_ids[ticker_idx],
+            'datetime_utc': datetimes[day_idx],
+            'source': DEFAULT_SOURCE,
+            'date': dates[day_idx],
+            'open': open_[is_listed],
+            'high': high[is_listed],
+            'low': low[is_listed],
+            'close': close[is_listed],
+            'num_shares_outstanding': shares[is_listed],
+        }
+    )
+
+    # Shares outstanding history: the listing day and the splits of each ticker
+    is_change = is_listed & (is_split | (day_nums == first_day[:, None]))
+    ticker_idx, day_idx = np.nonzero(is_change)
+    shares_history = pd.DataFrame(
+        {
+            'ticker_id': ticker_ids[ticker_idx],
+            'start_date': dates[day_idx],
+            'num_shares_outstanding': shares[ticker_idx, day_idx],
+            'fetched_at_utc': datetimes[day_idx],
+        }
+    )
+
+    return {'tickers': tickers, 'bars': bars, 'shares': shares_history}
+
+
+def load_market(market, load_bars=True):
+    """
+    Write `market` into the DB, along with a divisor of 1 for the default index.
+
+    :param load_bars: Whether to write the bars, e.g. not when they are written by a benchmark of
+        the sync.
+    """
+    divisor = pd.DataFrame(
+        {
+            'source': [DEFAULT_SOURCE],
+            'index_name': [DEFAULT_INDEX],
+            'knowledge_start_date': [str(EQUIWIX_START_OF_TIME)],
+            'knowledge_end_date': [str(EQUIWIX_END_OF_TIME)],
+            'divisor': [1.0],
+        }
+    )
+    universe = market['tickers'][['ticker_id']].assign(univ=SYNTHETIC_UNIVERSE)
+
+    frames = {
+        Ticker: market['tickers'],
+        TickerUniverse: universe,
+        IndexLevelDivisor: divisor,
+        SharesOutstanding: market['shares'],
+    }
+    if load_bars:
+        frames[YFinanceTickerData] = market['bars']
+
+    with atomic_session() as session:
+        conn = session.connection()
+        for table, data in frames.items():
+            data.to_sql(
+                table.__tablename__, conn, if_exists='append', index=False, chunksize=50_000
+            )
+
+
+def timed(fn, repeat=3, setup=None):
+    """Return the times of `repeat` calls of `fn`, each after an untimed `setup`, and its result."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def best_time(fn, repeat=3, setup=None):
+    """Return the best time of `repeat` calls of `fn`, each after an untimed `setup`."""
+    times, _ = timed(fn, repeat, setup)
+    return min(times)
+
+
+@contextlib.contextmanager
+def temp_dir(prefix):
+    """Yield a temporary dir, removed on exit along with the engines of the DBs in it."""
+    path = tempfile.mkdtemp(prefix=prefix)
+    try:
+        yield path
+    finally:
+        dispose_engines()
+        shutil.rmtree(path)
+
+
+def copy_db(dir_path, db_path=None):
+    """
+    Copy the DB at `db_path` (the equiwix one by default) into `dir_path` and point equiwix at the
+    copy.
+
+    :return: Path of the copy.
+    """
+    path = os.path.join(dir_path, 'equiwix.db')
+    shutil.copy(db_path or get_db_path(), path)
+    os.environ[DB_PATH_ENV_VAR] = path
+    return path
+
+
+def get_days():
+    """Return the sorted dates of the ticker data of the DB."""
+    session = get_session()
+    tbl = YFinanceTickerData
+    days = session.execute(select(tbl.date).distinct().order_by(tbl.date)).scalars().all()
+    session.close()
+    return days
+
+
+def compute_constituents():
+    """
+    Compute the constituents over the whole range of the DB with the numpy engine, unless it has
+    some already.
+
+    :return: Sorted dates of the ticker data.
+    """
+    # Imported once the DB path is set
+    from equiwix.index_engine.numpy_computer import YFinanceNumpyIndexConstituentsComputer
+
+    days = get_days()
+    session = get_session()
+    num_constituents = session.execute(select(func.count(IndexConstituents.date))).scalar()
+    session.close()
+    if num_constituents == 0:
+        YFinanceNumpyIndexConstituentsComputer(days[-1], days[0]).sync()
+    return days
@@ -6,6 +6,7 @@ setup(
     packages=find_packages(where="src/python"),
     package_dir={"": "src/python"},
     install_requires=[
+        "numpy",
         "pandas",
         "python-dateutil",
         "sqlalchemy",
@@ -14,11 +15,15 @@ setup(
         "streamlit",
         "pandas_market_calendars",
     ],
+    extras_require={
+        "parquet": ["pyarrow"],
+    },
     entry_points={
         "console_scripts": [
             "equiwix-create_db_and_tables = scripts.create_db_and_tables:main",
             "equiwix-add_ticker_to_univ = scripts.add_ticker_to_univ:main",
             "equiwix-sync_yfinance_data = scripts.sync_yfinance_data:main",
+            "equiwix-run_daily_pipeline = scripts.run_daily_pipeline:main",
             "equiwix-update_divisor = scripts.update_divisor:main",
             "equiwix-launch_dashboard = scripts.launch_dashboard:main",
         ],
@@ -1,20 +1,31 @@
 import logging
 from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
 
-from sqlalchemy import insert
+import pandas as pd
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
 
-from .db import atomic_session
+from .constants import WRITE_MODES
+from .db import atomic_session, get_session
+from .db.data_version import DataVersionDAO
+from .sync_metrics import SyncMetrics
 from .util import Date
 
 
 class BaseSync(ABC):
-    def __init__(self, run_date, sync_start_date=None):
+    # Max number of rows written per INSERT statement
+    write_batch_size = 10_000
+
+    def __init__(self, run_date, sync_start_date=None, write_mode='insert'):
         """
         Base class for performing sync to a table.
 
         :param run_date: Date for/till which data should be synced.
         :param sync_start_date: Date from which data should be synced.
             If None, sync data only for `run_date`.
+        :param write_mode: One of `WRITE_MODES`.
         """
         if sync_start_date is None:
             sync_start_date = run_date
@@ -25,6 +36,15 @@ class BaseSync(ABC):
         if self.sync_start_date > self.sync_end_date:
             raise ValueError(f'sync_start_date should be <= run_date.')
 
+        if write_mode not in WRITE_MODES:
+            raise ValueError(f'Invalid write_mode: {write_mode}')
+        self.write_mode = write_mode
+        # Callables of a session run by `post_sync` in the last transaction of the sync, e.g. to
+        # record a checkpoint along with the synced data
+        self.post_sync_hooks = []
+        # `SyncMetrics` of the running `sync`, None outside of it
+        self.metrics = None
+
     @property
     @abstractmethod
     def table(self):
@@ -38,44 +58,189 @@ class BaseSync(ABC):
     def sync(self):
         pass
 
+    @contextmanager
+    def instrumented(self, job=None):
+        """
+        Collect the `SyncMetrics` of a run of `sync`, logged and recorded in `sync_run` once the
+        block exits, whether it succeeds or fails.
+
+        The `sync` implementations time their phases with the yielded metrics and set its
+        num_rows.
+
+        :param job: Name of the job in `sync_run`, defaults to the class name.
+        """
+        self.metrics = metrics = SyncMetrics(self, job)
+        try:
+            yield metrics
+        except Exception as e:
+            metrics.stop()
+            metrics.report(error=e)
+            raise
+        finally:
+            self.metrics = None
+        metrics.stop()
+        metrics.report()
+
+    def _phase(self, name):
+        """Return the context timing phase `name` of the running sync, a no-op outside of it."""
+        return self.metrics.phase(name) if self.metrics is not None else nullcontext()
+
+    def post_sync(self, session):
+        """Hook to run extra queries in the last transaction of the sync, after the data writes."""
+        for hook in self.post_sync_hooks:
+            hook(session)
+
+    def get_insert_query(self, table=None):
+        """
+        Return the INSERT statement into `table` (defaults to `self.table`) for the configured
+        `write_mode`.
+
+        Upserts resolve conflicts on the primary key. Tables with only primary key columns
+        have nothing to update, so conflicting rows are skipped.
+        """
+        tbl = (self.table if table is None else table).__table__
+        if self.write_mode == 'insert':
+            return insert(tbl)
+
+        qry = sqlite_insert(tbl)
+        pk_cols = [c.name for c in tbl.primary_key.columns]
+        update_cols = [c.name for c in tbl.columns if not c.primary_key]
+
+        if not update_cols:
+            return qry.on_conflict_do_nothing(index_elements=pk_cols)
+
+        changed = None
+        if self.write_mode == 'upsert_changed':
+            changed = or_(*[tbl.c[c].is_distinct_from(qry.excluded[c]) for c in update_cols])
+
+        return qry.on_conflict_do_update(
+            index_elements=pk_cols,
+            set_={c: qry.excluded[c] for c in update_cols},
+            where=changed,
+        )
+
+    def _write(self, session, data):
+        """Write the rows of the `data` DataFrame into `self.table` in batches."""
+        # Compiled once and executed on the driver with plain tuples, which skips the per-row
+        # dicts and parameter processing of the ORM executemany.
+        conn = session.connection() if isinstance(session, Session) else session
+        compiled = self.get_insert_query().compile(
+            dialect=conn.dialect, column_keys=list(data.columns)
+        )
+        columns = [data[col].tolist() for col in compiled.positiontup]
+        for start in range(0, len(data), self.write_batch_size):
+            end = start + self.write_batch_size
+            conn.exec_driver_sql(
+                str(compiled), list(zip(*[values[start:end] for values in columns]))
+            )
+
 
 class DataFrameSync(BaseSync):
+    # Whether a sync without any row to write fails
+    requires_data = True
+    # Whether each chunk of `iter_data_to_sync` is committed once written, instead of the whole
+    # sync being one transaction. The SQLite write lock is then only held while a chunk is
+    # written, not while the next ones are fetched, and an interrupted sync keeps its written
+    # chunks. `post_sync` runs in a last transaction of its own.
+    commit_per_chunk = False
+
     @abstractmethod
     def get_data_to_sync(self):
         pass
 
+    def iter_data_to_sync(self):
+        """
+        Yield the data to sync as a sequence of DataFrames.
+
+        Subclasses can override this to stream the data in per-ticker or per-chunk frames so that
+        memory doesn't grow with the size of the sync range. Defaults to a single frame returned
+        by `get_data_to_sync`.
+        """
+        yield self.get_data_to_sync()
+
+    def post_commit(self, data):
+        """
+        Hook run once the chunk `data` is committed, if `commit_per_chunk`, e.g. to write it to a
+        store outside of the DB.
+        """
+
     def check_data_availability(self):
-        data = self.get_data_to_sync()
-        if len(data) == 0:
-            raise ValueError('Data not available to sync')
-        return True
+        # Stop at the first non-empty chunk instead of fetching everything.
+        for data in self.iter_data_to_sync():
+            if len(data) > 0:
+                return True
+        raise ValueError('Data not available to sync')
 
     def sync(self):
-        data = self.get_data_to_sync()
-        data_dict = data.to_dict(orient='records')
-
-        with atomic_session() as session:
-            session.execute(insert(self.table), data_dict)
+        with self.instrumented() as metrics:
+            if self.commit_per_chunk:
+                self._sync_chunks(metrics, atomic_session)
+            else:
+                with atomic_session() as session:
+                    self._sync_chunks(metrics, lambda: nullcontext(session))
 
         logging.info(
             f'Data synced into {self.table.__tablename__} for '
-            f'{self.sync_start_date}:{self.sync_end_date}'
+            f'{self.sync_start_date}:{self.sync_end_date} ({metrics.num_rows} rows in '
+            f'{metrics.duration:.2f}s)'
         )
 
+    def _sync_chunks(self, metrics, transaction):
+        """
+        Write the chunks of data to sync then run `post_sync`, each of them in the session of the
+        `transaction()` context.
+        """
+        for data in metrics.iter_phase('fetch', self.iter_data_to_sync()):
+            with metrics.phase('write'):
+                with transaction() as session:
+                    self._write(session, data)
+                    if self.commit_per_chunk:
+                        DataVersionDAO().bump(session, self.table)
+                if self.commit_per_chunk:
+                    self.post_commit(data)
+            metrics.num_rows += len(data)
+
+        if metrics.num_rows == 0 and self.requires_data:
+            raise ValueError('Data not available to sync')
+
+        with metrics.phase('write'), transaction() as session:
+            self.post_sync(session)
+            DataVersionDAO().bump(session, self.table)
+
 
 class SelectQuerySync(BaseSync):
     @abstractmethod
     def get_select_query(self):
         pass
 
+    def get_data_to_sync(self):
+        """Return the rows of the select query as a DataFrame, to be written by another process."""
+        select_qry = self.get_select_query()
+        session = get_session()
+        try:
+            rows = session.execute(select_qry).all()
+        finally:
+            session.close()
+        return pd.DataFrame(rows, columns=list(select_qry.selected_columns.keys()))
+
     def sync(self):
-        insert_qry = insert(self.table).from_select(
-            [c.name for c in self.table.__table__.columns], self.get_select_query()
+        # Note: With upserts, SQLite needs the select to have a WHERE clause to avoid parsing
+        # the ON CONFLICT clause as a join constraint.
+        select_qry = self.get_select_query()
+        insert_qry = self.get_insert_query().from_select(
+            [c.name for c in select_qry.selected_columns], select_qry
         )
-        with atomic_session() as session:
-            session.execute(insert_qry)
+        # The select runs within the INSERT statement, so the whole sync is timed as writes
+        with self.instrumented() as metrics, atomic_session() as session:
+            with metrics.phase('write'):
+                session.execute(insert_qry)
+                # The driver's rowcount isn't set for the statements starting with a CTE
+                metrics.num_rows = session.execute(select(func.changes())).scalar()
+                self.post_sync(session)
+                DataVersionDAO().bump(session, self.table)
 
         logging.info(
             f'Data synced into {self.table.__tablename__} for '
-            f'{self.sync_start_date}:{self.sync_end_date}'
+            f'{self.sync_start_date}:{self.sync_end_date} ({metrics.num_rows} rows in '
+            f'{metrics.duration:.2f}s)'
         )
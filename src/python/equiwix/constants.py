@@ -0,0 +1,11 @@
+# insert: plain INSERT, fails if a row already exists.
+# upsert: INSERT ... ON CONFLICT DO UPDATE, overwrites existing rows.
+# upsert_changed: Same as upsert but only rows whose values changed are written.
+WRITE_MODES = ('insert', 'upsert', 'upsert_changed')
+
+# Source of the ticker data and of the index rows computed from it, the name of the market data
+# provider the rows were synced from, see `data_ingestion.providers`.
+DEFAULT_SOURCE = 'yfinance'
+
+# Stages of the daily pipeline in execution order, see `pipeline.DailyPipeline`
+PIPELINE_STAGES = ('sync', 'constituents', 'levels')
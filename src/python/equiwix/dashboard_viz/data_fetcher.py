@@ -1,11 +1,13 @@
-from ..index_engine.selectors import (IndexConstituentsDateSelector,
-                                      IndexLevelDateSelector)
+from ..index_engine.constants import DEFAULT_INDEX
+from ..index_engine.selectors import (IndexCompositionChangesDateSelector,
+                                      IndexConstituentsDateSelector, IndexLevelDateSelector)
 
 
 class DataFetcher:
-    def __init__(self, source):
-        self.constituent_selector = IndexConstituentsDateSelector(source)
-        self.level_selector = IndexLevelDateSelector(source)
+    def __init__(self, source, index_name=DEFAULT_INDEX):
+        self.constituent_selector = IndexConstituentsDateSelector(source, index_name)
+        self.level_selector = IndexLevelDateSelector(source, index_name)
+        self.changes_selector = IndexCompositionChangesDateSelector(source, index_name)
 
     def get_index_levels(self, start_date, end_date):
         date_range = f'{start_date}:{end_date}'
@@ -14,3 +16,7 @@ class DataFetcher:
     def get_constituents(self, start_date, end_date):
         date_range = f'{start_date}:{end_date}'
         return self.constituent_selector.select(date=date_range)
+
+    def get_composition_changes(self, start_date, end_date):
+        date_range = f'{start_date}:{end_date}'
+        return self.changes_selector.select(date=date_range)
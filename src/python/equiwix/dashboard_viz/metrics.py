@@ -1,5 +1,7 @@
 import pandas as pd
 
+from ..index_engine.composition_changes import compute_composition_changes
+
 
 def compute_index_metrics(df):
     df = df.copy()
@@ -9,10 +11,12 @@ def compute_index_metrics(df):
 
 
 def detect_composition_changes(constituents_series):
-    change_dates = []
-    prev = None
-    for date, tickers in constituents_series.items():
-        if prev is not None and set(tickers) != set(prev):
-            change_dates.append(date)
-        prev = tickers
-    return change_dates
+    changes = compute_composition_changes(constituents_series)
+    return changes['date'].drop_duplicates().tolist()
+
+
+def summarize_composition_changes(changes_df):
+    """Return the comma separated added and removed tickers per change date."""
+    summary = changes_df.groupby([changes_df.index, 'change'])['ticker'].agg(', '.join)
+    summary = summary.unstack('change').reindex(columns=['add', 'remove']).fillna('')
+    return summary.rename(columns={'add': 'added', 'remove': 'removed'})
@@ -4,9 +4,11 @@ import plotly.express as px
 import plotly.graph_objs as go
 import streamlit as st
 
+from ..index_engine.constants import DEFAULT_INDEX
+from ..index_engine.definitions import INDEX_DEFINITIONS
 from ..util import Date
 from .data_fetcher import DataFetcher
-from .metrics import compute_index_metrics, detect_composition_changes
+from .metrics import compute_index_metrics, summarize_composition_changes
 
 PRODUCTION_SOURCE = 'yfinance'
 
@@ -32,17 +34,27 @@ def render_date_selector():
     return date_range
 
 
-def load_data(start_date, end_date):
-    data_fetcher = DataFetcher(source=PRODUCTION_SOURCE)
+def render_index_selector():
+    index_names = list(INDEX_DEFINITIONS)
+    return st.sidebar.selectbox(
+        "Select Index", index_names, index=index_names.index(DEFAULT_INDEX)
+    )
+
+
+def load_data(start_date, end_date, index_name):
+    data_fetcher = DataFetcher(source=PRODUCTION_SOURCE, index_name=index_name)
 
     index_df = data_fetcher.get_index_levels(start_date, end_date)
     constituents_df = data_fetcher.get_constituents(start_date, end_date)
-    change_dates = detect_composition_changes(constituents_df)
+    # Changes are persisted by the constituents computers, no need to diff the constituents here
+    changes_df = summarize_composition_changes(
+        data_fetcher.get_composition_changes(start_date, end_date)
+    )
 
-    return index_df, constituents_df, change_dates
+    return index_df, constituents_df, changes_df
 
 
-def render_performance_chart(index_df, change_dates):
+def render_performance_chart(index_df, changes_df):
     st.subheader("📊 Index Performance")
 
     # Create the line chart representing the index levels
@@ -60,8 +72,9 @@ def render_performance_chart(index_df, change_dates):
 
     fig.add_trace(
         go.Scatter(
-            x=change_dates,
-            y=[baseline] * len(change_dates),
+            x=changes_df.index,
+            y=[baseline] * len(changes_df),
+            customdata=changes_df[['added', 'removed']],
             mode='markers',
             marker=dict(
                 symbol='line-ns-open',  # vertical tick
@@ -69,7 +82,10 @@ def render_performance_chart(index_df, change_dates):
                 color='grey',
                 line_width=1,
             ),
-            hovertemplate='Date: %{x|%Y-%m-%d}<extra></extra>',
+            hovertemplate=(
+                'Date: %{x|%Y-%m-%d}<br>Added: %{customdata[0]}<br>Removed: %{customdata[1]}'
+                '<extra></extra>'
+            ),
             name='Composition change',
         )
     )
@@ -78,7 +94,7 @@ def render_performance_chart(index_df, change_dates):
     st.plotly_chart(fig, use_container_width=True)
 
 
-def render_composition_view(constituents_df):
+def render_composition_view(constituents_df, changes_df):
     st.subheader("🧩 Index Composition")
     selected_date = st.date_input(
         "Select Date to View Composition",
@@ -104,11 +120,15 @@ def render_composition_view(constituents_df):
             """
         st.markdown(tickers_html, unsafe_allow_html=True)
 
+        if selected_date in changes_df.index.date:
+            added, removed = changes_df.loc[selected_date.strftime("%Y-%m-%d")]
+            st.write(f"**Added:** {added or '-'}  \n**Removed:** {removed or '-'}")
+
     except KeyError:
         st.warning(f"No composition data available for {selected_date}.")
 
 
-def render_summary_metrics(index_df, change_dates):
+def render_summary_metrics(index_df, changes_df):
     st.subheader("📌 Summary Metrics")
 
     index_metrics = compute_index_metrics(index_df)
@@ -119,12 +139,13 @@ def render_summary_metrics(index_df, change_dates):
 
     col1.metric("Cumulative Return", f"{cum_returns.iloc[-1]:.2%}")
     col2.metric("Max Daily Change", f"{pct_change.max():.2%}")
-    col3.metric("# of Composition Changes", len(change_dates))
+    col3.metric("# of Composition Changes", len(changes_df))
 
 
 def render_dashboard():
     render_header()
 
+    index_name = render_index_selector()
     date_range = render_date_selector()
     if not date_range or len(date_range) != 2:
         st.error("Please select a valid date range.")
@@ -133,12 +154,12 @@ def render_dashboard():
     start_date, end_date = date_range
     st.info(f"Fetching data from {start_date} to {end_date}")
 
-    index_df, constituents_df, change_dates = load_data(start_date, end_date)
+    index_df, constituents_df, changes_df = load_data(start_date, end_date, index_name)
 
     if index_df.empty:
         st.warning("No index data available for selected date range.")
         return
 
-    render_performance_chart(index_df, change_dates)
-    render_composition_view(constituents_df)
-    render_summary_metrics(index_df, change_dates)
+    render_performance_chart(index_df, changes_df)
+    render_composition_view(constituents_df, changes_df)
+    render_summary_metrics(index_df, changes_df)
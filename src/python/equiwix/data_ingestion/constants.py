@@ -0,0 +1,12 @@
+from ..util import Date
+
+YFINANCE_START_OF_TIME = Date('2023-07-01')
+
+# Where the synced rows are written: the yfinance_ticker_data table, the Parquet store or both
+STORAGES = ('sqlite', 'parquet', 'both')
+
+# Number of days the stored shares outstanding of a ticker are reused for before being refetched
+DEFAULT_SHARES_TTL_DAYS = 7
+
+# Size of the provider cache above which the least recently used files are evicted
+DEFAULT_MAX_CACHE_BYTES = 1024**3
@@ -0,0 +1,224 @@
+"""
+Columnar Parquet store of the raw ticker price history.
+
+Optional alternative to the row-oriented `yfinance_ticker_data` SQLite table for analytic reads.
+The rows of each source are stored in a Parquet dataset of their own, partitioned by year and month
+of their date:
+
+    <parquet path>/<source>_ticker_data/year=YYYY/month=MM/*.parquet
+
+Reads only open the partitions of the requested date range, only decode the requested columns and
+push the date/ticker filters down to the Parquet row groups. Requires pyarrow
+(`pip install equiwix[parquet]`).
+"""
+
+import itertools
+import os
+import time
+from glob import glob
+
+import pandas as pd
+
+from ..constants import DEFAULT_SOURCE, WRITE_MODES
+from ..util import Date, get_equiwix_home
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    from pyarrow import fs
+except ImportError:
+    pa = None
+
+PARQUET_PATH_ENV_VAR = 'EQUIWIX_PARQUET_PATH'
+
+_file_counter = itertools.count()
+
+
+def get_parquet_path():
+    """Return the root dir of the Parquet datasets, overridable with `EQUIWIX_PARQUET_PATH`."""
+    parquet_path = os.environ.get(PARQUET_PATH_ENV_VAR)
+    if parquet_path:
+        return parquet_path
+
+    return f'{get_equiwix_home()}/parquet'
+
+
+class ParquetPriceStore:
+    """
+    Parquet dataset holding the rows of `YFinanceTickerData` of a source.
+
+    Rows hold the ticker symbols rather than the ids of the `ticker` dimension, so that the dataset
+    can be read on its own. Parquet dictionary-encodes them anyway.
+
+    Every `write` adds one file per written partition. `compact` then merges the files of the
+    written partitions into one, keeping the last written row of each (ticker, datetime_utc), so
+    that re-synced rows overwrite the previous ones.
+    """
+
+    key_columns = ['ticker', 'datetime_utc']
+
+    def __init__(self, root=None, source=DEFAULT_SOURCE):
+        """
+        :param root: Root dir of the datasets, defaults to `get_parquet_path()`.
+        :param source: Name of the market data provider the rows are synced from.
+        """
+        if pa is None:
+            raise ImportError(
+                'pyarrow is required by the Parquet store: pip install equiwix[parquet]'
+            )
+
+        self.source = source
+        self.root = os.path.join(
+            get_parquet_path() if root is None else root, f'{source}_ticker_data'
+        )
+        self.schema = pa.schema(
+            [
+                ('ticker', pa.string()),
+                ('datetime_utc', pa.string()),
+                ('date', pa.string()),
+                ('open', pa.float64()),
+                ('high', pa.float64()),
+                ('low', pa.float64()),
+                ('close', pa.float64()),
+                ('num_shares_outstanding', pa.int64()),
+            ]
+        )
+        self._written = set()
+
+    @property
+    def columns(self):
+        return self.schema.names
+
+    def _partition_path(self, year, month):
+        return os.path.join(self.root, f'year={year:04d}', f'month={month:02d}')
+
+    def _new_file_path(self, partition_path):
+        # File names sort in write order, which `compact` relies on.
+        return os.path.join(
+            partition_path, f'part-{time.time_ns():020d}-{next(_file_counter):06d}.parquet'
+        )
+
+    def _to_arrow(self, data):
+        return pa.Table.from_pandas(data[self.columns], schema=self.schema, preserve_index=False)
+
+    def _get_rows_to_write(self, data, write_mode):
+        """Return the rows of `data` to write in `write_mode`, given the rows already stored."""
+        stored = self.read(
+            data['date'].min(), data['date'].max(), tickers=data['ticker'].unique()
+        ).drop_duplicates(self.key_columns, keep='last')
+
+        if write_mode == 'insert':
+            keys = pd.concat([stored[self.key_columns], data[self.key_columns]])
+            duplicated = keys[keys.duplicated()]
+            if len(duplicated) > 0:
+                raise ValueError(
+                    f'{len(duplicated)} rows already stored, e.g. {tuple(duplicated.iloc[0])}, '
+                    f'use an upsert write_mode to overwrite them'
+                )
+            return data
+
+        # upsert_changed: Rows which are new or whose values differ from the stored ones
+        merged = data.merge(
+            stored, on=self.key_columns, how='left', suffixes=('', '_stored'), indicator=True
+        )
+        changed = merged['_merge'] == 'left_only'
+        for col in self.columns:
+            if col in self.key_columns:
+                continue
+            new, old = merged[col], merged[f'{col}_stored']
+            changed |= (new != old) & ~(new.isna() & old.isna())
+        return data[changed.to_numpy()]
+
+    def write(self, data, write_mode='upsert'):
+        """
+        Append the rows of `data`, a DataFrame with the columns of `YFinanceTickerData`.
+
+        :param write_mode: One of `WRITE_MODES`, with the conflict semantics of the DB writes:
+            `insert` raises a ValueError if any row is already stored, `upsert` overwrites the
+            stored rows (on compaction) and `upsert_changed` only writes the new or changed rows.
+        """
+        if write_mode not in WRITE_MODES:
+            raise ValueError(f'Invalid write_mode: {write_mode}')
+        if write_mode != 'upsert' and len(data) > 0:
+            data = self._get_rows_to_write(data, write_mode)
+
+        months = data['date'].str[:7]
+        for month, part in data.groupby(months, sort=True):
+            partition_path = self._partition_path(int(month[:4]), int(month[5:]))
+            os.makedirs(partition_path, exist_ok=True)
+            pq.write_table(self._to_arrow(part), self._new_file_path(partition_path))
+            self._written.add(partition_path)
+
+    def compact(self):
+        """Merge the files of the partitions written since the last compaction."""
+        for partition_path in sorted(self._written):
+            files = sorted(glob(os.path.join(partition_path, '*.parquet')))
+            if len(files) <= 1:
+                continue
+
+            data = pa.concat_tables([pq.read_table(f, schema=self.schema) for f in files])
+            data = (
+                data.to_pandas()
+                .drop_duplicates(self.key_columns, keep='last')
+                .sort_values(['date', 'ticker'])
+            )
+
+            # Written under a temporary name so that readers never see a partial file
+            new_file_path = self._new_file_path(partition_path)
+            pq.write_table(self._to_arrow(data), f'{new_file_path}.tmp')
+            os.replace(f'{new_file_path}.tmp', new_file_path)
+            for f in files:
+                os.remove(f)
+
+        self._written.clear()
+
+    def _get_files(self, start_date=None, end_date=None):
+        """Return the files of the partitions overlapping [start_date, end_date]."""
+        first_month = (0, 0) if start_date is None else (start_date.year, start_date.month)
+        last_month = (9999, 12) if end_date is None else (end_date.year, end_date.month)
+
+        files = []
+        for partition_path in glob(os.path.join(self.root, 'year=*', 'month=*')):
+            year_dir, month_dir = partition_path.split(os.sep)[-2:]
+            month = (int(year_dir.split('=')[1]), int(month_dir.split('=')[1]))
+            if first_month <= month <= last_month:
+                files.extend(glob(os.path.join(partition_path, '*.parquet')))
+
+        return sorted(files)
+
+    def read(self, start_date=None, end_date=None, columns=None, tickers=None):
+        """
+        Read the rows with dates in [start_date, end_date] into a DataFrame.
+
+        :param columns: Columns to read, defaults to all of them.
+        :param tickers: Only read the rows of these tickers if given.
+        """
+        start_date = None if start_date is None else Date(start_date)
+        end_date = None if end_date is None else Date(end_date)
+        columns = self.columns if columns is None else list(columns)
+
+        files = self._get_files(start_date, end_date)
+        if not files:
+            return pd.DataFrame(columns=columns)
+
+        dataset = ds.dataset(
+            files,
+            schema=self.schema,
+            format='parquet',
+            filesystem=fs.LocalFileSystem(use_mmap=True),
+        )
+
+        filters = []
+        if start_date is not None:
+            filters.append(ds.field('date') >= str(start_date))
+        if end_date is not None:
+            filters.append(ds.field('date') <= str(end_date))
+        if tickers is not None:
+            filters.append(ds.field('ticker').isin(list(tickers)))
+
+        qry_filter = None
+        for f in filters:
+            qry_filter = f if qry_filter is None else qry_filter & f
+
+        return dataset.to_table(columns=columns, filter=qry_filter).to_pandas()
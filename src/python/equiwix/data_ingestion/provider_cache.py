@@ -0,0 +1,199 @@
+"""
+On-disk cache of the market data provider responses.
+
+Daily bars of closed periods never change, yet development runs, backfill retries and reruns after
+a crash fetch them again and again. `CachedProvider` wraps a provider and stores the bars returned
+for each (ticker, interval, date range) in a gzip-compressed pickle named after the hash of the
+key, so that a range requested again is served from disk without any provider call:
+
+    <cache path>/<sha256 of provider key|ticker|interval|start|end>.pkl.gz
+
+The provider key is the `cache_key` of the wrapped provider, e.g. the dir of the dumps and their
+last modification for the `file` provider.
+
+Only ranges ending before the current New York date are cached, as the bars of the current day
+are not final yet. Tickers without any bar in a range are not cached either: providers return
+nothing for throttled or failed requests too, e.g. yfinance for the tickers of a batch download,
+so their ranges are fetched again by the next sync. The cache is bounded in size, the least
+recently used files being evicted.
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+
+import pandas as pd
+
+from ..util import Date, get_equiwix_home
+from .constants import DEFAULT_MAX_CACHE_BYTES
+from .providers import MarketDataProvider
+
+PROVIDER_CACHE_PATH_ENV_VAR = 'EQUIWIX_PROVIDER_CACHE_PATH'
+
+CACHE_FILE_SUFFIX = '.pkl.gz'
+
+
+def get_provider_cache_path():
+    """Return the dir of the provider cache, overridable with `EQUIWIX_PROVIDER_CACHE_PATH`."""
+    cache_path = os.environ.get(PROVIDER_CACHE_PATH_ENV_VAR)
+    if cache_path:
+        return cache_path
+
+    return f'{get_equiwix_home()}/provider_cache'
+
+
+class CachedProvider(MarketDataProvider):
+    """
+    Drop-in wrapper of a market data provider caching its `history` responses on disk.
+
+    The shares outstanding are not closed-period values and are passed through, see
+    `SharesOutstandingCache` for their caching.
+
+    :param provider: Wrapped provider, e.g. `YFinanceProvider`.
+    :param root: Dir of the cache files, defaults to `get_provider_cache_path()`.
+    :param max_bytes: Size above which the least recently used files are evicted.
+    :param interval: Interval of the bars returned by the provider, part of the cache key.
+    """
+
+    def __init__(self, provider, root=None, max_bytes=DEFAULT_MAX_CACHE_BYTES, interval='1d'):
+        self.provider = provider
+        self.root = get_provider_cache_path() if root is None else root
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_bypassed = 0
+        self.num_evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @property
+    def name(self):
+        return self.provider.name
+
+    @property
+    def supports_batch(self):
+        return getattr(self.provider, 'supports_batch', True)
+
+    @property
+    def local(self):
+        return getattr(self.provider, 'local', False)
+
+    @property
+    def cache_key(self):
+        return self.provider.cache_key
+
+    def _get_path(self, ticker, start, end):
+        key = f'{self.provider.cache_key}|{ticker}|{self.interval}|{start}|{end}'
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.root, f'{digest}{CACHE_FILE_SUFFIX}')
+
+    @staticmethod
+    def is_closed(end):
+        """Whether the bars of a range ending on `end` (exclusive) are all final."""
+        return end <= Date(pd.Timestamp.now('America/New_York'))
+
+    def _read(self, path):
+        try:
+            hist = pd.read_pickle(path, compression='gzip')
+            # The modification time orders the files for the LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            # Not cached or evicted concurrently
+            return None
+
+        return hist
+
+    def _write(self, path, hist):
+        # Written to a temporary file first so that concurrent readers never see partial files
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        hist.to_pickle(tmp_path, compression='gzip')
+        os.replace(tmp_path, path)
+
+    def history(self, tickers, start, end):
+        start, end = Date(start), Date(end)
+        if not self.is_closed(end):
+            with self._lock:
+                self.num_bypassed += len(tickers)
+            return self.provider.history(tickers, start, end)
+
+        result, misses = {}, []
+        for ticker in tickers:
+            hist = self._read(self._get_path(ticker, start, end))
+            if hist is None:
+                misses.append(ticker)
+            else:
+                result[ticker] = hist
+
+        with self._lock:
+            self.num_hits += len(tickers) - len(misses)
+            self.num_misses += len(misses)
+
+        if misses:
+            fetched = self.provider.history(misses, start, end)
+            for ticker, hist in fetched.items():
+                if not hist.empty:
+                    self._write(self._get_path(ticker, start, end), hist)
+            result.update(fetched)
+            self.evict()
+
+        return result
+
+    def shares_outstanding(self, ticker):
+        return self.provider.shares_outstanding(ticker)
+
+    def shares_outstanding_history(self, ticker):
+        return self.provider.shares_outstanding_history(ticker)
+
+    def _get_files(self):
+        files = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(CACHE_FILE_SUFFIX):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def evict(self):
+        """Delete the least recently used files until the cache fits in `max_bytes`."""
+        files = sorted(self._get_files())
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, path in files:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            size -= file_size
+            with self._lock:
+                self.num_evictions += 1
+
+    def clear(self):
+        for _, _, path in self._get_files():
+            os.remove(path)
+
+    def stats(self):
+        """Return the hit/miss counters of this instance and the current size of the cache."""
+        files = self._get_files()
+        num_lookups = self.num_hits + self.num_misses
+        return {
+            'hits': self.num_hits,
+            'misses': self.num_misses,
+            'hit_rate': self.num_hits / num_lookups if num_lookups else None,
+            'bypassed': self.num_bypassed,
+            'evictions': self.num_evictions,
+            'files': len(files),
+            'bytes': sum(file_size for _, file_size, _ in files),
+            'max_bytes': self.max_bytes,
+        }
+
+    def report(self):
+        stats = self.stats()
+        hit_rate = 'n/a' if stats['hit_rate'] is None else f'{stats["hit_rate"]:.1%}'
+        return (
+            f'Provider cache {self.root}: {stats["hits"]} hits, {stats["misses"]} misses '
+            f'(hit rate {hit_rate}), {stats["bypassed"]} open-period lookups bypassed, '
+            f'{stats["evictions"]} evictions, {stats["files"]} files, '
+            f'{stats["bytes"] / 1024**2:.1f}/{stats["max_bytes"] / 1024**2:.0f} MiB'
+        )
@@ -0,0 +1,265 @@
+"""
+Market data providers of the ticker data sync.
+
+A provider fetches the daily OHLC bars and the shares outstanding of tickers, see
+`MarketDataProvider`. The sync only depends on this interface, so the ticker data table, and the
+index computers reading it, are fed the same way from any registered provider. The rows are keyed
+by the name of their provider, their source, which the computers and selectors take:
+
+    get_provider('file', root='/path/to/vendor/dump')
+
+The data libraries, pandas included, are imported by the fetches only, so that the commands list
+the registered providers without loading them.
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from glob import glob
+
+# Time zone of the exchange the daily bars are dated in
+BARS_TZ = 'America/New_York'
+
+# First date of the dated shares outstanding fetched from yfinance
+SHARES_HISTORY_START = '1990-01-01'
+
+# Columns of the dump files -> columns of the bars returned by the providers
+BAR_COLUMNS = {'date': 'Date', 'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close'}
+
+PROVIDERS = {}
+
+
+class MarketDataProvider(ABC):
+    # Name the provider is registered under, the source of the rows synced from it
+    name = None
+    # Whether `history` accepts several tickers per call
+    supports_batch = True
+    # Whether the data is read from local files, whose shares outstanding are then read on every
+    # sync instead of being refetched once stale
+    local = False
+
+    @abstractmethod
+    def history(self, tickers, start, end):
+        """
+        Fetch daily OHLC bars for `tickers` in [start, end).
+
+        :return: Dict of ticker -> DataFrame with Open, High, Low and Close columns indexed by a
+            tz-aware `Date` index. Tickers without any data are omitted.
+        """
+        pass
+
+    @abstractmethod
+    def shares_outstanding(self, ticker):
+        """Return the current number of shares outstanding of `ticker`, None if unknown."""
+        pass
+
+    def shares_outstanding_history(self, ticker):
+        """
+        Return the dated shares outstanding of `ticker`, a Series of the values indexed by the ISO
+        dates they were observed on, or None if the provider only knows the current value.
+        """
+        return None
+
+    @property
+    def cache_key(self):
+        """
+        Identity of the data served by the provider, part of the keys of `CachedProvider`, so that
+        providers of the same class serving different data don't share their cached bars.
+        """
+        return type(self).__name__
+
+
+def register_provider(name):
+    """Class decorator registering a provider under `name`."""
+
+    def register(cls):
+        cls.name = name
+        PROVIDERS[name] = cls
+        return cls
+
+    return register
+
+
+def get_provider(name, **kwargs):
+    """Return an instance of the provider registered under `name`."""
+    if name not in PROVIDERS:
+        raise ValueError(f'Unknown provider {name}, expected one of {list(PROVIDERS)}')
+    return PROVIDERS[name](**kwargs)
+
+
+@register_provider('yfinance')
+class YFinanceProvider(MarketDataProvider):
+    """
+    Thin wrapper around the yfinance API.
+
+    yfinance is imported on the first fetch, the commands which don't sync from it (compute
+    actions, other providers) don't pay for its import.
+    """
+
+    def history(self, tickers, start, end):
+        import yfinance as yf
+
+        if len(tickers) == 1:
+            hist = yf.Ticker(tickers[0]).history(start=start, end=end, back_adjust=True)
+            return {} if hist.empty else {tickers[0]: hist}
+
+        data = yf.download(
+            list(tickers),
+            start=start,
+            end=end,
+            back_adjust=True,
+            group_by='ticker',
+            ignore_tz=False,
+            threads=False,
+            progress=False,
+        )
+        if data is None or data.empty:
+            return {}
+
+        result = {}
+        for ticker in tickers:
+            if ticker not in data.columns.get_level_values(0):
+                continue
+            hist = data[ticker].dropna(how='all')
+            if not hist.empty:
+                result[ticker] = hist
+        return result
+
+    def shares_outstanding(self, ticker):
+        import yfinance as yf
+
+        return yf.Ticker(ticker).info.get('sharesOutstanding', None)
+
+    def shares_outstanding_history(self, ticker):
+        import yfinance as yf
+
+        # Counts reported in the filings, yfinance only returns the last 18 months by default
+        shares = yf.Ticker(ticker).get_shares_full(start=SHARES_HISTORY_START)
+        if shares is None or shares.empty:
+            return None
+
+        # Several counts can be reported on one date, the last one applies
+        shares = shares.sort_index()
+        shares = shares.set_axis(shares.index.tz_convert(BARS_TZ).strftime('%Y-%m-%d'))
+        return shares[~shares.index.duplicated(keep='last')].astype('int64')
+
+
+@register_provider('file')
+class FileProvider(MarketDataProvider):
+    """
+    Provider reading a local directory of vendor dumps, for bulk backfills and offline runs.
+
+    Every CSV (optionally gzipped) and Parquet file under `root` is read, with one row per ticker
+    and date and the columns below (case-insensitive, extra columns are ignored):
+
+        ticker, date, open, high, low, close[, shares_outstanding]
+
+    The files are parsed once, in a single vectorized pass on the first call, and the bars are then
+    served from memory. The non-null shares outstanding of each date are returned as the dated
+    history of the ticker, so that past market caps don't use its latest value.
+
+    :param root: Dir of the dump files.
+    """
+
+    columns = ['ticker', 'date', 'open', 'high', 'low', 'close', 'shares_outstanding']
+    local = True
+
+    def __init__(self, root):
+        self.root = root
+        self._bars = None
+        self._shares = None
+        self._cache_key = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_key(self):
+        """
+        The dump dir and the last modification of its files, so that the bars cached from other
+        dumps, or from the dump before it was updated, are not served.
+        """
+        if self._cache_key is None:
+            files = self._get_files()
+            mtime = max((os.path.getmtime(path) for path in files), default=0)
+            self._cache_key = f'{type(self).__name__}:{os.path.abspath(self.root)}:{mtime}'
+        return self._cache_key
+
+    def _get_files(self):
+        patterns = ('*.csv', '*.csv.gz', '*.parquet')
+        return sorted(
+            path
+            for pattern in patterns
+            for path in glob(os.path.join(self.root, '**', pattern), recursive=True)
+        )
+
+    def _read_file(self, path):
+        import pandas as pd
+
+        if path.endswith('.parquet'):
+            data = pd.read_parquet(path)
+        else:
+            data = pd.read_csv(
+                path, usecols=lambda col: col.lower() in self.columns, dtype={'ticker': str}
+            )
+        data = data.rename(columns=str.lower)
+        return data[[col for col in self.columns if col in data.columns]]
+
+    def _load(self):
+        import pandas as pd
+
+        with self._lock:
+            if self._bars is not None:
+                return
+
+            files = self._get_files()
+            if not files:
+                raise FileNotFoundError(f'No CSV or Parquet files under {self.root}')
+
+            data = pd.concat([self._read_file(path) for path in files], ignore_index=True)
+            if 'shares_outstanding' not in data.columns:
+                data['shares_outstanding'] = None
+
+            data['date'] = pd.to_datetime(data['date'], format='ISO8601')
+            data['date'] = data['date'].dt.tz_localize(BARS_TZ)
+            # Rows of a later file override the ones of the same ticker and date
+            data = data.drop_duplicates(['ticker', 'date'], keep='last').sort_values(
+                ['ticker', 'date'], ignore_index=True
+            )
+
+            shares = data.dropna(subset='shares_outstanding')
+            shares = shares.set_index(shares['date'].dt.strftime('%Y-%m-%d'))
+            self._shares = {
+                ticker: rows['shares_outstanding'].astype('int64')
+                for ticker, rows in shares.groupby('ticker')
+            }
+
+            bars = data.rename(columns=BAR_COLUMNS).set_index('Date')
+            self._bars = {
+                ticker: hist[['Open', 'High', 'Low', 'Close']]
+                for ticker, hist in bars.groupby('ticker')
+            }
+
+    def history(self, tickers, start, end):
+        import pandas as pd
+
+        self._load()
+        start = pd.Timestamp(start).tz_localize(BARS_TZ)
+        end = pd.Timestamp(end).tz_localize(BARS_TZ)
+
+        result = {}
+        for ticker in tickers:
+            hist = self._bars.get(ticker)
+            if hist is None:
+                continue
+            hist = hist.iloc[hist.index.searchsorted(start) : hist.index.searchsorted(end)]
+            if not hist.empty:
+                result[ticker] = hist
+        return result
+
+    def shares_outstanding(self, ticker):
+        self._load()
+        shares = self._shares.get(ticker)
+        return None if shares is None else int(shares.iloc[-1])
+
+    def shares_outstanding_history(self, ticker):
+        self._load()
+        return self._shares.get(ticker)
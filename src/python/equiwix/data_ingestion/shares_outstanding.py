@@ -0,0 +1,221 @@
+"""
+Point-in-time history of the shares outstanding of the tickers.
+
+Fetching the shares outstanding is the slowest and most rate-limited call of the sync, while the
+value changes at most quarterly. Values are thus stored in the `shares_outstanding` table along with
+the time they were fetched, and only refetched from the provider once older than a TTL. A fetched
+value differing from the stored one starts a new row from the fetch date, so that the market caps
+of past dates use the share count of their date rather than the latest one. Providers knowing the
+dated values, e.g. vendor dumps or the filings reported by yfinance, replace the rows of the span
+they cover with one row per change. The dates before the first known value have no shares
+outstanding, and so no market cap, rather than a later count.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..db import get_session
+from ..db.data_version import DataVersionDAO
+from ..db.tables import SharesOutstanding, Ticker
+from ..db.ticker_dim import TickerDAO
+from .constants import DEFAULT_SHARES_TTL_DAYS
+
+HISTORY_COLUMNS = ['ticker', 'start_date', 'num_shares_outstanding', 'fetched_at_utc']
+
+
+class SharesOutstandingDAO:
+    @property
+    def table(self):
+        return SharesOutstanding
+
+    def get_history(self, session, tickers=None):
+        """Return the history rows of `tickers` (all if None) sorted by ticker and start_date."""
+        tbl = self.table
+        qry = select(
+            Ticker.ticker, tbl.start_date, tbl.num_shares_outstanding, tbl.fetched_at_utc
+        ).join(Ticker, Ticker.ticker_id == tbl.ticker_id)
+        if tickers is not None:
+            qry = qry.where(Ticker.ticker.in_(list(tickers)))
+
+        history = pd.DataFrame(session.execute(qry).all(), columns=HISTORY_COLUMNS)
+        return history.sort_values(['ticker', 'start_date'], ignore_index=True)
+
+    def record(self, session, fetched, fetched_at):
+        """
+        Record the `fetched` dict of ticker -> shares outstanding fetched at `fetched_at` (UTC
+        datetime), in the transaction of `session`.
+
+        Values equal to the latest ones of the tickers only refresh their fetch time, others start
+        a new row from the fetch date.
+        """
+        if not fetched:
+            return
+
+        tbl = self.table
+        fetched_at_utc = fetched_at.strftime('%Y-%m-%d %H:%M:%S')
+        fetch_date = fetched_at_utc[:10]
+
+        tickers = list(fetched)
+        ticker_ids = TickerDAO().get_ids(session, tickers, create=True)
+        latest = self.get_history(session, tickers).groupby('ticker').last()
+
+        new_rows = []
+        for ticker, ticker_id in zip(tickers, ticker_ids):
+            shares = fetched[ticker]
+            if ticker in latest.index and latest.loc[ticker, 'num_shares_outstanding'] == shares:
+                session.execute(
+                    update(tbl)
+                    .where(
+                        tbl.ticker_id == int(ticker_id),
+                        tbl.start_date == latest.loc[ticker, 'start_date'],
+                    )
+                    .values(fetched_at_utc=fetched_at_utc)
+                )
+            else:
+                new_rows.append(
+                    {
+                        'ticker_id': int(ticker_id),
+                        'start_date': fetch_date,
+                        'num_shares_outstanding': shares,
+                        'fetched_at_utc': fetched_at_utc,
+                    }
+                )
+
+        if new_rows:
+            qry = sqlite_insert(tbl)
+            session.execute(
+                qry.on_conflict_do_update(
+                    index_elements=['ticker_id', 'start_date'],
+                    set_={
+                        'num_shares_outstanding': qry.excluded.num_shares_outstanding,
+                        'fetched_at_utc': qry.excluded.fetched_at_utc,
+                    },
+                ),
+                new_rows,
+            )
+
+        DataVersionDAO().bump(session, tbl)
+
+    def record_history(self, session, histories, fetched_at):
+        """
+        Replace the rows of the tickers within the span of their provided history, in the
+        transaction of `session`.
+
+        :param histories: Dict of ticker -> (first date, last date, DataFrame of the start_date and
+            num_shares_outstanding of the rows of the span), the dates being ISO date strings.
+        :param fetched_at: UTC datetime of the rows.
+        """
+        if not histories:
+            return
+
+        tbl = self.table
+        fetched_at_utc = fetched_at.strftime('%Y-%m-%d %H:%M:%S')
+
+        tickers = list(histories)
+        ticker_ids = TickerDAO().get_ids(session, tickers, create=True)
+        new_rows = []
+        for ticker, ticker_id in zip(tickers, ticker_ids):
+            first_date, last_date, rows = histories[ticker]
+            session.execute(
+                delete(tbl).where(
+                    tbl.ticker_id == int(ticker_id), tbl.start_date.between(first_date, last_date)
+                )
+            )
+            new_rows.extend(
+                {
+                    'ticker_id': int(ticker_id),
+                    'start_date': start_date,
+                    'num_shares_outstanding': int(shares),
+                    'fetched_at_utc': fetched_at_utc,
+                }
+                for start_date, shares in zip(rows['start_date'], rows['num_shares_outstanding'])
+            )
+
+        session.execute(sqlite_insert(tbl), new_rows)
+        DataVersionDAO().bump(session, tbl)
+
+
+class SharesOutstandingCache:
+    def __init__(self, tickers, ttl_days=DEFAULT_SHARES_TTL_DAYS):
+        """
+        Shares outstanding of `tickers` over a sync, read from the history table and refetched
+        once stale.
+
+        :param ttl_days: Number of days after which a fetched value is stale.
+        """
+        self.now = datetime.now(timezone.utc).replace(tzinfo=None)
+        self.fetched = {}
+        # Dated values set from the provider, see `set_history`
+        self.provided = {}
+
+        session = get_session()
+        history = SharesOutstandingDAO().get_history(session, tickers)
+        session.close()
+
+        self.history = {ticker: rows for ticker, rows in history.groupby('ticker')}
+        min_fetched_at = (self.now - timedelta(days=ttl_days)).strftime('%Y-%m-%d %H:%M:%S')
+        self.fresh = set(history.loc[history['fetched_at_utc'] >= min_fetched_at, 'ticker'])
+
+    def is_stale(self, ticker):
+        return ticker not in self.fresh
+
+    def set_fetched(self, ticker, shares):
+        """Set the value of `ticker` fetched during the sync, applying from today."""
+        self.fetched[ticker] = shares
+
+    def set_history(self, ticker, shares):
+        """
+        Set the dated `shares` of `ticker` from the provider, a Series of values indexed by ISO
+        date, which replace the stored rows of the dates they span.
+        """
+        changed = shares.ne(shares.shift()).to_numpy()
+        rows = pd.DataFrame(
+            {
+                'ticker': ticker,
+                'start_date': shares.index[changed],
+                'num_shares_outstanding': shares.to_numpy()[changed].tolist(),
+                'fetched_at_utc': self.now.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+        )
+        first_date, last_date = shares.index[0], shares.index[-1]
+
+        stored = self.history.get(ticker, pd.DataFrame(columns=HISTORY_COLUMNS))
+        outside = (stored['start_date'] < first_date) | (stored['start_date'] > last_date)
+        self.history[ticker] = pd.concat([stored[outside], rows]).sort_values(
+            'start_date', ignore_index=True
+        )
+        self.provided[ticker] = (first_date, last_date, rows)
+
+    def get(self, ticker, dates):
+        """
+        Return the array of the shares outstanding of `ticker` on `dates` (ISO date strings), None
+        on the dates before its first known value.
+        """
+        rows = self.history.get(ticker, pd.DataFrame(columns=HISTORY_COLUMNS))
+        start_dates = rows['start_date'].tolist()
+        values = rows['num_shares_outstanding'].tolist()
+        if ticker in self.fetched and (not values or values[-1] != self.fetched[ticker]):
+            fetch_date = self.now.strftime('%Y-%m-%d')
+            if start_dates and start_dates[-1] == fetch_date:
+                values[-1] = self.fetched[ticker]
+            else:
+                start_dates.append(fetch_date)
+                values.append(self.fetched[ticker])
+
+        if not values:
+            raise ValueError(f'No shares outstanding for {ticker}')
+
+        # Unknown (None) before the first value, whose count on the earlier dates can differ
+        idx = np.searchsorted(
+            np.asarray(start_dates, dtype=str), np.asarray(dates, dtype=str), side='right'
+        )
+        return np.asarray([None, *values], dtype=object)[idx]
+
+    def write(self, session):
+        """Record the values fetched during the sync in the transaction of `session`."""
+        SharesOutstandingDAO().record(session, self.fetched, self.now)
+        SharesOutstandingDAO().record_history(session, self.provided, self.now)
@@ -0,0 +1,174 @@
+"""
+Gap detection of the ticker data sync.
+
+The synced (ticker, date) pairs are laid out in a boolean ticker x trading day matrix, from which
+the trading days missing for each ticker are found in one pass: days missed by the daily runs, the
+whole history of the tickers newly added to the universe and the ranges of failed fetches. The
+missing days of a ticker are coalesced into contiguous ranges, and the tickers sharing a range are
+fetched together.
+
+Some tickers have no data on some trading days, e.g. before their IPO. The per-ticker watermarks of
+`TickerSyncWatermark` record the span already requested from the provider, whose missing days
+are not fetched again.
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..db.tables import Ticker, TickerSyncWatermark, YFinanceTickerData
+from ..db.ticker_dim import TickerDAO
+from ..trading_calendar import get_trading_calendar
+
+
+def get_missing_ranges(tickers, trading_days, synced, watermarks):
+    """
+    Return the contiguous ranges of trading days missing for each of `tickers`.
+
+    :param trading_days: Sorted datetime64[D] array of the trading days to check.
+    :param synced: DataFrame with the ticker and date columns of the synced rows.
+    :param watermarks: DataFrame with ticker, synced_from and synced_through columns.
+    :return: DataFrame with ticker, start_date and end_date (inclusive) columns, one row per range.
+    """
+    tickers = pd.Index(tickers)
+    days = pd.Index(trading_days.astype(str))
+    missing = np.ones((len(tickers), len(days)), dtype=bool)
+
+    ticker_idx = tickers.get_indexer(synced['ticker'])
+    day_idx = days.get_indexer(synced['date'])
+    is_known = (ticker_idx >= 0) & (day_idx >= 0)
+    missing[ticker_idx[is_known], day_idx[is_known]] = False
+
+    watermarks = watermarks[watermarks['ticker'].isin(tickers)]
+    wm_idx = tickers.get_indexer(watermarks['ticker'])
+    first = days.searchsorted(watermarks['synced_from'], side='left')
+    last = days.searchsorted(watermarks['synced_through'], side='right')
+    positions = np.arange(len(days))
+    missing[wm_idx] &= (positions < first[:, None]) | (positions >= last[:, None])
+
+    # Starts and ends of the runs of missing days
+    padded = np.pad(missing.view(np.int8), ((0, 0), (1, 1)))
+    diff = np.diff(padded, axis=1)
+    start_ticker, start_day = np.nonzero(diff == 1)
+    _, end_day = np.nonzero(diff == -1)
+
+    return pd.DataFrame(
+        {
+            'ticker': tickers.to_numpy()[start_ticker],
+            'start_date': days.to_numpy()[start_day],
+            'end_date': days.to_numpy()[end_day - 1],
+        }
+    )
+
+
+def get_synced_dates(session, source, start_date, end_date, parquet_store=None):
+    """
+    Return the distinct (ticker, date) pairs of the ticker data of `source` in [start_date,
+    end_date], read from `parquet_store` if given or from the `yfinance_ticker_data` table.
+    """
+    if parquet_store is not None:
+        synced = parquet_store.read(start_date, end_date, columns=['ticker', 'date'])
+        return synced.drop_duplicates(ignore_index=True)
+
+    tbl = YFinanceTickerData
+    qry = (
+        select(Ticker.ticker, tbl.date)
+        .join(Ticker, Ticker.ticker_id == tbl.ticker_id)
+        .where(tbl.date.between(str(start_date), str(end_date)), tbl.source == source)
+        .distinct()
+    )
+    return pd.DataFrame(session.execute(qry).all(), columns=['ticker', 'date'])
+
+
+def get_first_synced_dates(session, source, tickers, parquet_store=None):
+    """
+    Return the dict of ticker -> first date of the ticker data of `source` of `tickers`, read from
+    `parquet_store` if given or from the `yfinance_ticker_data` table. Tickers without any data
+    are omitted.
+    """
+    if parquet_store is not None:
+        synced = parquet_store.read(columns=['ticker', 'date'], tickers=tickers)
+        return synced.groupby('ticker')['date'].min().to_dict()
+
+    tbl = YFinanceTickerData
+    qry = (
+        select(Ticker.ticker, func.min(tbl.date))
+        .join(Ticker, Ticker.ticker_id == tbl.ticker_id)
+        .where(Ticker.ticker.in_(list(tickers)), tbl.source == source)
+        .group_by(Ticker.ticker)
+    )
+    return dict(session.execute(qry).all())
+
+
+class SyncWatermarkDAO:
+    def __init__(self, source):
+        self.source = source
+
+    @property
+    def table(self):
+        return TickerSyncWatermark
+
+    def get(self, session):
+        """Return the watermarks as a ticker, synced_from, synced_through DataFrame."""
+        tbl = self.table
+        qry = (
+            select(Ticker.ticker, tbl.synced_from, tbl.synced_through)
+            .join(Ticker, Ticker.ticker_id == tbl.ticker_id)
+            .where(tbl.source == self.source)
+        )
+        return pd.DataFrame(
+            session.execute(qry).all(), columns=['ticker', 'synced_from', 'synced_through']
+        )
+
+    def merge(self, session, tickers, start_date, end_date):
+        """
+        Merge the range [start_date, end_date], requested from the provider for `tickers`, into
+        their watermarks.
+
+        A watermark only covers a contiguous span of trading days, so ranges disjoint from the
+        current watermark of a ticker are dropped. Its days are checked again by the next sync.
+        """
+        if len(tickers) == 0:
+            return
+
+        calendar = get_trading_calendar()
+        start_date, end_date = str(start_date), str(end_date)
+        watermarks = self.get(session).set_index('ticker')
+
+        rows = []
+        ticker_ids = TickerDAO().get_ids(session, tickers, create=True)
+        for ticker, ticker_id in zip(tickers, ticker_ids):
+            synced_from, synced_through = start_date, end_date
+            if ticker in watermarks.index:
+                wm_from, wm_through = watermarks.loc[ticker]
+                # Overlapping or adjacent, i.e. no trading day in between
+                if start_date <= str(calendar.next(wm_through)) and wm_from <= str(
+                    calendar.next(end_date)
+                ):
+                    synced_from = min(synced_from, wm_from)
+                    synced_through = max(synced_through, wm_through)
+                else:
+                    continue
+
+            rows.append(
+                {
+                    'source': self.source,
+                    'ticker_id': int(ticker_id),
+                    'synced_from': synced_from,
+                    'synced_through': synced_through,
+                }
+            )
+
+        if rows:
+            qry = sqlite_insert(self.table)
+            session.execute(
+                qry.on_conflict_do_update(
+                    index_elements=['source', 'ticker_id'],
+                    set_={
+                        'synced_from': qry.excluded.synced_from,
+                        'synced_through': qry.excluded.synced_through,
+                    },
+                ),
+                rows,
+            )
@@ -1,56 +1,342 @@
 import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import timedelta
 
+import numpy as np
 import pandas as pd
-import yfinance as yf
 
 from ..base_sync import DataFrameSync
+from ..db import get_session
 from ..db.tables import YFinanceTickerData
+from ..db.ticker_dim import TickerDAO
 from ..ticker_univ import TickerUniv
+from ..trading_calendar import get_trading_calendar
 from ..util import Date
+from .constants import DEFAULT_SHARES_TTL_DAYS, STORAGES
+from .parquet_store import ParquetPriceStore
+from .providers import YFinanceProvider
+from .shares_outstanding import SharesOutstandingCache
+from .sync_gaps import (SyncWatermarkDAO, get_first_synced_dates, get_missing_ranges,
+                        get_synced_dates)
 
-YFINANCE_START_OF_TIME = Date('2023-07-01')
+PRICE_COLUMNS = {'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close'}
+
+
+def call_with_retry(fn, *args, max_retries=3, retry_backoff=1.0):
+    """
+    Call `fn(*args)`, retrying up to `max_retries` times with exponential backoff on failure.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = retry_backoff * 2**attempt
+            logging.warning(f'{fn.__name__}{args} failed ({e}), retrying in {delay:.2f}s')
+            time.sleep(delay)
 
 
 class YFinanceDataSync(DataFrameSync):
+    # The fetches take most of a sync, during which the DB stays writable by the other processes
+    commit_per_chunk = True
+
+    def __init__(
+        self,
+        run_date,
+        sync_start_date=None,
+        write_mode='insert',
+        workers=1,
+        batch_size=1,
+        max_retries=3,
+        retry_backoff=1.0,
+        provider=None,
+        storage='sqlite',
+        shares_ttl_days=DEFAULT_SHARES_TTL_DAYS,
+        fill_gaps=False,
+        keep_data=False,
+    ):
+        """
+        Sync daily OHLC and shares outstanding data of the ticker universe from a market data
+        provider, yfinance by default.
+
+        :param workers: Number of tickers batches fetched concurrently.
+        :param batch_size: Number of tickers fetched per provider call. Only used if the provider
+            supports multi-ticker downloads.
+        :param max_retries: Number of retries per batch/ticker before giving up on it.
+        :param retry_backoff: Base delay in seconds of the exponential backoff between retries.
+        :param provider: Registered `MarketDataProvider`, defaults to `YFinanceProvider`. Its name
+            is the source of the synced rows.
+        :param storage: One of `STORAGES`.
+        :param shares_ttl_days: Number of days the shares outstanding fetched from the provider are
+            reused for before being refetched.
+        :param fill_gaps: Only fetch the trading days of [sync_start_date, run_date] missing from
+            the synced data of each ticker, in as few contiguous ranges as possible. See
+            `sync_gaps`.
+        :param keep_data: Keep the written rows, with their ticker ids, in `synced_data` to hand
+            them over to the index computers without reading them back.
+        """
+        super().__init__(run_date, sync_start_date=sync_start_date, write_mode=write_mode)
+
+        if workers < 1 or batch_size < 1:
+            raise ValueError('workers and batch_size should be >= 1.')
+        if storage not in STORAGES:
+            raise ValueError(f'Invalid storage {storage}, expected one of {STORAGES}')
+
+        self.workers = workers
+        self.batch_size = batch_size if getattr(provider, 'supports_batch', True) else 1
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.provider = YFinanceProvider() if provider is None else provider
+        if self.provider.name is None:
+            raise ValueError(f'{type(self.provider).__name__} is not a registered provider')
+        # The rows are keyed by the provider they are synced from
+        self.source = self.provider.name
+        self.storage = storage
+        self.parquet_store = ParquetPriceStore(source=self.source) if storage != 'sqlite' else None
+        self.shares_ttl_days = shares_ttl_days
+        self.shares_cache = None
+        self.fill_gaps = fill_gaps
+        # Nothing may be missing
+        self.requires_data = not fill_gaps
+        self.tickers = []
+        self.failed_tickers = set()
+        # (ticker, last date) of the ranges fetched without any bar for the ticker
+        self.empty_ranges = []
+        self.keep_data = keep_data
+        self.synced_data = []
+
     @property
     def table(self):
         return YFinanceTickerData
 
-    def get_data_to_sync(self):
-        tickers = TickerUniv().get_tickers(all_univ=True)
-        all_data = []
+    def _write(self, session, data):
+        # Tickers are registered in the dimension whatever the storage, for the computers reading
+        # the Parquet store to resolve them.
+        ticker_ids = TickerDAO().get_ids(session, data['ticker'], create=True)
+        if self.keep_data:
+            self.synced_data.append(data.assign(ticker_id=ticker_ids))
+        if self.storage != 'parquet':
+            rows = data.drop(columns='ticker').assign(ticker_id=ticker_ids, source=self.source)
+            super()._write(session, rows)
 
-        for ticker in tickers:
-            try:
-                stock = yf.Ticker(ticker)
+    def post_commit(self, data):
+        # Written once the rows are committed to the DB, so that a failed batch is in neither
+        if self.parquet_store is not None:
+            # With both storages, the DB already rejected the inserts of existing rows
+            insert_checked = self.storage == 'both' and self.write_mode == 'insert'
+            self.parquet_store.write(data, 'upsert' if insert_checked else self.write_mode)
 
-                # yfinance expects end_date to be the last queried date + 1
-                end_date = self.sync_end_date + timedelta(days=1)
+    def sync(self):
+        try:
+            super().sync()
+        finally:
+            # Also merges the files of the batches committed before a failure
+            if self.parquet_store is not None:
+                self.parquet_store.compact()
 
-                # Get historical prices
-                hist = stock.history(start=self.sync_start_date, end=end_date, back_adjust=True)
+    def post_sync(self, session):
+        super().post_sync(session)
+        if self.shares_cache is not None:
+            self.shares_cache.write(session)
 
-                if hist.empty:
-                    continue
+        self._fail_empty_ranges(session)
+        # The whole range was fetched, or checked for gaps, for the tickers that didn't fail
+        tickers = [ticker for ticker in self.tickers if ticker not in self.failed_tickers]
+        SyncWatermarkDAO(self.source).merge(
+            session, tickers, self.sync_start_date, self.sync_end_date
+        )
+
+    def _fail_empty_ranges(self, session):
+        """
+        Mark as failed the tickers fetched without any bar for a range which isn't before their
+        first synced date, e.g. dropped from a throttled batch download, so that they aren't
+        watermarked and the range is fetched again. Ranges before it are expected, e.g. before
+        an IPO.
+        """
+        if not self.empty_ranges:
+            return
+
+        first_dates = get_first_synced_dates(
+            session,
+            self.source,
+            {ticker for ticker, _ in self.empty_ranges},
+            self.parquet_store if self.storage == 'parquet' else None,
+        )
+        for ticker, end_date in self.empty_ranges:
+            first_date = first_dates.get(ticker)
+            if first_date is None or str(end_date) >= first_date:
+                logging.error(f'No data fetched for {ticker} up to {end_date}')
+                self.failed_tickers.add(ticker)
+
+    def _retry(self, fn, *args):
+        return call_with_retry(
+            fn, *args, max_retries=self.max_retries, retry_backoff=self.retry_backoff
+        )
+
+    def _to_table_format(self, hists):
+        """Return the rows of the `hists` dict of ticker -> bars, formatted in one pass."""
+        # Converted to UTC per ticker, as the bars of different exchanges can't be concatenated
+        data = pd.concat(
+            {
+                ticker: hist[list(PRICE_COLUMNS)].set_axis(hist.index.tz_convert('UTC'))
+                for ticker, hist in hists.items()
+            },
+            names=['ticker', 'Date'],
+        ).reset_index()
+        data['datetime_utc'] = data['Date'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        data = data[['ticker', 'datetime_utc', *PRICE_COLUMNS]].rename(columns=PRICE_COLUMNS)
+        data['date'] = data['datetime_utc'].str[:10]
+
+        # Shares outstanding of each date, the rows of a ticker being contiguous
+        dates = data['date'].to_numpy()
+        offsets = np.cumsum([0, *map(len, hists.values())])
+        data['num_shares_outstanding'] = np.concatenate(
+            [
+                self.shares_cache.get(ticker, dates[start:end])
+                for ticker, start, end in zip(hists, offsets[:-1], offsets[1:])
+            ]
+        )
+        return data
+
+    def _fetch_shares_outstanding(self, ticker):
+        # Only fetched if the stored values are stale, local files being read on every sync
+        if not getattr(self.provider, 'local', False) and not self.shares_cache.is_stale(ticker):
+            return
+
+        # The dated values of providers knowing them give the count of each date
+        history = self._retry(self.provider.shares_outstanding_history, ticker)
+        if history is not None:
+            self.shares_cache.set_history(ticker, history)
+        else:
+            self.shares_cache.set_fetched(
+                ticker, self._retry(self.provider.shares_outstanding, ticker)
+            )
+
+    def _fetch_history(self, tickers, start_date, end_date):
+        # Read once, as the sync may complete while a worker is fetching
+        metrics = self.metrics
+        start = time.perf_counter()
+        hists = self._retry(self.provider.history, tickers, start_date, end_date)
+        if metrics is not None:
+            metrics.add_fetch_latency(time.perf_counter() - start)
+        return hists
 
-                data = hist[['Open', 'High', 'Low', 'Close']].reset_index()
-                data['datetime_utc'] = (
-                    data['Date'].dt.tz_convert('UTC').dt.strftime('%Y-%m-%d %H:%M:%S')
-                )
-                data = data[['datetime_utc', 'Open', 'High', 'Low', 'Close']]
-                data = data.rename(
-                    columns={'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close'}
-                )
+    def _fetch_batch(self, tickers, start_date, end_date):
+        """Return the dict of ticker -> bars of the fetched tickers of the batch."""
+        last_date = Date(end_date)
+        # yfinance expects end_date to be the last queried date + 1
+        end_date = last_date + timedelta(days=1)
 
-                # Get shares outstanding
-                data['num_shares_outstanding'] = stock.info.get('sharesOutstanding', None)
+        failed = set()
+        try:
+            hists = self._fetch_history(tickers, start_date, end_date)
+            # Tickers missing from a batch response, e.g. throttled, are fetched again on their own
+            fetch_alone = [t for t in tickers if t not in hists] if len(tickers) > 1 else []
+        except Exception as e:
+            if len(tickers) == 1:
+                logging.error(f'Error fetching {tickers[0]}: {str(e)}')
+                self.failed_tickers.add(tickers[0])
+                return {}
+            logging.warning(f'Batch fetch failed ({e}), falling back to per-ticker fetch.')
+            hists, fetch_alone = {}, tickers
 
-                data['ticker'] = ticker
-                all_data.append(data)
+        for ticker in fetch_alone:
+            try:
+                hists.update(self._fetch_history([ticker], start_date, end_date))
+            except Exception as e:
+                logging.error(f'Error fetching {ticker}: {str(e)}')
+                self.failed_tickers.add(ticker)
+                failed.add(ticker)
+
+        # Checked against the synced data once written, see `_fail_empty_ranges`
+        empty = [ticker for ticker in tickers if ticker not in hists and ticker not in failed]
+        self.empty_ranges.extend((ticker, last_date) for ticker in empty)
 
+        for ticker in list(hists):
+            try:
+                self._fetch_shares_outstanding(ticker)
             except Exception as e:
-                logging.error(f"Error fetching {ticker}: {str(e)}")
-                continue
+                logging.error(f'Error fetching {ticker}: {str(e)}')
+                self.failed_tickers.add(ticker)
+                del hists[ticker]
+
+        return hists
+
+    def get_tickers(self):
+        return TickerUniv().get_tickers(all_univ=True)
+
+    def get_fetch_ranges(self):
+        """Return the list of the (tickers, start_date, end_date) ranges to fetch."""
+        if not self.fill_gaps:
+            return [(self.tickers, self.sync_start_date, self.sync_end_date)]
+
+        session = get_session()
+        try:
+            synced = get_synced_dates(
+                session,
+                self.source,
+                self.sync_start_date,
+                self.sync_end_date,
+                self.parquet_store if self.storage == 'parquet' else None,
+            )
+            watermarks = SyncWatermarkDAO(self.source).get(session)
+        finally:
+            session.close()
+
+        trading_days = get_trading_calendar().range(self.sync_start_date, self.sync_end_date)
+        missing = get_missing_ranges(self.tickers, trading_days, synced, watermarks)
+        logging.info(
+            f'{len(missing)} missing ranges of {missing["ticker"].nunique()} tickers between '
+            f'{self.sync_start_date} and {self.sync_end_date}'
+        )
 
-        return pd.concat(all_data, ignore_index=True)
+        # Tickers missing the same range are fetched together
+        return [
+            (list(group['ticker']), start_date, end_date)
+            for (start_date, end_date), group in missing.groupby(['start_date', 'end_date'])
+        ]
+
+    def iter_data_to_sync(self):
+        """
+        Yield one DataFrame per fetched ticker batch as soon as it is available.
+
+        At most `2 * workers` batches are in flight so that fetched-but-unwritten data stays
+        bounded regardless of the universe size and the sync range.
+        """
+        self.tickers = list(self.get_tickers())
+        self.shares_cache = SharesOutstandingCache(self.tickers, self.shares_ttl_days)
+        batches = (
+            (tickers[i : i + self.batch_size], start_date, end_date)
+            for tickers, start_date, end_date in self.get_fetch_ranges()
+            for i in range(0, len(tickers), self.batch_size)
+        )
+        max_in_flight = 2 * self.workers
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = set()
+            for batch in batches:
+                pending.add(executor.submit(self._fetch_batch, *batch))
+                if len(pending) < max_in_flight:
+                    continue
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from self._transform(done)
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from self._transform(done)
+
+    def _transform(self, futures):
+        # Done in the thread of the sync rather than in the workers, where the CPU bound transform
+        # would hold the GIL anyway, so that it is timed apart from the fetches
+        for future in futures:
+            hists = future.result()
+            if hists:
+                with self._phase('transform'):
+                    data = self._to_table_format(hists)
+                yield data
+
+    def get_data_to_sync(self):
+        return pd.concat(list(self.iter_data_to_sync()), ignore_index=True)
@@ -1,3 +1,4 @@
 from .creation import create_db, create_db_and_tables, create_tables
-from .session import atomic_session, get_session
-from .util import fetch_query_results, get_db_path, get_db_uri, get_engine
+from .migrations import migrate_db
+from .session import atomic_session, get_session, get_session_factory
+from .util import dispose_engines, fetch_query_results, get_db_path, get_db_uri, get_engine
@@ -1,5 +1,6 @@
 import sqlite3
 
+from .migrations import migrate_db
 from .tables import Base
 from .util import get_db_path, get_engine
 
@@ -23,3 +24,4 @@ def create_tables(tables=None, db_uri=None):
 def create_db_and_tables():
     create_db()
     create_tables()
+    migrate_db()
@@ -0,0 +1,41 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .session import get_session
+from .tables import DataVersion
+
+
+class DataVersionDAO:
+    """Read and bump the data version counters of the tables."""
+
+    @property
+    def table(self):
+        return DataVersion
+
+    def bump(self, session, *tables):
+        """
+        Increment the versions of `tables` (table classes) in the transaction of `session`.
+
+        Versions start at 1 on the first bump, tables never bumped are at version 0.
+        """
+        qry = sqlite_insert(self.table).values(
+            [{'table_name': tbl.__tablename__, 'version': 1} for tbl in tables]
+        )
+        session.execute(
+            qry.on_conflict_do_update(
+                index_elements=['table_name'], set_={'version': self.table.version + 1}
+            )
+        )
+
+    def get(self, *tables):
+        """Return the tuple of the current versions of `tables`."""
+        table_names = [tbl.__tablename__ for tbl in tables]
+
+        session = get_session()
+        qry = select(self.table.table_name, self.table.version).where(
+            self.table.table_name.in_(table_names)
+        )
+        versions = dict(session.execute(qry).all())
+        session.close()
+
+        return tuple(versions.get(name, 0) for name in table_names)
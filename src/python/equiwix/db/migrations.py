@@ -0,0 +1,289 @@
+"""
+Migrations for databases created by an older version of equiwix.
+
+`create_tables` only creates the missing tables, changes to existing tables are applied here.
+Migrations are applied in order, and the number of applied migrations is stored in the
+`user_version` pragma of the sqlite DB. Every migration must be idempotent as freshly created
+databases start at version 0 too.
+"""
+
+import logging
+
+from sqlalchemy import MetaData, Table, delete, func, insert, select, update
+
+from .tables import (Base, IndexCompositionChange, IndexConstituentInterval, IndexConstituents,
+                     IndexLevel, IndexLevelDivisor, IndexState, SharesOutstanding,
+                     TickerSyncWatermark, TickerUniverse, YFinanceTickerData)
+from .util import get_engine
+
+
+def _get_columns(conn, table_name):
+    return {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info({table_name})')}
+
+
+def _has_ticker_ids(conn):
+    # Migrations deriving tables from index_constituents through the DAOs need its current schema.
+    # Before add_ticker_ids, they are skipped as add_ticker_ids rebuilds the derived tables.
+    return 'ticker_id' in _get_columns(conn, IndexConstituents.__tablename__)
+
+
+def _recreate_table(conn, tbl, join='', **column_exprs):
+    """
+    Copy the rows of the table of `tbl` into a new table of its current schema, as SQLite can't
+    alter primary keys.
+
+    :param join: Join clause added to the select of the rows of the old table, aliased as `old`.
+    :param column_exprs: SQL expressions of the columns of the new table. The other columns are
+        copied from the old table, except for a missing index_name or source, set to the default
+        index or source.
+    """
+    from ..constants import DEFAULT_SOURCE
+    from ..index_engine.constants import DEFAULT_INDEX
+
+    table_name = tbl.__tablename__
+    old_columns = _get_columns(conn, table_name)
+    for index in tbl.__table__.indexes:
+        conn.exec_driver_sql(f'DROP INDEX IF EXISTS {index.name}')
+    conn.exec_driver_sql(f'ALTER TABLE {table_name} RENAME TO {table_name}_old')
+    tbl.__table__.create(conn)
+
+    defaults = {'index_name': f"'{DEFAULT_INDEX}'", 'source': f"'{DEFAULT_SOURCE}'"}
+    columns = [c.name for c in tbl.__table__.columns]
+    select_columns = [
+        column_exprs.get(c, f'old.{c}' if c in old_columns else defaults.get(c, 'NULL'))
+        for c in columns
+    ]
+    conn.exec_driver_sql(
+        f'INSERT INTO {table_name} ({", ".join(columns)}) '
+        f'SELECT {", ".join(select_columns)} FROM {table_name}_old AS old {join}'
+    )
+    conn.exec_driver_sql(f'DROP TABLE {table_name}_old')
+
+
+def add_date_columns(conn):
+    """Materialize date(datetime_utc) into a `date` column."""
+    for tbl in (YFinanceTickerData, IndexLevel):
+        if 'date' not in _get_columns(conn, tbl.__tablename__):
+            conn.exec_driver_sql(f'ALTER TABLE {tbl.__tablename__} ADD COLUMN date TEXT')
+
+        conn.exec_driver_sql(
+            f'UPDATE {tbl.__tablename__} SET date = date(datetime_utc) WHERE date IS NULL'
+        )
+
+
+def build_constituent_intervals(conn):
+    """Encode the existing index_constituents rows into index_constituent_interval."""
+    # Imported here as the index engine depends on the db package
+    from ..index_engine.constituent_intervals import IndexConstituentIntervalDAO
+
+    if not _has_ticker_ids(conn):
+        return
+
+    qry = select(IndexConstituents.source, func.min(IndexConstituents.date)).group_by(
+        IndexConstituents.source
+    )
+    for source, first_date in conn.execute(qry).all():
+        IndexConstituentIntervalDAO(source).rebuild(conn, first_date)
+
+
+def add_trading_calendar(conn):
+    """
+    Persist the NYSE trading calendar, and move the constituents computed for the calendar day
+    after the market cap date to the next trading day.
+    """
+    import pandas as pd
+
+    from ..index_engine.constituent_intervals import IndexConstituentIntervalDAO
+    from ..trading_calendar import DEFAULT_EXCHANGE, TradingCalendar, TradingCalendarDAO
+
+    calendar = TradingCalendar.generate(DEFAULT_EXCHANGE)
+    TradingCalendarDAO(DEFAULT_EXCHANGE).set(calendar, conn)
+
+    # Reflected as the table may not have its ticker ids yet
+    tbl = Table(IndexConstituents.__tablename__, MetaData(), autoload_with=conn)
+    data = pd.DataFrame(conn.execute(select(tbl)).all(), columns=tbl.columns.keys())
+    if len(data) > 0:
+        market_cap_dates = pd.to_datetime(data['date']) - pd.Timedelta(days=1)
+        on_trading_day = calendar.is_trading_day(market_cap_dates)
+        data = data[on_trading_day].assign(
+            date=calendar.next(market_cap_dates[on_trading_day]).astype(str)
+        )
+
+        conn.execute(delete(tbl))
+        conn.execute(insert(tbl), data.to_dict(orient='records'))
+
+        if _has_ticker_ids(conn):
+            conn.execute(delete(IndexConstituentInterval))
+            for source, first_date in data.groupby('source')['date'].min().items():
+                IndexConstituentIntervalDAO(source).rebuild(conn, first_date)
+
+        logging.warning(
+            'Index constituents moved to the next trading day, recompute the index levels in '
+            'historical mode to fill in the days after weekends and holidays.'
+        )
+
+    states = conn.execute(select(IndexState.source, IndexState.members_date)).all()
+    for source, members_date in states:
+        market_cap_date = pd.Timestamp(members_date) - pd.Timedelta(days=1)
+        if calendar.is_trading_day(market_cap_date):
+            conn.execute(
+                update(IndexState)
+                .where(IndexState.source == source)
+                .values(members_date=str(calendar.next(market_cap_date)))
+            )
+
+
+def build_composition_changes(conn):
+    """Compute the composition changes of the existing index_constituents rows."""
+    from ..index_engine.composition_changes import IndexCompositionChangeDAO
+
+    if not _has_ticker_ids(conn):
+        return
+
+    qry = select(IndexConstituents.source, func.min(IndexConstituents.date)).group_by(
+        IndexConstituents.source
+    )
+    for source, first_date in conn.execute(qry).all():
+        IndexCompositionChangeDAO(source).rebuild(conn, first_date)
+
+
+def add_ticker_ids(conn):
+    """
+    Register the tickers in the ticker dimension, and replace the ticker columns of the tables
+    with the ticker ids.
+    """
+    from ..index_engine.composition_changes import IndexCompositionChangeDAO
+    from ..index_engine.constituent_intervals import IndexConstituentIntervalDAO
+    from .ticker_dim import TickerDAO
+
+    if _has_ticker_ids(conn):
+        return
+
+    fact_tables = [YFinanceTickerData, IndexConstituents, TickerUniverse]
+    conn.exec_driver_sql(
+        'INSERT OR IGNORE INTO ticker (ticker) SELECT ticker FROM ('
+        + ' UNION '.join(f'SELECT ticker FROM {tbl.__tablename__}' for tbl in fact_tables)
+        + ') ORDER BY ticker'
+    )
+
+    for tbl in fact_tables:
+        _recreate_table(
+            conn,
+            tbl,
+            join='JOIN ticker ON ticker.ticker = old.ticker',
+            ticker_id='ticker.ticker_id',
+        )
+
+    states = conn.execute(select(IndexState.source, IndexState.members)).all()
+    for source, members in states:
+        ticker_ids = TickerDAO().get_ids(conn, members.split(',')) if members else []
+        conn.execute(
+            update(IndexState)
+            .where(IndexState.source == source)
+            .values(members=','.join(map(str, ticker_ids)))
+        )
+
+    # Derived from index_constituents
+    for tbl in (IndexConstituentInterval, IndexCompositionChange):
+        tbl.__table__.drop(conn, checkfirst=True)
+        tbl.__table__.create(conn)
+
+    qry = select(IndexConstituents.source, func.min(IndexConstituents.date)).group_by(
+        IndexConstituents.source
+    )
+    for source, first_date in conn.execute(qry).all():
+        IndexConstituentIntervalDAO(source).rebuild(conn, first_date)
+        IndexCompositionChangeDAO(source).rebuild(conn, first_date)
+
+
+def add_index_names(conn):
+    """Key the index tables by index name, the existing rows being the ones of the default index."""
+    index_tables = [
+        IndexConstituents,
+        IndexConstituentInterval,
+        IndexCompositionChange,
+        IndexLevel,
+        IndexState,
+        IndexLevelDivisor,
+    ]
+    for tbl in index_tables:
+        if 'index_name' not in _get_columns(conn, tbl.__tablename__):
+            _recreate_table(conn, tbl)
+
+
+def build_shares_outstanding(conn):
+    """
+    Seed the shares outstanding history with the values of the yfinance_ticker_data rows, one row
+    per change of value. The seeded values are stale, so they are refetched by the next sync.
+    """
+    src_tbl = YFinanceTickerData.__tablename__
+    conn.exec_driver_sql(
+        f'INSERT OR IGNORE INTO {SharesOutstanding.__tablename__} '
+        '(ticker_id, start_date, num_shares_outstanding, fetched_at_utc) '
+        "SELECT ticker_id, date, num_shares_outstanding, '1970-01-01 00:00:00' FROM ("
+        '  SELECT ticker_id, date, num_shares_outstanding, '
+        '  LAG(num_shares_outstanding) OVER (PARTITION BY ticker_id ORDER BY date) AS prev, '
+        '  ROW_NUMBER() OVER (PARTITION BY ticker_id ORDER BY date) AS num '
+        f'  FROM (SELECT DISTINCT ticker_id, date, num_shares_outstanding FROM {src_tbl})'
+        ') WHERE num = 1 OR num_shares_outstanding IS NOT prev'
+    )
+
+
+def allow_unknown_shares_outstanding(conn):
+    """Make the shares outstanding of the ticker data nullable, unknown before their first value."""
+    tbl = YFinanceTickerData
+    table_info = conn.exec_driver_sql(f'PRAGMA table_info({tbl.__tablename__})')
+    if any(row[1] == 'num_shares_outstanding' and row[3] for row in table_info):
+        _recreate_table(conn, tbl)
+
+
+def add_ticker_data_sources(conn):
+    """Key the ticker data and its sync watermarks by source, the existing rows being yfinance's."""
+    for tbl in (YFinanceTickerData, TickerSyncWatermark):
+        if 'source' not in _get_columns(conn, tbl.__tablename__):
+            _recreate_table(conn, tbl)
+
+
+def drop_index_state_levels(conn):
+    """Drop the last level carried in the index state, the daily levels don't depend on it."""
+    if 'level_close' in _get_columns(conn, IndexState.__tablename__):
+        _recreate_table(conn, IndexState)
+
+
+MIGRATIONS = [
+    add_date_columns,
+    build_constituent_intervals,
+    add_trading_calendar,
+    build_composition_changes,
+    add_ticker_ids,
+    add_index_names,
+    build_shares_outstanding,
+    allow_unknown_shares_outstanding,
+    add_ticker_data_sources,
+    drop_index_state_levels,
+]
+
+
+def migrate_db(db_uri=None):
+    """
+    Create the missing tables, apply the pending migrations, create the missing indexes and refresh
+    the statistics of the query planner.
+    """
+    engine = get_engine(db_uri)
+
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        version = conn.exec_driver_sql('PRAGMA user_version').scalar()
+
+        for num, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            logging.info(f'Applying DB migration {num}: {migration.__name__}')
+            migration(conn)
+            conn.exec_driver_sql(f'PRAGMA user_version = {num}')
+
+        # create_all skips the indexes of already existing tables
+        for tbl in Base.metadata.sorted_tables:
+            for index in tbl.indexes:
+                index.create(conn, checkfirst=True)
+
+        # Statistics of the query planner, e.g. to join on the ticker ids through the right index
+        conn.exec_driver_sql('ANALYZE')
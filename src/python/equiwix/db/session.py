@@ -1,19 +1,35 @@
+import threading
 from contextlib import contextmanager
 
 from sqlalchemy.orm import sessionmaker
 
-from .util import get_engine
+from .util import get_db_uri, get_engine
 
+_session_factories = {}
+_session_factories_lock = threading.Lock()
 
-def get_session():
+
+def get_session_factory(db_uri=None):
+    """Return the `sessionmaker` bound to the cached engine of `db_uri`."""
+    if db_uri is None:
+        db_uri = get_db_uri()
+
+    with _session_factories_lock:
+        factory = _session_factories.get(db_uri)
+        if factory is None:
+            factory = sessionmaker(bind=get_engine(db_uri))
+            _session_factories[db_uri] = factory
+
+    return factory
+
+
+def get_session(db_uri=None):
     """Return a session which can be used for read operations."""
-    engine = get_engine()
-    Session = sessionmaker(bind=engine)
-    return Session()
+    return get_session_factory(db_uri)()
 
 
 @contextmanager
-def atomic_session():
+def atomic_session(db_uri=None):
     """
     Execute multiple queries atomically by wrapping in this `atomic_session`.
 
@@ -25,7 +41,7 @@ def atomic_session():
         session.execute(pd_qry)
 
     """
-    session = get_session()
+    session = get_session(db_uri)
     try:
         yield session
         session.commit()
@@ -0,0 +1,46 @@
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..util import Date
+from .tables import SyncCheckpoint
+
+
+class SyncCheckpointDAO:
+    """Read and write the progress of a partitioned sync of [sync_start_date, sync_end_date]."""
+
+    def __init__(self, job, sync_start_date, sync_end_date):
+        self.job = job
+        self.sync_start_date = str(Date(sync_start_date))
+        self.sync_end_date = str(Date(sync_end_date))
+
+    @property
+    def table(self):
+        return SyncCheckpoint
+
+    def _where(self):
+        return (
+            self.table.job == self.job,
+            self.table.sync_start_date == self.sync_start_date,
+            self.table.sync_end_date == self.sync_end_date,
+        )
+
+    def get(self, session):
+        """Return the last completed date of the sync, None if it has no checkpoint."""
+        return session.execute(select(self.table.completed_date).where(*self._where())).scalar()
+
+    def set(self, session, completed_date):
+        values = dict(
+            job=self.job,
+            sync_start_date=self.sync_start_date,
+            sync_end_date=self.sync_end_date,
+            completed_date=str(Date(completed_date)),
+        )
+        qry = sqlite_insert(self.table).values(**values)
+        session.execute(
+            qry.on_conflict_do_update(
+                index_elements=['job', 'sync_start_date', 'sync_end_date'], set_=values
+            )
+        )
+
+    def delete(self, session):
+        session.execute(delete(self.table).where(*self._where()))
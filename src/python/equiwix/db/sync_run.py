@@ -0,0 +1,44 @@
+from sqlalchemy import insert, select
+
+from .session import get_session
+from .tables import SyncRun
+from .util import fetch_query_results
+
+
+class SyncRunDAO:
+    """Record the runs of the syncs and read their history back, see `equiwix.sync_metrics`."""
+
+    @property
+    def table(self):
+        return SyncRun
+
+    def record(self, session, record):
+        """Insert the run `record`, a dict of the `sync_run` columns but run_id."""
+        session.execute(insert(self.table).values(**record))
+
+    def get(self, job=None, table_name=None, since=None):
+        """
+        Return the runs as a DataFrame ordered by start time, e.g. to follow the duration of a
+        sync over time.
+
+        :param job: Sync class name of the runs to return, all of them if None.
+        :param table_name: Table synced by the runs to return, all of them if None.
+        :param since: Only return the runs started at or after this UTC datetime string.
+        """
+        qry = select(self.table).order_by(self.table.started_at_utc, self.table.run_id)
+        if job is not None:
+            qry = qry.where(self.table.job == job)
+        if table_name is not None:
+            qry = qry.where(self.table.table_name == table_name)
+        if since is not None:
+            qry = qry.where(self.table.started_at_utc >= str(since))
+
+        session = get_session()
+        try:
+            return fetch_query_results(
+                session,
+                qry,
+                parse_dates=['sync_start_date', 'sync_end_date', 'started_at_utc'],
+            )
+        finally:
+            session.close()
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from sqlalchemy import REAL, CheckConstraint, Integer, String, Text
+from sqlalchemy import REAL, CheckConstraint, Index, Integer, String, Text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -8,18 +8,64 @@ class Base(DeclarativeBase):
     pass
 
 
+# Dimension of the tickers, the other tables reference them by ticker_id
+class Ticker(Base):
+    __tablename__ = 'ticker'
+
+    ticker_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ticker: Mapped[str] = mapped_column(String(20), unique=True)
+
+
 class IndexConstituents(Base):
     __tablename__ = 'index_constituents'
+    # Rows are stored in the primary key b-tree, instead of in the table plus a copy of the key
+    __table_args__ = {'sqlite_with_rowid': False}
 
     date: Mapped[str] = mapped_column(Text, primary_key=True)
-    ticker: Mapped[str] = mapped_column(String(20), primary_key=True)
+    ticker_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    source: Mapped[str] = mapped_column(String(20), primary_key=True)
+    index_name: Mapped[str] = mapped_column(String(20), primary_key=True)
+
+
+# Interval encoding of index_constituents: ticker is a constituent on dates in
+# [start_date, end_date), end_date being EQUIWIX_END_OF_TIME while it still is.
+class IndexConstituentInterval(Base):
+    __tablename__ = 'index_constituent_interval'
+    __table_args__ = (
+        Index('ix_index_constituent_interval_source_end', 'source', 'index_name', 'end_date'),
+    )
+
     source: Mapped[str] = mapped_column(String(20), primary_key=True)
+    index_name: Mapped[str] = mapped_column(String(20), primary_key=True)
+    ticker_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    start_date: Mapped[str] = mapped_column(Text, primary_key=True)
+    end_date: Mapped[str] = mapped_column(Text)
+
+
+# Tickers added to (change 'add') or removed from (change 'remove') the index on date, relative to
+# the previous date with computed constituents.
+class IndexCompositionChange(Base):
+    __tablename__ = 'index_composition_change'
+    __table_args__ = (CheckConstraint("change IN ('add', 'remove')"),)
+
+    source: Mapped[str] = mapped_column(String(20), primary_key=True)
+    index_name: Mapped[str] = mapped_column(String(20), primary_key=True)
+    date: Mapped[str] = mapped_column(Text, primary_key=True)
+    ticker_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    change: Mapped[str] = mapped_column(String(10))
 
 
 class IndexLevel(Base):
     __tablename__ = 'index_level'
+    __table_args__ = (
+        Index(
+            'ix_index_level_source_interval_date', 'source', 'index_name', 'time_interval', 'date'
+        ),
+    )
 
     datetime_utc: Mapped[str] = mapped_column(Text, primary_key=True)
+    # date(datetime_utc), materialized so that date filters can use an index
+    date: Mapped[str] = mapped_column(Text, nullable=True)
     time_interval: Mapped[str] = mapped_column(String(10), primary_key=True)
     open: Mapped[Optional[float]] = mapped_column(REAL)
     high: Mapped[Optional[float]] = mapped_column(REAL)
@@ -27,12 +73,26 @@ class IndexLevel(Base):
     close: Mapped[Optional[float]] = mapped_column(REAL)
     num_constituents: Mapped[int] = mapped_column(Integer)
     source: Mapped[str] = mapped_column(String(20), primary_key=True)
+    index_name: Mapped[str] = mapped_column(String(20), primary_key=True)
+
+
+# State carried over from one daily incremental index computation to the next
+class IndexState(Base):
+    __tablename__ = 'index_state'
+
+    source: Mapped[str] = mapped_column(String(20), primary_key=True)
+    index_name: Mapped[str] = mapped_column(String(20), primary_key=True)
+    # Date for which `members` are the index constituents
+    members_date: Mapped[str] = mapped_column(Text)
+    # Comma separated ticker ids
+    members: Mapped[str] = mapped_column(Text)
 
 
 class IndexLevelDivisor(Base):
     __tablename__ = 'index_level_divisor'
 
     source: Mapped[str] = mapped_column(String(20), primary_key=True)
+    index_name: Mapped[str] = mapped_column(String(20), primary_key=True)
     knowledge_start_date: Mapped[str] = mapped_column(Text, primary_key=True)
     knowledge_end_date: Mapped[str] = mapped_column(Text)
     divisor: Mapped[Optional[float]] = mapped_column(REAL)
@@ -40,18 +100,108 @@ class IndexLevelDivisor(Base):
 
 class YFinanceTickerData(Base):
     __tablename__ = 'yfinance_ticker_data'
+    __table_args__ = (
+        Index('ix_yfinance_ticker_data_date_ticker', 'date', 'ticker_id', 'source'),
+        {'sqlite_with_rowid': False},
+    )
 
-    ticker: Mapped[str] = mapped_column(String(20), primary_key=True)
+    ticker_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     datetime_utc: Mapped[str] = mapped_column(Text, primary_key=True)
+    # Name of the market data provider the row was synced from
+    source: Mapped[str] = mapped_column(String(20), primary_key=True)
+    # date(datetime_utc), materialized so that date filters can use an index
+    date: Mapped[str] = mapped_column(Text, nullable=True)
     open: Mapped[Optional[float]] = mapped_column(REAL)
     high: Mapped[Optional[float]] = mapped_column(REAL)
     low: Mapped[Optional[float]] = mapped_column(REAL)
     close: Mapped[Optional[float]] = mapped_column(REAL)
-    num_shares_outstanding: Mapped[int] = mapped_column(Integer)
+    # NULL before the first known shares outstanding of the ticker
+    num_shares_outstanding: Mapped[Optional[int]] = mapped_column(Integer)
+
+
+# Point-in-time shares outstanding of the tickers: num_shares_outstanding applies from start_date
+# until the start_date of the next row of the ticker, the earlier dates having no known value.
+# fetched_at_utc is the last time the value was fetched from the provider.
+class SharesOutstanding(Base):
+    __tablename__ = 'shares_outstanding'
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    ticker_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    start_date: Mapped[str] = mapped_column(Text, primary_key=True)
+    num_shares_outstanding: Mapped[Optional[int]] = mapped_column(Integer)
+    fetched_at_utc: Mapped[str] = mapped_column(Text)
+
+
+# Per-ticker watermarks of the ticker data sync from each source: every trading day in
+# [synced_from, synced_through] has been requested from the provider, so the days of the range
+# without data are provider gaps rather than missed days.
+class TickerSyncWatermark(Base):
+    __tablename__ = 'ticker_sync_watermark'
+
+    source: Mapped[str] = mapped_column(String(20), primary_key=True)
+    ticker_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    synced_from: Mapped[str] = mapped_column(Text)
+    synced_through: Mapped[str] = mapped_column(Text)
+
+
+# Trading days of the exchanges, generated once from pandas_market_calendars
+class TradingDay(Base):
+    __tablename__ = 'trading_calendar'
+
+    exchange: Mapped[str] = mapped_column(String(20), primary_key=True)
+    date: Mapped[str] = mapped_column(Text, primary_key=True)
+
+
+# Counter bumped by every sync writing into table_name, used to invalidate cached reads
+class DataVersion(Base):
+    __tablename__ = 'data_version'
+
+    table_name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer)
+
+
+# Last date written by a partitioned historical sync, from which it resumes if interrupted
+class SyncCheckpoint(Base):
+    __tablename__ = 'sync_checkpoint'
+
+    job: Mapped[str] = mapped_column(String(100), primary_key=True)
+    sync_start_date: Mapped[str] = mapped_column(Text, primary_key=True)
+    sync_end_date: Mapped[str] = mapped_column(Text, primary_key=True)
+    completed_date: Mapped[str] = mapped_column(Text)
+
+
+# One row per run of a sync, with the durations of its phases and its throughput, see
+# `equiwix.sync_metrics`. Failed runs are recorded too, with the error they failed with.
+class SyncRun(Base):
+    __tablename__ = 'sync_run'
+    __table_args__ = (Index('ix_sync_run_job_started', 'job', 'started_at_utc'),)
+
+    run_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    job: Mapped[str] = mapped_column(String(100))
+    table_name: Mapped[str] = mapped_column(String(50))
+    sync_start_date: Mapped[str] = mapped_column(Text)
+    sync_end_date: Mapped[str] = mapped_column(Text)
+    write_mode: Mapped[str] = mapped_column(String(20))
+    started_at_utc: Mapped[str] = mapped_column(Text)
+    status: Mapped[str] = mapped_column(String(10))
+    error: Mapped[Optional[str]] = mapped_column(String(1000))
+    duration_s: Mapped[float] = mapped_column(REAL)
+    fetch_s: Mapped[float] = mapped_column(REAL)
+    transform_s: Mapped[float] = mapped_column(REAL)
+    write_s: Mapped[float] = mapped_column(REAL)
+    num_rows: Mapped[int] = mapped_column(Integer)
+    rows_per_s: Mapped[Optional[float]] = mapped_column(REAL)
+    # Latencies of the provider calls, per ticker unless the tickers are fetched in batches
+    num_fetches: Mapped[int] = mapped_column(Integer)
+    fetch_latency_p50_s: Mapped[Optional[float]] = mapped_column(REAL)
+    fetch_latency_p90_s: Mapped[Optional[float]] = mapped_column(REAL)
+    fetch_latency_p99_s: Mapped[Optional[float]] = mapped_column(REAL)
+    fetch_latency_max_s: Mapped[Optional[float]] = mapped_column(REAL)
 
 
 class TickerUniverse(Base):
     __tablename__ = 'ticker_universe'
+    __table_args__ = {'sqlite_with_rowid': False}
 
     univ: Mapped[str] = mapped_column(String(20), primary_key=True)
-    ticker: Mapped[str] = mapped_column(String(20), primary_key=True)
+    ticker_id: Mapped[int] = mapped_column(Integer, primary_key=True)
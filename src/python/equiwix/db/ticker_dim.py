@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .tables import Ticker
+
+
+class TickerDAO:
+    """
+    Translate between the ticker symbols and the integer ids of the `ticker` dimension.
+
+    Tables reference the tickers by id, the symbols are only used at the edges: fetching from the
+    data providers, adding tickers to a universe and the results of the selectors.
+    """
+
+    @property
+    def table(self):
+        return Ticker
+
+    def get_mapping(self, session):
+        """Return the Series of the ticker symbols indexed by ticker id."""
+        rows = session.execute(select(self.table.ticker_id, self.table.ticker)).all()
+        ticker_ids, tickers = zip(*rows) if rows else ((), ())
+        return pd.Series(tickers, index=pd.Index(ticker_ids, dtype='int64'), dtype=object)
+
+    def get_ids(self, session, tickers, create=False):
+        """
+        Return the array of the ids of `tickers`.
+
+        :param create: Register the unknown tickers in the transaction of `session` instead of
+            raising a ValueError.
+        """
+        tickers = pd.Index(np.asarray(tickers, dtype=object))
+        mapping = self.get_mapping(session)
+        ticker_ids = pd.Index(mapping.to_numpy()).get_indexer(tickers)
+
+        unknown = tickers[ticker_ids < 0].unique()
+        if len(unknown) > 0:
+            if not create:
+                raise ValueError(f'Unknown tickers: {list(unknown)}')
+
+            session.execute(
+                sqlite_insert(self.table)
+                .values([{'ticker': ticker} for ticker in unknown])
+                .on_conflict_do_nothing(index_elements=['ticker'])
+            )
+            return self.get_ids(session, tickers)
+
+        return mapping.index.to_numpy()[ticker_ids]
+
+    def get_tickers(self, session, ticker_ids):
+        """Return the array of the symbols of `ticker_ids`."""
+        mapping = self.get_mapping(session)
+        return mapping.reindex(np.asarray(ticker_ids, dtype='int64')).to_numpy()
@@ -1,11 +1,37 @@
-import pandas as pd
-from sqlalchemy import create_engine
-from sqlalchemy.types import Date, DateTime, Float, Integer, String, Text
+import os
+import threading
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.types import Date, DateTime, Float, Integer, String
 
 from ..util import get_equiwix_home
 
+DB_PATH_ENV_VAR = 'EQUIWIX_DB_PATH'
+
+# Number of rows fetched from the cursor at once by `fetch_query_results`, bounding the memory
+# taken by the untyped rows.
+FETCH_CHUNK_SIZE = 100_000
+
+# Applied on every new SQLite connection. WAL lets the dashboard read while a sync writes, and
+# synchronous=NORMAL is durable in WAL mode except on power loss.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # In KiB when negative, i.e. 64 MiB
+    'temp_store': 'MEMORY',
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
 
 def get_db_path():
+    """Return the path of the sqlite DB, overridable with the `EQUIWIX_DB_PATH` env var."""
+    db_path = os.environ.get(DB_PATH_ENV_VAR)
+    if db_path:
+        return db_path
+
     return f'{get_equiwix_home()}/equiwix.db'
 
 
@@ -13,47 +39,193 @@ def get_db_uri():
     return f'sqlite:///{get_db_path()}'
 
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
 def get_engine(db_uri=None):
-    """Return a sqlalchemy engine to be used while running queries or creating a session."""
+    """
+    Return a sqlalchemy engine to be used while running queries or creating a session.
+
+    Engines are created once per DB URI and cached for the lifetime of the process, so that
+    connections are pooled across queries.
+    """
     if db_uri is None:
         db_uri = get_db_uri()
 
-    return create_engine(db_uri)
+    with _engines_lock:
+        engine = _engines.get(db_uri)
+        if engine is None:
+            engine = create_engine(db_uri)
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _set_sqlite_pragmas)
+            _engines[db_uri] = engine
+
+    return engine
 
 
-def fetch_query_results(session, query):
+def dispose_engines():
     """
-    Convert DataFrame columns to match SQLAlchemy query schema (handles joins).
+    Reset the connection pools of all the cached engines.
+
+    Must be called in a child process after a fork, as pooled connections can't be shared across
+    processes. The engines stay usable and open new connections on demand.
     """
-    type_map = {}
-
-    # Extract column types from the query metadata
-    for desc in query.column_descriptions:
-        column = desc["expr"]
-        col_name = column.key
-        col_type = column.type
-
-        if isinstance(col_type, (Date, DateTime, Text)):
-            type_map[col_name] = "datetime"
-        elif isinstance(col_type, Integer):
-            type_map[col_name] = "integer"
-        elif isinstance(col_type, Float):
-            type_map[col_name] = "float"
-        elif isinstance(col_type, String):
-            type_map[col_name] = "string"
-
-    data = pd.read_sql(query.statement, session.bind)
-
-    # Apply transformations
-    for col, dtype in type_map.items():
-        if col in data:
-            if dtype == "datetime":
-                data[col] = pd.to_datetime(data[col])
-            elif dtype == "integer":
-                data[col] = pd.to_numeric(data[col], errors="coerce", downcast="integer")
-            elif dtype == "float":
-                data[col] = pd.to_numeric(data[col], errors="coerce", downcast="float")
-            elif dtype == "string":
-                data[col] = data[col].astype(str)
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose(close=False)
+
+
+def _get_column_kind(col_type):
+    """Return how a column of the given SQLAlchemy type is loaded by `fetch_query_results`."""
+    if isinstance(col_type, (Date, DateTime)):
+        return 'datetime'
+    elif isinstance(col_type, Integer):
+        return 'integer'
+    elif isinstance(col_type, Float):
+        return 'float'
+    elif isinstance(col_type, String):
+        return 'string'
+    return None
+
+
+def _build_column(values, kind, categorical, dtype_backend):
+    """Build a typed pandas column from the tuple of raw `values` read from the cursor."""
+    import numpy as np
+    import pandas as pd
+
+    if dtype_backend == 'pyarrow':
+        import pyarrow as pa
+
+        arrow_types = {
+            'datetime': pa.timestamp('ns'),
+            'integer': pa.int64(),
+            'float': pa.float64(),
+            'string': pa.string(),
+        }
+        if kind == 'datetime':
+            arr = pa.array(values, type=pa.string()).cast(arrow_types[kind])
+        else:
+            arr = pa.array(values, type=arrow_types.get(kind))
+        if categorical:
+            arr = arr.dictionary_encode()
+        return pd.arrays.ArrowExtensionArray(arr)
+
+    if kind == 'float':
+        # None is converted to NaN
+        column = np.array(values, dtype=np.float64)
+    elif kind == 'integer':
+        try:
+            column = np.array(values, dtype=np.int64)
+        except TypeError:  # NULLs, fall back to floats like pandas does
+            column = np.array(values, dtype=np.float64)
+    elif kind == 'datetime':
+        # The ISO strings stored by SQLite, parsed at full precision. NULLs are NaT.
+        column = pd.DatetimeIndex(np.array(values, dtype='datetime64[ns]'))
+    elif kind == 'string':
+        column = np.array(values, dtype=object)
+    else:
+        column = pd.Series(list(values), dtype=None if values else object)
+
+    return pd.Categorical(column) if categorical else column
+
+
+def _build_frame(kinds, columns, categorical, dtype_backend):
+    import pandas as pd
+
+    return pd.DataFrame(
+        {
+            name: _build_column(values, kind, name in categorical, dtype_backend)
+            for (name, kind), values in zip(kinds.items(), columns)
+        },
+        columns=list(kinds),
+    )
+
+
+def _iter_frames(session, stmt, kinds, categorical, dtype_backend, chunksize):
+    compiled = stmt.compile(session.bind, compile_kwargs={'render_postcompile': True})
+    params = [compiled.params[name] for name in compiled.positiontup]
+
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.execute(str(compiled), params)
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+
+            yield _build_frame(kinds, zip(*rows), categorical, dtype_backend)
+    finally:
+        cursor.close()
+
+
+def fetch_query_results(
+    session,
+    query,
+    columns=None,
+    categorical=(),
+    dtype_backend='numpy',
+    chunksize=None,
+    parse_dates=(),
+):
+    """
+    Run `query` and load its results into a DataFrame typed after the query schema.
+
+    Columns are built straight from the cursor rows: the columns declared as dates or timestamps,
+    and the ones of `parse_dates`, are parsed from their ISO strings into datetime64[ns], integers
+    and floats are loaded into int64/float64 arrays (float64 if there are NULLs), strings as
+    objects. Columns of other types are left to pandas inference.
+
+    :param session: Session to run the query with.
+    :param query: ORM `Query` or `Select`.
+    :param columns: Names of the columns to load, pushed down into the query. Defaults to all.
+    :param categorical: Names of the columns to load as categoricals, e.g. tickers.
+    :param dtype_backend: 'numpy' or 'pyarrow' for Arrow-backed columns.
+    :param chunksize: If given, return an iterator of DataFrames of at most `chunksize` rows
+        instead of a single DataFrame.
+    :param parse_dates: Names of the columns of ISO dates or timestamps to load as datetimes, e.g.
+        the `Text` date columns of the schema, which are loaded as strings otherwise.
+    """
+    if dtype_backend not in ('numpy', 'pyarrow'):
+        raise ValueError(f'Invalid dtype_backend {dtype_backend}')
+    if dtype_backend == 'pyarrow':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError('pyarrow is required by the pyarrow dtype backend')
+
+    stmt = getattr(query, 'statement', query)
+    selected = {col.key: col for col in stmt.selected_columns}
+    if columns is not None:
+        stmt = stmt.with_only_columns(*[selected[name] for name in columns])
+        selected = {name: selected[name] for name in columns}
+
+    kinds = {
+        name: 'datetime' if name in parse_dates else _get_column_kind(col.type)
+        for name, col in selected.items()
+    }
+
+    frames = _iter_frames(
+        session, stmt, kinds, set(categorical), dtype_backend, chunksize or FETCH_CHUNK_SIZE
+    )
+    if chunksize is not None:
+        return frames
+
+    frames = list(frames)
+    if not frames:
+        return _build_frame(kinds, [()] * len(kinds), set(categorical), dtype_backend)
+    if len(frames) == 1:
+        return frames[0]
+
+    import pandas as pd
+    from pandas.api.types import union_categoricals
 
+    data = pd.concat(frames, ignore_index=True)
+    if dtype_backend == 'numpy':
+        # Chunks have different categories, which concat turns into objects
+        for name in categorical:
+            data[name] = union_categoricals([frame[name] for frame in frames])
     return data
@@ -0,0 +1,163 @@
+"""
+Module computing and persisting the index composition changes.
+
+Tickers are interned to integer ids and the memberships are laid out in a boolean date x ticker
+matrix, so that the tickers added and removed on every date of a range are found in one diff of
+consecutive rows. The constituents computers persist the changes of the dates they write into the
+`IndexCompositionChange` table, from which the dashboard reads them without recomputation.
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, insert, select
+
+from ..db.data_version import DataVersionDAO
+from ..db.tables import IndexCompositionChange, IndexConstituents, Ticker
+from ..util import Date
+from .constants import DEFAULT_INDEX
+
+COMPOSITION_CHANGES = ('add', 'remove')
+
+
+def _get_memberships(constituents, ticker_col):
+    """Return the sorted dates, the tickers and the (date x ticker) membership matrix."""
+    if isinstance(constituents, pd.Series):
+        constituents = constituents.sort_index()
+        num_tickers = constituents.map(len).to_numpy(dtype=np.intp)
+        dates = constituents.index.to_numpy()
+        date_idx = np.repeat(np.arange(len(dates)), num_tickers)
+        tickers = np.concatenate([np.asarray(t, dtype=object) for t in constituents] or [[]])
+    else:
+        date_idx, dates = pd.factorize(constituents['date'], sort=True)
+        dates = np.asarray(dates)
+        tickers = constituents[ticker_col].to_numpy()
+
+    ticker_idx, tickers = pd.factorize(tickers)
+    membership = np.zeros((len(dates), len(tickers)), dtype=bool)
+    membership[date_idx, ticker_idx] = True
+    return dates, np.asarray(tickers), membership
+
+
+def compute_composition_changes(constituents, ticker_col='ticker'):
+    """
+    Return the tickers added to and removed from the index on each date of `constituents`.
+
+    The first date has no previous composition to compare with, so it has no changes.
+
+    :param constituents: DataFrame with date and `ticker_col` columns, or Series of ticker lists
+        indexed by date as returned by `IndexConstituentsDateSelector`.
+    :param ticker_col: Name of the ticker column, e.g. ticker_id for the table rows.
+    :return: DataFrame with date, `ticker_col` and change (one of `COMPOSITION_CHANGES`) columns,
+        sorted by date, change and ticker.
+    """
+    dates, tickers, membership = _get_memberships(constituents, ticker_col)
+
+    diff = np.diff(membership.view(np.int8), axis=0)
+    date_idx, ticker_idx = np.nonzero(diff)
+    changes = pd.DataFrame(
+        {
+            'date': dates[date_idx + 1],
+            ticker_col: tickers[ticker_idx],
+            'change': np.where(diff[date_idx, ticker_idx] > 0, 'add', 'remove'),
+        }
+    )
+    return changes.sort_values(['date', 'change', ticker_col], ignore_index=True)
+
+
+class IndexCompositionChangeDAO:
+    def __init__(self, source, index_name=DEFAULT_INDEX):
+        self.source = source
+        self.index_name = index_name
+
+    @property
+    def table(self):
+        return IndexCompositionChange
+
+    def rebuild(self, session, from_date):
+        """
+        Recompute the composition changes of the dates from `from_date` onwards out of the
+        `IndexConstituents` rows.
+
+        :param session: Session or connection, so that this can run in the sync transaction.
+        """
+        tbl = self.table.__table__
+        src_tbl = IndexConstituents
+        from_date = str(Date(from_date))
+
+        session.execute(
+            delete(tbl).where(
+                tbl.c.source == self.source,
+                tbl.c.index_name == self.index_name,
+                tbl.c.date >= from_date,
+            )
+        )
+
+        # The changes of from_date are relative to the previous computed date
+        is_index = (src_tbl.source == self.source) & (src_tbl.index_name == self.index_name)
+        prev_date = session.execute(
+            select(func.max(src_tbl.date)).where(is_index, src_tbl.date < from_date)
+        ).scalar()
+
+        qry = select(src_tbl.date, src_tbl.ticker_id).where(
+            is_index, src_tbl.date >= (prev_date or from_date)
+        )
+        constituents = pd.DataFrame(session.execute(qry).all(), columns=['date', 'ticker_id'])
+
+        changes = compute_composition_changes(constituents, ticker_col='ticker_id')
+        if len(changes) > 0:
+            changes = changes.assign(source=self.source, index_name=self.index_name)
+            session.execute(insert(tbl), changes.to_dict(orient='records'))
+
+        DataVersionDAO().bump(session, self.table)
+
+    def append(self, session, date, added, removed):
+        """
+        Persist the changes of `date`, the date after the last one with computed changes, without
+        reading the constituents back.
+
+        :param added: Ticker ids added to the index on `date`.
+        :param removed: Ticker ids removed from the index on `date`.
+        """
+        date = str(Date(date))
+        rows = [
+            {
+                'source': self.source,
+                'index_name': self.index_name,
+                'date': date,
+                'ticker_id': ticker_id,
+                'change': change,
+            }
+            for change, ticker_ids in zip(COMPOSITION_CHANGES, (added, removed))
+            for ticker_id in ticker_ids
+        ]
+        if rows:
+            session.execute(insert(self.table.__table__), rows)
+
+        DataVersionDAO().bump(session, self.table)
+
+    def get(self, session, start_date=None, end_date=None):
+        """Return the changes dated in [start_date, end_date] as a date, ticker, change frame."""
+        tbl = self.table
+        qry = (
+            select(tbl.date, Ticker.ticker, tbl.change)
+            .join(Ticker, Ticker.ticker_id == tbl.ticker_id)
+            .where(tbl.source == self.source, tbl.index_name == self.index_name)
+        )
+        if start_date is not None:
+            qry = qry.where(tbl.date >= str(Date(start_date)))
+        if end_date is not None:
+            qry = qry.where(tbl.date <= str(Date(end_date)))
+
+        changes = pd.DataFrame(session.execute(qry).all(), columns=['date', 'ticker', 'change'])
+        return changes.sort_values(['date', 'change', 'ticker'], ignore_index=True)
+
+
+class CompositionChangesMixin:
+    """Recompute the composition changes in the transaction of a constituents computer's sync."""
+
+    def post_sync(self, session):
+        super().post_sync(session)
+        for definition in self.index_definitions:
+            IndexCompositionChangeDAO(self.source, definition.name).rebuild(
+                session, self.sync_start_date
+            )
@@ -1,3 +1,4 @@
 NUM_STOCKS_IN_INDEX = 100
 
-VALID_SOURCES = ['yfinance']
\ No newline at end of file
+# Name of the index computed by default, see `definitions`
+DEFAULT_INDEX = 'equiwix'
@@ -0,0 +1,230 @@
+"""
+Module maintaining and querying the interval encoding of the index constituents.
+
+Index membership rarely changes, so instead of one row per constituent per day, the
+`IndexConstituentInterval` table stores one row per (ticker, membership period). The constituents
+computers rebuild the affected intervals from the `IndexConstituents` rows they write, and the
+constituents selector reconstructs point-in-time and date range compositions from the intervals.
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, delete, func, insert, select, update
+
+from ..db.tables import IndexConstituentInterval, IndexConstituents
+from ..util import EQUIWIX_END_OF_TIME, Date
+from .constants import DEFAULT_INDEX
+
+
+def _read_frame(session, qry):
+    return pd.DataFrame(session.execute(qry).all(), columns=list(qry.selected_columns.keys()))
+
+
+class IndexConstituentIntervalDAO:
+    def __init__(self, source, index_name=DEFAULT_INDEX):
+        self.source = source
+        self.index_name = index_name
+
+    @property
+    def table(self):
+        return IndexConstituentInterval
+
+    def rebuild(self, session, from_date):
+        """
+        Rebuild the intervals from the `IndexConstituents` rows dated `from_date` onwards.
+
+        Memberships before `from_date` are kept as they are, the intervals open at `from_date`
+        are extended or closed according to the daily rows.
+
+        :param session: Session or connection, so that this can run in the sync transaction.
+        """
+        tbl = self.table.__table__
+        from_date = str(Date(from_date))
+        end_of_time = str(EQUIWIX_END_OF_TIME)
+
+        is_index = (tbl.c.source == self.source) & (tbl.c.index_name == self.index_name)
+
+        session.execute(delete(tbl).where(is_index, tbl.c.start_date >= from_date))
+        session.execute(
+            update(tbl).where(is_index, tbl.c.end_date > from_date).values(end_date=end_of_time)
+        )
+
+        open_tickers = _read_frame(
+            session, select(tbl.c.ticker_id).where(is_index, tbl.c.end_date == end_of_time)
+        )['ticker_id']
+
+        src_tbl = IndexConstituents
+        daily = _read_frame(
+            session,
+            select(src_tbl.date, src_tbl.ticker_id).where(
+                src_tbl.source == self.source,
+                src_tbl.index_name == self.index_name,
+                src_tbl.date >= from_date,
+            ),
+        )
+        if len(daily) == 0:
+            return
+
+        date_idx, dates = pd.factorize(daily['date'], sort=True)
+        ticker_idx, tickers = pd.factorize(pd.concat([daily['ticker_id'], open_tickers]))
+
+        # Row 0 holds the memberships open before the first date.
+        membership = np.zeros((len(dates) + 1, len(tickers)), dtype=np.int8)
+        membership[0, ticker_idx[len(daily) :]] = 1
+        membership[date_idx + 1, ticker_idx[: len(daily)]] = 1
+        changes = np.diff(membership, axis=0)
+
+        starts = self._events(changes == 1, dates, tickers)
+        ends = self._events(changes == -1, dates, tickers)
+
+        # The first end of an already open ticker closes its existing interval, so the n-th start
+        # of a ticker pairs with its (n + 1)-th end.
+        was_open = membership[0].astype(bool)
+        starts['num'] += was_open[starts['ticker_idx']]
+        closed = ends[(ends['num'] == 0) & was_open[ends['ticker_idx']]]
+        intervals = starts.merge(ends, on=['ticker_id', 'ticker_idx', 'num'], how='left')
+
+        if len(closed) > 0:
+            session.execute(
+                update(tbl)
+                .where(
+                    is_index,
+                    tbl.c.ticker_id == bindparam('b_ticker_id'),
+                    tbl.c.end_date == end_of_time,
+                )
+                .values(end_date=bindparam('b_date')),
+                [
+                    {'b_ticker_id': ticker_id, 'b_date': date}
+                    for ticker_id, date in zip(closed['ticker_id'].tolist(), closed['date'])
+                ],
+            )
+
+        if len(intervals) > 0:
+            session.execute(
+                insert(tbl),
+                [
+                    {
+                        'source': self.source,
+                        'index_name': self.index_name,
+                        'ticker_id': ticker_id,
+                        'start_date': start_date,
+                        'end_date': end_of_time if pd.isna(end_date) else end_date,
+                    }
+                    for ticker_id, start_date, end_date in zip(
+                        intervals['ticker_id'].tolist(), intervals['date_x'], intervals['date_y']
+                    )
+                ],
+            )
+
+    def append(self, session, date, added, removed):
+        """
+        Apply the composition changes of `date`, the date after the last one of the intervals:
+        close the open intervals of the `removed` ticker ids and open intervals for the `added`
+        ones. Unlike `rebuild`, only the changed memberships are read and written.
+
+        :param session: Session or connection, so that this can run in the sync transaction.
+        """
+        tbl = self.table.__table__
+        date = str(Date(date))
+        end_of_time = str(EQUIWIX_END_OF_TIME)
+
+        if len(removed) > 0:
+            session.execute(
+                update(tbl)
+                .where(
+                    tbl.c.source == self.source,
+                    tbl.c.index_name == self.index_name,
+                    tbl.c.end_date == end_of_time,
+                    tbl.c.ticker_id.in_(list(removed)),
+                )
+                .values(end_date=date)
+            )
+        if len(added) > 0:
+            session.execute(
+                insert(tbl),
+                [
+                    {
+                        'source': self.source,
+                        'index_name': self.index_name,
+                        'ticker_id': ticker_id,
+                        'start_date': date,
+                        'end_date': end_of_time,
+                    }
+                    for ticker_id in added
+                ],
+            )
+
+    @staticmethod
+    def _events(mask, dates, tickers):
+        date_idx, ticker_idx = np.nonzero(mask)
+        events = pd.DataFrame(
+            {
+                'date': dates.to_numpy()[date_idx],
+                'ticker_id': tickers.to_numpy()[ticker_idx],
+                'ticker_idx': ticker_idx,
+            }
+        ).sort_values(['ticker_idx', 'date'], ignore_index=True)
+        events['num'] = events.groupby('ticker_idx').cumcount()
+        return events
+
+    def get_coverage(self, session):
+        """Return the (first, last) dates with computed constituents, (None, None) if none."""
+        src_tbl = IndexConstituents
+        first_date = session.execute(
+            select(func.min(self.table.start_date)).where(
+                self.table.source == self.source, self.table.index_name == self.index_name
+            )
+        ).scalar()
+        last_date = session.execute(
+            select(func.max(src_tbl.date)).where(
+                src_tbl.source == self.source, src_tbl.index_name == self.index_name
+            )
+        ).scalar()
+        return first_date, last_date
+
+    def get_constituents(self, session, dates):
+        """
+        Reconstruct the constituents of `dates` from the intervals.
+
+        :param dates: Sorted array-like of 'YYYY-MM-DD' strings.
+        :return: DataFrame with date and ticker_id columns, sorted by date and ticker id.
+        """
+        dates = np.asarray(dates, dtype=str)
+        if len(dates) == 0:
+            return pd.DataFrame({'date': [], 'ticker_id': []})
+
+        tbl = self.table
+        intervals = _read_frame(
+            session,
+            select(tbl.ticker_id, tbl.start_date, tbl.end_date).where(
+                tbl.source == self.source,
+                tbl.index_name == self.index_name,
+                tbl.start_date <= dates[-1],
+                tbl.end_date > dates[0],
+            ),
+        )
+
+        # Requested dates within [start_date, end_date) of each interval
+        first = np.searchsorted(dates, intervals['start_date'].to_numpy(str), side='left')
+        last = np.searchsorted(dates, intervals['end_date'].to_numpy(str), side='left')
+        counts = np.maximum(last - first, 0)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        data = pd.DataFrame(
+            {
+                'date': dates[np.repeat(first, counts) + offsets],
+                'ticker_id': np.repeat(intervals['ticker_id'].to_numpy(), counts),
+            }
+        )
+        return data.sort_values(['date', 'ticker_id'], ignore_index=True)
+
+
+class ConstituentIntervalsMixin:
+    """Rebuild the constituent intervals in the transaction of a constituents computer's sync."""
+
+    def post_sync(self, session):
+        super().post_sync(session)
+        for definition in self.index_definitions:
+            IndexConstituentIntervalDAO(self.source, definition.name).rebuild(
+                session, self.sync_start_date
+            )
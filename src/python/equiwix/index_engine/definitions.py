@@ -0,0 +1,73 @@
+"""
+Registry of the computed indexes.
+
+An index is defined by its name, its number of constituents, the ticker universe they are picked
+from and its weighting. The constituents and level computers compute all the requested indexes
+from a single market cap ranking pass over the ticker data, and key their rows by index name.
+
+Indexes are registered at import time:
+
+    register_index(IndexDefinition('equiwix50', 50))
+"""
+
+from .constants import DEFAULT_INDEX, NUM_STOCKS_IN_INDEX
+
+# equal: Sum of the inverse prices of the constituents.
+# market_cap: Sum of the market caps of the constituents.
+WEIGHTINGS = ('equal', 'market_cap')
+
+INDEX_DEFINITIONS = {}
+
+
+class IndexDefinition:
+    def __init__(self, name, num_stocks, universe=None, weighting='equal'):
+        """
+        :param name: Identifier of the index in the index tables.
+        :param num_stocks: Number of constituents, the largest market caps of the universe.
+        :param universe: Ticker universe (`TickerUniverse.univ`) the constituents are picked from.
+            All the synced tickers if None.
+        :param weighting: One of `WEIGHTINGS`.
+        """
+        if num_stocks < 1:
+            raise ValueError('num_stocks should be >= 1.')
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f'Invalid weighting {weighting}, expected one of {WEIGHTINGS}')
+
+        self.name = name
+        self.num_stocks = num_stocks
+        self.universe = universe
+        self.weighting = weighting
+
+    def __repr__(self):
+        return (
+            f'IndexDefinition({self.name!r}, {self.num_stocks}, universe={self.universe!r}, '
+            f'weighting={self.weighting!r})'
+        )
+
+
+def register_index(definition):
+    """Register `definition`, replacing the index of the same name if any."""
+    INDEX_DEFINITIONS[definition.name] = definition
+    return definition
+
+
+def get_index_definitions(index_names=None):
+    """Return the registered definitions of `index_names`, all of them if None."""
+    if index_names is None:
+        return list(INDEX_DEFINITIONS.values())
+
+    unknown = [name for name in index_names if name not in INDEX_DEFINITIONS]
+    if unknown:
+        raise ValueError(f'Unknown indexes {unknown}, expected some of {list(INDEX_DEFINITIONS)}')
+    return [INDEX_DEFINITIONS[name] for name in index_names]
+
+
+def group_by_universe(definitions):
+    """Return the dict of the definitions by universe, the indexes of a universe share a ranking."""
+    groups = {}
+    for definition in definitions:
+        groups.setdefault(definition.universe, []).append(definition)
+    return groups
+
+
+register_index(IndexDefinition(DEFAULT_INDEX, NUM_STOCKS_IN_INDEX))
@@ -1,89 +1,149 @@
 import logging
+from datetime import timedelta
 
-from sqlalchemy import func as F
-from sqlalchemy import insert, update
+from sqlalchemy import delete, func, insert, select, update
 
-from equiwix.db import atomic_session, fetch_query_results, get_session
-from equiwix.db.tables import IndexLevel, IndexLevelDivisor
+from equiwix.db import atomic_session, get_session
+from equiwix.db.data_version import DataVersionDAO
+from equiwix.db.tables import IndexLevelDivisor
 
-from ..util import EQUIWIX_END_OF_TIME, EQUIWIX_OPENING_LEVEL, Date
-from .selectors import IndexLevelDateSelector
+from ..util import EQUIWIX_END_OF_TIME, EQUIWIX_OPENING_LEVEL, EQUIWIX_START_OF_TIME, Date
+from .constants import DEFAULT_INDEX
+
+
+def get_divisors(timeline, dates):
+    """
+    Return the array of the divisors applying to `dates` (ISO date strings).
+
+    :param timeline: Divisor timeline as returned by `IndexLevelDivisorDAO.get_timeline`.
+    """
+    import numpy as np
+
+    start_dates = timeline['start_date'].to_numpy(str)
+    idx = np.searchsorted(start_dates, np.asarray(dates, dtype=str), side='right') - 1
+    return timeline['divisor'].to_numpy(float)[idx]
 
 
 class IndexLevelDivisorDAO:
-    def __init__(self, source):
+    def __init__(self, source, index_name=DEFAULT_INDEX):
         self.source = source
+        self.index_name = index_name
 
     @property
     def table(self):
         return IndexLevelDivisor
 
     def set(self, divisor, start_date):
-        start_date = Date(start_date)
+        """
+        Apply `divisor` from `start_date` until the start of the next divisor of the timeline, if
+        any, replacing the divisor set from the same date.
+        """
+        start_date = str(Date(start_date))
+        tbl = self.table
+        is_index = (tbl.source == self.source) & (tbl.index_name == self.index_name)
 
-        upd_qry = (
-            update(self.table)
-            .where(
-                self.table.knowledge_end_date == str(EQUIWIX_END_OF_TIME),
-                self.table.source == self.source,
+        with atomic_session() as session:
+            end_date = session.execute(
+                select(func.min(tbl.knowledge_start_date)).where(
+                    is_index, tbl.knowledge_start_date > start_date
+                )
+            ).scalar()
+
+            session.execute(delete(tbl).where(is_index, tbl.knowledge_start_date == start_date))
+            session.execute(
+                update(tbl)
+                .where(
+                    is_index,
+                    tbl.knowledge_start_date < start_date,
+                    tbl.knowledge_end_date > start_date,
+                )
+                .values(knowledge_end_date=start_date)
             )
-            .values(knowledge_end_date=str(start_date))
-        )
+            session.execute(
+                insert(tbl).values(
+                    source=self.source,
+                    index_name=self.index_name,
+                    knowledge_start_date=start_date,
+                    knowledge_end_date=end_date or str(EQUIWIX_END_OF_TIME),
+                    divisor=divisor,
+                )
+            )
+            DataVersionDAO().bump(session, tbl)
 
-        ins_qry = insert(self.table).values(
-            source=self.source,
-            knowledge_start_date=str(start_date),
-            knowledge_end_date=str(EQUIWIX_END_OF_TIME),
-            divisor=divisor,
+        logging.info(
+            f'Divisor data synced into {self.table.__tablename__} for {self.index_name} and '
+            f'{start_date}'
         )
 
-        with atomic_session() as session:
-            session.execute(upd_qry)
-            session.execute(ins_qry)
-
-        logging.info(f'Divisor data synced into {self.table.__tablename__} for {start_date}')
-
     def set_as_first_date_open(self, start_date):
-        selector = IndexLevelDateSelector(source=self.source)
-        first_date_open = selector.select(date=selector.first_date).open.iloc[0]
-        self.set(first_date_open / EQUIWIX_OPENING_LEVEL, start_date)
+        """Set the divisor from `start_date` so that the first level of the index opens at 100."""
+        from .selectors import IndexLevelDateSelector
 
-    def get(self, date=None):
-        date = Date.today() if date is None else Date(date)
+        selector = IndexLevelDateSelector(source=self.source, index_name=self.index_name)
+        first_date = selector.first_date
+        first_date_open = selector.select(date=first_date).open.iloc[0] * self.get(first_date)
+        self.set(first_date_open / EQUIWIX_OPENING_LEVEL, start_date)
 
-        session = get_session()
-        qry = session.query(self.table.divisor).where(
-            self.table.source == self.source,
-            self.table.knowledge_start_date <= str(date),
-            self.table.knowledge_end_date > str(date),
+    def get_timeline(self):
+        """
+        Return the divisors of the index as a DataFrame of start_date, end_date and divisor rows
+        sorted by start_date, a divisor applying to the dates in [start_date, end_date).
+
+        The first divisor also applies to the dates before it was set, its start_date is
+        `EQUIWIX_START_OF_TIME`.
+        """
+        import pandas as pd
+
+        tbl = self.table
+        qry = (
+            select(tbl.knowledge_start_date, tbl.knowledge_end_date, tbl.divisor)
+            .where(tbl.source == self.source, tbl.index_name == self.index_name)
+            .order_by(tbl.knowledge_start_date)
         )
-        res = fetch_query_results(session, qry)
+        session = get_session()
+        rows = session.execute(qry).all()
         session.close()
 
-        if len(res) > 1:
-            raise ValueError(f'Got {len(res)} rows for {date} from {self.table.__tablename__}.')
+        if not rows:
+            raise ValueError(f'No divisor set for {self.index_name} from {self.source}')
 
-        return res.divisor.iloc[0]
+        timeline = pd.DataFrame(rows, columns=['start_date', 'end_date', 'divisor'])
+        timeline.loc[0, 'start_date'] = str(EQUIWIX_START_OF_TIME)
+        return timeline
 
-    def normalize_levels(self, divisor_as_of_date, start_date=None, end_date=None):
-        divisor = self.get(divisor_as_of_date)
-
-        tbl = IndexLevel
-        upd_qry = (
-            update(tbl)
-            .values(
-                **{
-                    level_type: getattr(tbl, level_type) / divisor
-                    for level_type in ['open', 'high', 'low', 'close']
-                }
-            )
-            .where(tbl.source == self.source)
-        )
-
-        if start_date is not None:
-            upd_qry = upd_qry.where(F.date(tbl.datetime_utc) >= start_date)
-        if end_date is not None:
-            upd_qry = upd_qry.where(F.date(tbl.datetime_utc) <= end_date)
-
-        with atomic_session() as session:
-            session.execute(upd_qry)
+    def get(self, date=None):
+        date = Date.today() if date is None else Date(date)
+        return get_divisors(self.get_timeline(), [str(date)])[0]
+
+    def recompute_levels(self, start_date):
+        """
+        Recompute the computed levels of the index affected by the divisor set from `start_date`,
+        i.e. of the dates it applies to.
+        """
+        import numpy as np
+
+        # Imported here as the level computer depends on this module. Setting a divisor only
+        # needs the DAO, so the selectors are imported on demand too.
+        from .selectors import IndexLevelDateSelector
+        from .yfinance_computer import YFinanceIndexLevelComputer
+
+        selector = IndexLevelDateSelector(self.source, self.index_name, cache=None)
+        first_date, last_date = selector.first_date, selector.last_date
+        if last_date is None:
+            return
+
+        timeline = self.get_timeline()
+        idx = np.searchsorted(timeline['start_date'].to_numpy(str), str(Date(start_date)), 'right')
+        span_start, span_end = timeline[['start_date', 'end_date']].iloc[idx - 1]
+        span_start = max(Date(span_start), Date(first_date))
+        span_end = min(Date(span_end) - timedelta(days=1), Date(last_date))
+        if span_start > span_end:
+            return
+
+        YFinanceIndexLevelComputer(
+            span_end,
+            span_start,
+            write_mode='upsert',
+            index_names=[self.index_name],
+            source=self.source,
+        ).sync()
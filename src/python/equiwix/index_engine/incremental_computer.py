@@ -0,0 +1,234 @@
+"""
+Module to compute the index constituents and index level of a single day incrementally.
+
+Instead of running the window function queries of `yfinance_computer`, only the bars of the run
+date are loaded. The index level of the run date uses the constituents carried over in the
+`IndexState` table by the previous run, and the market caps of the run date are ranked to derive
+the constituents of the next trading day. The tickers added and removed between both compositions
+are appended to the constituent intervals and the composition changes. The cost of a daily run is
+thus independent of the history length. All the indexes are computed in the same run, each one
+carrying its own state.
+
+The level is the market cap of the constituents divided by the divisor of the run date, as for the
+other computers, so it is computed from the bars of the run date alone and no level is carried.
+"""
+
+import logging
+
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..base_sync import BaseSync
+from ..constants import DEFAULT_SOURCE
+from ..db import atomic_session, get_session
+from ..db.data_version import DataVersionDAO
+from ..db.tables import IndexConstituents, IndexLevel, IndexState
+from ..trading_calendar import get_trading_calendar
+from .composition_changes import IndexCompositionChangeDAO
+from .constants import DEFAULT_INDEX
+from .constituent_intervals import IndexConstituentIntervalDAO
+from .definitions import get_index_definitions
+from .numpy_computer import YFinanceNumpyIndexEngine
+
+
+class IndexStateDAO:
+    def __init__(self, source, index_name=DEFAULT_INDEX):
+        self.source = source
+        self.index_name = index_name
+
+    @property
+    def table(self):
+        return IndexState
+
+    def get(self):
+        """Return the `IndexState` row of the index, None if there is none yet."""
+        session = get_session()
+        state = session.get(self.table, (self.source, self.index_name))
+        session.close()
+        return state
+
+    def get_upsert_query(self, members_date, members):
+        """
+        :param members: Ticker ids of the constituents of `members_date`.
+        """
+        values = dict(
+            source=self.source,
+            index_name=self.index_name,
+            members_date=str(members_date),
+            members=','.join(map(str, members)),
+        )
+        qry = sqlite_insert(self.table).values(**values)
+        return qry.on_conflict_do_update(index_elements=['source', 'index_name'], set_=values)
+
+
+class YFinanceIncrementalIndexComputer(BaseSync):
+    """
+    Compute the index level of the run date and the index constituents of the next day.
+
+    Falls back on the `IndexConstituents` table for the constituents of the run date if the
+    carried state isn't for the run date, e.g. on the first run or after a historical run. The
+    constituent intervals and composition changes are rebuilt instead of appended to if the run
+    date isn't the last date with computed constituents, e.g. on a re-run of a past date.
+    """
+
+    def __init__(
+        self,
+        run_date,
+        write_mode='insert',
+        storage='sqlite',
+        index_names=None,
+        source=DEFAULT_SOURCE,
+    ):
+        """
+        :param storage: Where the prices are read from, see `YFinanceNumpyIndexEngine`.
+        :param index_names: Names of the registered indexes to compute, all of them if None.
+        :param source: Source of the ticker data, and of the computed rows.
+        """
+        super().__init__(run_date, write_mode=write_mode)
+        self.index_definitions = get_index_definitions(index_names)
+        self.source = source
+        self.engine = YFinanceNumpyIndexEngine(
+            self.sync_end_date,
+            self.sync_end_date,
+            index_definitions=self.index_definitions,
+            storage=storage,
+            source=source,
+        )
+
+    @property
+    def table(self):
+        return IndexState
+
+    def check_data_availability(self):
+        if not get_trading_calendar().is_trading_day(self.sync_end_date):
+            raise ValueError(f'{self.sync_end_date} is not a trading day')
+        if len(self.engine.prices.timestamps) == 0:
+            raise ValueError('Data not available to sync')
+        return True
+
+    def get_constituents(self, states):
+        """
+        :param states: Dict of the `IndexState` row (or None) by index name.
+        """
+        constituents = []
+        missing = []
+        for index_name, state in states.items():
+            if state is not None and state.members_date == str(self.sync_end_date):
+                ticker_ids = (
+                    [int(t_id) for t_id in state.members.split(',')] if state.members else []
+                )
+                constituents.append(
+                    pd.DataFrame(
+                        {
+                            'date': state.members_date,
+                            'ticker_id': ticker_ids,
+                            'index_name': index_name,
+                        }
+                    )
+                )
+            else:
+                missing.append(index_name)
+
+        if missing:
+            logging.info(
+                f'No carried state of {missing} for {self.sync_end_date}, reading the '
+                f'constituents from {IndexConstituents.__tablename__}'
+            )
+            loaded = self.engine.load_constituents()
+            constituents.append(loaded[loaded['index_name'].isin(missing)])
+
+        return pd.concat(constituents, ignore_index=True)
+
+    def get_last_constituents_date(self, session, index_name):
+        """Return the last date with computed constituents of the index, None if there is none."""
+        tbl = IndexConstituents
+        return session.execute(
+            select(func.max(tbl.date)).where(
+                tbl.source == self.source, tbl.index_name == index_name
+            )
+        ).scalar()
+
+    def update_memberships(self, session, index_name, members, next_members, members_date, append):
+        """
+        Update the constituent intervals and the composition changes with the constituents of
+        `members_date`, once written.
+
+        :param members: Ticker ids of the constituents of the run date.
+        :param next_members: Ticker ids of the constituents of `members_date`.
+        :param append: Whether the run date was the last one with computed constituents, the
+            changes between `members` and `next_members` are then appended. Otherwise both are
+            rebuilt from `members_date`.
+        """
+        interval_dao = IndexConstituentIntervalDAO(self.source, index_name)
+        change_dao = IndexCompositionChangeDAO(self.source, index_name)
+        if not append:
+            interval_dao.rebuild(session, members_date)
+            change_dao.rebuild(session, members_date)
+            return
+
+        members, next_members = set(members), set(next_members)
+        added, removed = sorted(next_members - members), sorted(members - next_members)
+        interval_dao.append(session, members_date, added, removed)
+        change_dao.append(session, members_date, added, removed)
+
+    def sync(self):
+        with self.instrumented() as metrics:
+            index_names = [definition.name for definition in self.index_definitions]
+            # The prices are loaded by the availability check
+            with metrics.phase('fetch'):
+                self.check_data_availability()
+                states = {name: IndexStateDAO(self.source, name).get() for name in index_names}
+                constituents = self.get_constituents(states)
+
+            with metrics.phase('transform'):
+                levels = self.engine.compute_levels(constituents)
+                next_constituents = self.engine.compute_constituents()
+            # Nothing is written then, the carried state stays the one of the previous run
+            if next_constituents.empty:
+                raise ValueError(
+                    f'No index constituents computed for {self.sync_end_date}, check that the '
+                    f'ticker data of the index universes is synced for it'
+                )
+            members_date = next_constituents['date'].iloc[0]
+
+            with metrics.phase('write'), atomic_session() as session:
+                # Read before the next constituents are written
+                last_dates = {
+                    name: self.get_last_constituents_date(session, name) for name in index_names
+                }
+                if len(levels) > 0:
+                    session.execute(
+                        self.get_insert_query(IndexLevel), levels.to_dict(orient='records')
+                    )
+                session.execute(
+                    self.get_insert_query(IndexConstituents),
+                    next_constituents.to_dict(orient='records'),
+                )
+                for name in index_names:
+                    members = constituents.loc[constituents['index_name'] == name, 'ticker_id']
+                    next_members = next_constituents.loc[
+                        next_constituents['index_name'] == name, 'ticker_id'
+                    ].tolist()
+                    self.update_memberships(
+                        session,
+                        name,
+                        members.tolist(),
+                        next_members,
+                        members_date,
+                        append=last_dates[name] == str(self.sync_end_date),
+                    )
+                    session.execute(
+                        IndexStateDAO(self.source, name).get_upsert_query(
+                            members_date, next_members
+                        )
+                    )
+                DataVersionDAO().bump(session, IndexLevel, IndexConstituents, IndexState)
+
+            metrics.num_rows = len(levels) + len(next_constituents)
+
+        logging.info(
+            f'Computed {len(levels)} index levels for {self.sync_end_date} and '
+            f'{len(next_constituents)} index constituents for {members_date} of {index_names} in '
+            f'{metrics.duration:.2f}s'
+        )
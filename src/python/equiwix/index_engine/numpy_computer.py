@@ -0,0 +1,340 @@
+"""
+Module to compute index constituents and index levels using yfinance dataset in memory.
+
+This is an alternative to the SQL computers in `yfinance_computer`: prices and shares outstanding
+of the sync range are loaded once into dense ticker x timestamp NumPy matrices, and market caps,
+ranking, the next trading day shift and the OHLC levels are computed for the whole range in a few
+vectorized passes. The market caps are ranked once per ticker universe for all the indexes picking
+their constituents from it. Results are the same as the SQL computers'.
+
+Prices are read either from the `yfinance_ticker_data` table or from the Parquet store.
+"""
+
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from ..base_sync import DataFrameSync
+from ..constants import DEFAULT_SOURCE
+from ..data_ingestion.parquet_store import ParquetPriceStore
+from ..db import get_engine, get_session
+from ..db.tables import IndexConstituents, IndexLevel, TickerUniverse, YFinanceTickerData
+from ..db.ticker_dim import TickerDAO
+from ..trading_calendar import get_trading_calendar
+from .composition_changes import CompositionChangesMixin
+from .constituent_intervals import ConstituentIntervalsMixin
+from .definitions import get_index_definitions, group_by_universe
+from .divisor import IndexLevelDivisorDAO, get_divisors
+
+LEVEL_TYPES = ('open', 'high', 'low', 'close')
+
+PRICE_STORAGES = ('sqlite', 'parquet')
+
+
+def read_frame(qry):
+    """Read the rows of the `qry` select straight from the DBAPI cursor into a DataFrame."""
+    engine = get_engine()
+    # Expands the IN lists into positional parameters
+    compiled = qry.compile(engine, compile_kwargs={'render_postcompile': True})
+    params = [compiled.params[name] for name in compiled.positiontup]
+
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(str(compiled), params)
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    return pd.DataFrame.from_records(rows, columns=list(qry.selected_columns.keys()))
+
+
+class PriceMatrix:
+    """
+    Dense ticker x timestamp view of the rows of `YFinanceTickerData`, tickers being ticker ids.
+
+    Missing (ticker, timestamp) cells are NaN in the value matrices and False in `present`.
+    """
+
+    def __init__(self, data):
+        ticker_idx, tickers = pd.factorize(data['ticker_id'], sort=True)
+        ts_idx, timestamps = pd.factorize(data['datetime_utc'], sort=True)
+        self.tickers = np.asarray(tickers, dtype='int64')
+        self.timestamps = timestamps.to_numpy(str)
+        date_idx, dates = pd.factorize(timestamps.str[:10], sort=True)
+        self.dates = dates.to_numpy(str)
+        self.date_idx = date_idx
+
+        shape = (len(self.tickers), len(self.timestamps))
+        self.present = np.zeros(shape, dtype=bool)
+        self.present[ticker_idx, ts_idx] = True
+
+        self.values = {}
+        for col in (*LEVEL_TYPES, 'num_shares_outstanding'):
+            values = np.full(shape, np.nan)
+            values[ticker_idx, ts_idx] = data[col].to_numpy(float, na_value=np.nan)
+            self.values[col] = values
+
+    @classmethod
+    def load(cls, start_date, end_date, storage='sqlite', source=DEFAULT_SOURCE):
+        """
+        Load the prices of all the tickers of `source` for dates in [start_date, end_date].
+
+        :param storage: One of `PRICE_STORAGES`, where the prices are read from.
+        """
+        columns = ['ticker_id', 'datetime_utc', *LEVEL_TYPES, 'num_shares_outstanding']
+        if storage == 'parquet':
+            store = ParquetPriceStore(source=source)
+            data = store.read(start_date, end_date, columns=['ticker', *columns[1:]])
+            session = get_session()
+            data['ticker'] = TickerDAO().get_ids(session, data['ticker'])
+            session.close()
+            return cls(data.rename(columns={'ticker': 'ticker_id'}))
+
+        src_tbl = YFinanceTickerData
+        qry = select(*[getattr(src_tbl, col) for col in columns]).where(
+            src_tbl.date.between(str(start_date), str(end_date)), src_tbl.source == source
+        )
+        return cls(read_frame(qry))
+
+    @property
+    def num_tickers(self):
+        return len(self.tickers)
+
+    def last_per_date(self, col):
+        """
+        Return the (ticker x date) matrix of `col` taken from the last timestamp of each date at
+        which the ticker has a row, along with the matching presence mask.
+        """
+        # Timestamps are sorted, so the columns of a date are contiguous.
+        date_starts = np.flatnonzero(np.diff(self.date_idx, prepend=-1))
+        ts_pos = np.where(self.present, np.arange(len(self.timestamps)), -1)
+        last_ts = np.maximum.reduceat(ts_pos, date_starts, axis=1)
+
+        present = last_ts >= 0
+        values = np.take_along_axis(self.values[col], np.maximum(last_ts, 0), axis=1)
+        values[~present] = np.nan
+        return values, present
+
+
+def rank_market_caps(market_cap, present, max_rank):
+    """
+    Return the (ticker x date) matrix of the 0-based rank of the market cap of each ticker among
+    those of the date, capped at `max_rank` so that only the top `max_rank` ranks are sorted.
+
+    Mirrors `ROW_NUMBER() OVER (PARTITION BY date ORDER BY market_cap DESC) - 1`: tickers with a
+    NULL market cap rank after all the others, and tickers absent on a date rank `max_rank`.
+    """
+    num_tickers = market_cap.shape[0]
+    sort_key = np.where(np.isnan(market_cap), np.inf, -market_cap)
+    sort_key[~present] = np.nan
+
+    num_top = min(max_rank, num_tickers)
+    if num_tickers > num_top:
+        top_idx = np.argpartition(sort_key, num_top - 1, axis=0)[:num_top]
+    else:
+        top_idx = np.broadcast_to(np.arange(num_tickers)[:, None], market_cap.shape)
+    top_order = np.argsort(np.take_along_axis(sort_key, top_idx, axis=0), axis=0, kind='stable')
+    top_idx = np.take_along_axis(top_idx, top_order, axis=0)
+
+    ranks = np.full(market_cap.shape, max_rank)
+    date_idx = np.broadcast_to(np.arange(market_cap.shape[1]), top_idx.shape)
+    ranks[top_idx, date_idx] = np.arange(num_top)[:, None]
+    ranks[~present] = max_rank
+    return ranks
+
+
+class YFinanceNumpyIndexEngine:
+    """Compute the index constituents and levels of a source for a date range in memory."""
+
+    time_interval = "1day"
+
+    def __init__(
+        self, start_date, end_date, index_definitions=None, storage='sqlite', source=DEFAULT_SOURCE
+    ):
+        """
+        :param index_definitions: `IndexDefinition`s of the indexes to compute, all the registered
+            ones if None.
+        :param source: Source of the ticker data, and of the computed rows.
+        """
+        if storage not in PRICE_STORAGES:
+            raise ValueError(f'Invalid storage {storage}, expected one of {PRICE_STORAGES}')
+
+        self.start_date = start_date
+        self.end_date = end_date
+        self.index_definitions = index_definitions or get_index_definitions()
+        self.storage = storage
+        self.source = source
+
+    @cached_property
+    def prices(self):
+        return PriceMatrix.load(
+            self.start_date, self.end_date, storage=self.storage, source=self.source
+        )
+
+    def get_universe_mask(self, universe):
+        """Return the mask of the tickers of the price matrix which belong to `universe`."""
+        if universe is None:
+            return np.ones(self.prices.num_tickers, dtype=bool)
+
+        qry = select(TickerUniverse.ticker_id).where(TickerUniverse.univ == universe)
+        return np.isin(self.prices.tickers, read_frame(qry)['ticker_id'].to_numpy())
+
+    def compute_constituents(self):
+        """
+        Return the constituents rows (date, ticker_id, source, index_name) of the indexes derived
+        from the market caps of the trading days in the range. Index for trading day X is computed
+        based on market cap on the previous trading day.
+        """
+        prices = self.prices
+        close, present = prices.last_per_date('close')
+        shares, _ = prices.last_per_date('num_shares_outstanding')
+        market_cap = close * shares
+
+        calendar = get_trading_calendar()
+        is_trading_day = calendar.is_trading_day(prices.dates)
+        next_dates = calendar.next(prices.dates).astype(str)
+
+        constituents = []
+        for universe, definitions in group_by_universe(self.index_definitions).items():
+            max_rank = max(definition.num_stocks for definition in definitions)
+            ranks = rank_market_caps(
+                market_cap, present & self.get_universe_mask(universe)[:, None], max_rank
+            )
+            for definition in definitions:
+                members = (ranks < definition.num_stocks) & is_trading_day
+                ticker_idx, date_idx = np.nonzero(members)
+                constituents.append(
+                    pd.DataFrame(
+                        {
+                            'date': next_dates[date_idx],
+                            'ticker_id': prices.tickers[ticker_idx],
+                            'source': self.source,
+                            'index_name': definition.name,
+                        }
+                    )
+                )
+
+        return pd.concat(constituents, ignore_index=True)
+
+    def load_constituents(self):
+        tbl = IndexConstituents
+        qry = select(tbl.date, tbl.ticker_id, tbl.index_name).where(
+            tbl.source == self.source,
+            tbl.index_name.in_([definition.name for definition in self.index_definitions]),
+            tbl.date.between(str(self.start_date), str(self.end_date)),
+        )
+        return read_frame(qry)
+
+    def _compute_index_levels(self, definition, constituents, divisor_timeline):
+        prices = self.prices
+        members = np.zeros((prices.num_tickers, len(prices.dates)), dtype=bool)
+        ticker_idx = pd.Index(prices.tickers).get_indexer(constituents['ticker_id'])
+        date_idx = pd.Index(prices.dates).get_indexer(constituents['date'])
+        known = (ticker_idx >= 0) & (date_idx >= 0)
+        members[ticker_idx[known], date_idx[known]] = True
+
+        # Rows of the price x constituents join, per timestamp
+        joined = members[:, prices.date_idx] & prices.present
+        num_constituents = joined.sum(axis=0)
+        divisors = get_divisors(divisor_timeline, prices.dates)[prices.date_idx]
+
+        data = {
+            'datetime_utc': prices.timestamps,
+            'date': prices.dates[prices.date_idx],
+            'time_interval': self.time_interval,
+        }
+        for level_type in LEVEL_TYPES:
+            # SQL's SUM skips NULLs, and is NULL if all the summed values are NULL.
+            with np.errstate(divide='ignore'):
+                if definition.weighting == 'market_cap':
+                    weights = prices.values[level_type] * prices.values['num_shares_outstanding']
+                else:
+                    weights = 1 / prices.values[level_type]
+            weights = np.where(joined, weights, np.nan)
+            weights[np.isinf(weights)] = np.nan
+            level = np.nansum(weights, axis=0) / divisors
+            level[np.isnan(weights).all(axis=0)] = np.nan
+            data[level_type] = level
+
+        data['num_constituents'] = num_constituents
+        data['source'] = self.source
+        data['index_name'] = definition.name
+
+        return pd.DataFrame(data)[num_constituents > 0].reset_index(drop=True)
+
+    def compute_levels(self, constituents=None, divisor_timelines=None):
+        """
+        Return the index level rows of all the timestamps in the range, for each index. The levels
+        of a date are divided by the divisor applying to it.
+
+        :param constituents: DataFrame with date, ticker_id and index_name columns. Read from the
+            `IndexConstituents` table if None.
+        :param divisor_timelines: Dict of the divisor timeline by index name, see
+            `IndexLevelDivisorDAO.get_timeline`. Read from the DB for the missing indexes.
+        """
+        if constituents is None:
+            constituents = self.load_constituents()
+        divisor_timelines = divisor_timelines or {}
+
+        levels = []
+        for definition in self.index_definitions:
+            timeline = divisor_timelines.get(definition.name)
+            if timeline is None:
+                timeline = IndexLevelDivisorDAO(self.source, definition.name).get_timeline()
+            index_constituents = constituents[constituents['index_name'] == definition.name]
+            levels.append(self._compute_index_levels(definition, index_constituents, timeline))
+
+        return pd.concat(levels, ignore_index=True)
+
+
+class YFinanceNumpyComputer(DataFrameSync):
+    def __init__(
+        self, run_date, sync_start_date=None, write_mode='insert', storage='sqlite',
+        index_names=None, source=DEFAULT_SOURCE,
+    ):
+        """
+        :param storage: One of `PRICE_STORAGES`, where the prices are read from.
+        :param index_names: Names of the registered indexes to compute, all of them if None.
+        :param source: Source of the ticker data, and of the computed rows.
+        """
+        super().__init__(run_date, sync_start_date=sync_start_date, write_mode=write_mode)
+        self.storage = storage
+        self.index_definitions = get_index_definitions(index_names)
+        self.source = source
+
+    @cached_property
+    def engine(self):
+        return YFinanceNumpyIndexEngine(
+            self.sync_start_date,
+            self.sync_end_date,
+            index_definitions=self.index_definitions,
+            storage=self.storage,
+            source=self.source,
+        )
+
+
+class YFinanceNumpyIndexConstituentsComputer(
+    CompositionChangesMixin, ConstituentIntervalsMixin, YFinanceNumpyComputer
+):
+    """NumPy based drop-in replacement of `YFinanceIndexConstituentsComputer`."""
+
+    @property
+    def table(self):
+        return IndexConstituents
+
+    def get_data_to_sync(self):
+        return self.engine.compute_constituents()
+
+
+class YFinanceNumpyIndexLevelComputer(YFinanceNumpyComputer):
+    """NumPy based drop-in replacement of `YFinanceIndexLevelComputer`."""
+
+    @property
+    def table(self):
+        return IndexLevel
+
+    def get_data_to_sync(self):
+        return self.engine.compute_levels()
@@ -3,29 +3,43 @@ Module for selecting index constituent and index level data.
 
 This module provides classes to query equiwix index data efficiently while handling various date
 formats and ensuring valid date conversions. It includes:
-- `IndexConstituentsDateSelector`: Retrieves index composition for a given date or date range.
+- `IndexConstituentsDateSelector`: Retrieves index composition for a given date or date range,
+                                    reconstructed from the constituent intervals.
 - `IndexLevelDateSelector`: Retrieves index daily OHLC for a given date or date-range, ensuring
                             correct timezone conversion.
+- `IndexCompositionChangesDateSelector`: Retrieves the tickers added to and removed from the index
+                                         within a given date or date range.
 
 Key Features:
 - Supports multiple input formats for dates (integers, strings, ranges, pandas Series).
-- Ensures valid trading days using the NYSE calendar.
-- Filters data based on source validation.
+- Ensures valid trading days using the NYSE trading calendar.
+- Filters data based on source and index validation.
 - Handles missing data by returning `None` when no records match.
+- Caches the results in a process wide `SelectorCache`, invalidated by the data version of the
+  source table. Dates within an already cached wider selection are served from the cache.
 
 """
 
+import threading
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from datetime import date, datetime
 
+import numpy as np
 import pandas as pd
-import pandas_market_calendars as mcal
 from sqlalchemy import func as F
 from sqlalchemy.orm import Session
 
-from ..db import fetch_query_results, get_session
-from ..db.tables import IndexConstituents, IndexLevel
-from .constants import VALID_SOURCES
+from ..data_ingestion.providers import PROVIDERS
+from ..db import fetch_query_results, get_db_uri, get_session
+from ..db.data_version import DataVersionDAO
+from ..db.tables import IndexCompositionChange, IndexConstituents, IndexLevel
+from ..db.ticker_dim import TickerDAO
+from ..trading_calendar import get_trading_calendar
+from .composition_changes import IndexCompositionChangeDAO
+from .constants import DEFAULT_INDEX
+from .constituent_intervals import IndexConstituentIntervalDAO
+from .definitions import INDEX_DEFINITIONS
 
 
 def standardize_date_arg(fn):
@@ -43,9 +57,8 @@ def standardize_date_arg(fn):
                 start_date, end_date = date.split(':')
                 start_date = pd.to_datetime(start_date).date()
                 end_date = pd.to_datetime(end_date).date()
-                # Get the NYSE calendar
-                nyse = mcal.get_calendar('NYSE')
-                new_date = pd.Series(nyse.valid_days(start_date, end_date).date)
+                trading_days = get_trading_calendar().range(start_date, end_date)
+                new_date = pd.Series(pd.DatetimeIndex(trading_days).date)
             else:  # Single date
                 new_date = pd.Series([pd.to_datetime(date).date()])
 
@@ -63,13 +76,114 @@ def standardize_date_arg(fn):
     return wrapper
 
 
+class SelectorCache:
+    """
+    LRU cache of the results of the date selectors, bounded in entries and in bytes.
+
+    Entries are keyed by (DB, source, index, selector, selected dates) and tagged with the data
+    version of the selector's source table, so that any sync writing into the table invalidates
+    them. A selection covered by a cached entry is sliced out of it without querying the DB.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._num_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_num_bytes(result):
+        return int(np.sum(result.memory_usage(deep=True)))
+
+    def _remove(self, key):
+        _, _, _, num_bytes = self._entries.pop(key)
+        self._num_bytes -= num_bytes
+
+    def get(self, selector, dates, version):
+        """
+        Return the cached result of `selector.select` for `dates`, None if there is none.
+
+        :param dates: Sorted datetime64[D] array of the selected dates, None for all of them.
+        :param version: Current data version of the selector's source table.
+        """
+        prefix = (get_db_uri(), selector.source, selector.index_name, type(selector).__name__)
+
+        with self._lock:
+            for key in list(reversed(self._entries)):
+                if key[:4] != prefix:
+                    continue
+
+                entry_version, entry_dates, result, _ = self._entries[key]
+                if entry_version != version:
+                    self._remove(key)
+                elif dates is None and entry_dates is None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                elif dates is not None and selector.covers(entry_dates, result, dates):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return selector.slice(result, dates)
+
+            self.misses += 1
+            return None
+
+    def put(self, selector, dates, result, version):
+        key = (
+            get_db_uri(),
+            selector.source,
+            selector.index_name,
+            type(selector).__name__,
+            None if dates is None else dates.tobytes(),
+        )
+        num_bytes = self._get_num_bytes(result)
+        if num_bytes > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (version, dates, result, num_bytes)
+            self._num_bytes += num_bytes
+
+            while len(self._entries) > self.max_entries or self._num_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._num_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'bytes': self._num_bytes,
+        }
+
+
+# Shared by all the selectors of the process, e.g. across dashboard interactions
+SELECTOR_CACHE = SelectorCache()
+
+
 class BaseSelector(ABC):
     """Base class for common selector functionality."""
 
-    def __init__(self, source):
-        if source not in VALID_SOURCES:
-            raise ValueError(f"Invalid source: {source}")
+    def __init__(self, source, index_name=DEFAULT_INDEX):
+        # The rows are keyed by the name of the provider they are synced from
+        if source not in PROVIDERS:
+            raise ValueError(f"Invalid source: {source}, expected one of {list(PROVIDERS)}")
+        if index_name not in INDEX_DEFINITIONS:
+            raise ValueError(f"Invalid index: {index_name}")
         self.source = source
+        self.index_name = index_name
 
     @property
     @abstractmethod
@@ -84,10 +198,23 @@ class BaseSelector(ABC):
 class BaseDateSelector(BaseSelector):
     """Base class for common date based selector functionality."""
 
+    def __init__(self, source, index_name=DEFAULT_INDEX, cache=SELECTOR_CACHE):
+        """
+        :param index_name: Name of a registered index, see `definitions`.
+        :param cache: `SelectorCache` of the results, None to always query the DB.
+        """
+        super().__init__(source, index_name)
+        self.cache = cache
+
     @property
     def time_interval(self):
         return '1day'
 
+    @property
+    @abstractmethod
+    def src_tbl(self):
+        pass
+
     @property
     @abstractmethod
     def date_col(self):
@@ -98,7 +225,9 @@ class BaseDateSelector(BaseSelector):
             raise ValueError('Only min/max metric value supported.')
 
         session = get_session()
-        qry = session.query(F.date(getattr(F, metric)(self.date_col)).label('date'))
+        qry = session.query(F.date(getattr(F, metric)(self.date_col)).label('date')).filter(
+            self.src_tbl.source == self.source, self.src_tbl.index_name == self.index_name
+        )
         res = fetch_query_results(session, qry)
         return None if len(res) == 0 else res.date.iloc[0]
 
@@ -110,8 +239,47 @@ class BaseDateSelector(BaseSelector):
     def last_date(self):
         return self._get_date_col_min_max('max')
 
+    def get_data_version(self):
+        return DataVersionDAO().get(self.src_tbl)[0]
+
+    @staticmethod
+    def _get_result_dates(result):
+        index = pd.DatetimeIndex(result.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        return index.to_numpy().astype('datetime64[D]')
+
     @abstractmethod
+    def covers(self, cached_dates, cached_result, dates):
+        """
+        Return whether the result of the `cached_dates` selection contains the `dates` one.
+
+        :param cached_dates: Selected dates of the cached result, None if all the dates were.
+        """
+        pass
+
+    def slice(self, result, dates):
+        """Return the rows of the cached `result` for `dates`."""
+        return result[np.isin(self._get_result_dates(result), dates)]
+
+    @standardize_date_arg
     def select(self, date=None):
+        """Fetch the data of the given date(s), from the cache if possible."""
+        if self.cache is None:
+            return self._select(date)
+
+        dates = None if date is None else np.unique(date.to_numpy().astype('datetime64[D]'))
+        # Read before the select, so that a sync running concurrently can't be missed
+        version = self.get_data_version()
+        result = self.cache.get(self, dates, version)
+        if result is None:
+            result = self._select(date)
+            self.cache.put(self, dates, result, version)
+
+        return result.copy()
+
+    @abstractmethod
+    def _select(self, date=None):
         pass
 
 
@@ -126,20 +294,37 @@ class IndexConstituentsDateSelector(BaseDateSelector):
     def date_col(self):
         return self.src_tbl.date
 
-    @standardize_date_arg
-    def select(self, date=None):
-        """Fetch tickers for the given date(s)."""
+    def covers(self, cached_dates, cached_result, dates):
+        # Only the dates within the cached selection are known to have no constituents
+        if cached_dates is None:
+            cached_dates = self._get_result_dates(cached_result)
+        return np.isin(dates, cached_dates).all()
+
+    def _select(self, date=None):
+        """
+        Fetch tickers for the given date(s).
+
+        Compositions are reconstructed from the constituent intervals, for the dates between the
+        first and the last computed date.
+        """
         session = get_session()
+        interval_dao = IndexConstituentIntervalDAO(self.source, self.index_name)
 
-        qry = session.query(self.src_tbl.date, self.src_tbl.ticker).filter(
-            self.src_tbl.source == self.source
-        )
-        if date is not None:
-            qry = qry.filter(self.src_tbl.date.in_(date.tolist()))
+        first_date, last_date = interval_dao.get_coverage(session)
+        if first_date is None:
+            dates = []
+        elif date is None:
+            dates = get_trading_calendar().range(first_date, last_date).astype(str)
+        else:
+            dates = pd.Series(date.astype(str).unique()).sort_values()
+            dates = dates[(dates >= first_date) & (dates <= last_date)]
 
-        df = fetch_query_results(session, qry)
+        df = interval_dao.get_constituents(session, dates)
+        df['ticker'] = TickerDAO().get_tickers(session, df['ticker_id'])
         session.close()
 
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.sort_values(['date', 'ticker'])
         return df.groupby("date")["ticker"].apply(list)
 
 
@@ -154,8 +339,17 @@ class IndexLevelDateSelector(BaseDateSelector):
     def date_col(self):
         return self.src_tbl.datetime_utc
 
-    @standardize_date_arg
-    def select(self, date=None):
+    def covers(self, cached_dates, cached_result, dates):
+        # Levels are selected by date range
+        if cached_dates is None:
+            return True
+        return cached_dates[0] <= dates[0] and dates[-1] <= cached_dates[-1]
+
+    def slice(self, result, dates):
+        result_dates = self._get_result_dates(result)
+        return result[(result_dates >= dates[0]) & (result_dates <= dates[-1])]
+
+    def _select(self, date=None):
         """Fetch index levels for the given date(s)."""
         session = get_session()
 
@@ -167,17 +361,18 @@ class IndexLevelDateSelector(BaseDateSelector):
             self.src_tbl.close,
             self.src_tbl.num_constituents,
         ).filter(
-            self.src_tbl.source == self.source, self.src_tbl.time_interval == self.time_interval
+            self.src_tbl.source == self.source,
+            self.src_tbl.index_name == self.index_name,
+            self.src_tbl.time_interval == self.time_interval,
         )
 
         if date is not None:
-            qry = qry.filter(F.date(self.src_tbl.datetime_utc).between(date.min(), date.max()))
+            qry = qry.filter(self.src_tbl.date.between(str(date.min()), str(date.max())))
 
-        df = fetch_query_results(session, qry)
+        df = fetch_query_results(session, qry, parse_dates=["datetime_utc"])
         session.close()
 
         # Convert datetime_utc to New York timezone and extract the latest timestamp per date
-        df["datetime_utc"] = pd.to_datetime(df["datetime_utc"])
         df["datetime_ny"] = (
             df["datetime_utc"].dt.tz_localize("UTC").dt.tz_convert("America/New_York")
         )
@@ -185,3 +380,38 @@ class IndexLevelDateSelector(BaseDateSelector):
 
         df = df.sort_values("datetime_ny").drop_duplicates("date", keep="last")
         return df.set_index("date").drop(columns=["datetime_utc", "datetime_ny"])
+
+
+class IndexCompositionChangesDateSelector(BaseDateSelector):
+    """Selector for the persisted index composition changes based on date."""
+
+    @property
+    def src_tbl(self):
+        return IndexCompositionChange
+
+    @property
+    def date_col(self):
+        return self.src_tbl.date
+
+    def covers(self, cached_dates, cached_result, dates):
+        # Changes are selected by date range
+        if cached_dates is None:
+            return True
+        return cached_dates[0] <= dates[0] and dates[-1] <= cached_dates[-1]
+
+    def slice(self, result, dates):
+        result_dates = self._get_result_dates(result)
+        return result[(result_dates >= dates[0]) & (result_dates <= dates[-1])]
+
+    def _select(self, date=None):
+        """Fetch the ticker and change ('add' or 'remove') of the changes within the date(s)."""
+        session = get_session()
+        dao = IndexCompositionChangeDAO(self.source, self.index_name)
+        if date is None:
+            df = dao.get(session)
+        else:
+            df = dao.get(session, date.min(), date.max())
+        session.close()
+
+        df['date'] = pd.to_datetime(df['date'])
+        return df.set_index('date')
@@ -3,24 +3,61 @@ Module to compute index constituents and index levels using yfinance dataset
 and sync to the respective tables.
 """
 
-from sqlalchemy import desc
+from datetime import timedelta
+
+from sqlalchemy import case, desc
 from sqlalchemy import func as F
-from sqlalchemy import literal, select
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.orm import aliased
 
 from ..base_sync import SelectQuerySync
-from ..db.tables import IndexConstituents, IndexLevel, YFinanceTickerData
-from .constants import NUM_STOCKS_IN_INDEX
+from ..constants import DEFAULT_SOURCE
+from ..db.tables import (IndexConstituents, IndexLevel, TickerUniverse, TradingDay,
+                         YFinanceTickerData)
+from ..trading_calendar import DEFAULT_EXCHANGE, get_trading_calendar
+from .composition_changes import CompositionChangesMixin
+from .constituent_intervals import ConstituentIntervalsMixin
+from .definitions import get_index_definitions, group_by_universe
 from .divisor import IndexLevelDivisorDAO
 
 
-class YFinanceIndexConstituentsComputer(SelectQuerySync):
+def _literal_rows(name, rows):
+    """Return a CTE of the literal `rows` (dicts with the same keys) joinable in a select query."""
+    return union_all(
+        *[select(*[literal(value).label(col) for col, value in row.items()]) for row in rows]
+    ).cte(name)
+
+
+class MultiIndexSelectQuerySync(SelectQuerySync):
+    def __init__(
+        self,
+        run_date,
+        sync_start_date=None,
+        write_mode='insert',
+        index_names=None,
+        source=DEFAULT_SOURCE,
+    ):
+        """
+        :param index_names: Names of the registered indexes to compute, all of them if None.
+        :param source: Source of the ticker data the indexes are computed from, and of the
+            computed rows.
+        """
+        super().__init__(run_date, sync_start_date, write_mode)
+        self.index_definitions = get_index_definitions(index_names)
+        self.source = source
+
+
+class YFinanceIndexConstituentsComputer(
+    CompositionChangesMixin, ConstituentIntervalsMixin, MultiIndexSelectQuerySync
+):
     """
     Compute the index constituents on a daily basis and sync to the index_consituents table.
 
-    Note: Index for day X is computed based on market cap on day X - 1.
-    """
+    The market caps are computed once for all the indexes and ranked once per ticker universe, the
+    constituents of each index are the top ranks of its universe.
 
-    source = "yfinance"
+    Note: Index for trading day X is computed based on market cap on the previous trading day.
+    """
 
     @property
     def table(self):
@@ -29,6 +66,11 @@ class YFinanceIndexConstituentsComputer(SelectQuerySync):
     def check_data_availability(self):
         raise NotImplementedError
 
+    def sync(self):
+        # The select query joins the calendar table, populated here if the DB doesn't have it yet
+        get_trading_calendar(DEFAULT_EXCHANGE)
+        super().sync()
+
     def get_select_query(self):
         src_tbl = YFinanceTickerData
 
@@ -37,20 +79,20 @@ class YFinanceIndexConstituentsComputer(SelectQuerySync):
         # Pick the close value of the last interval of the day to rank tickers based on market cap.
         latest_per_day_data = (
             select(
-                src_tbl.ticker,
-                F.date(src_tbl.datetime_utc).label("date"),
+                src_tbl.ticker_id,
+                src_tbl.date,
                 src_tbl.close,
                 src_tbl.num_shares_outstanding,
                 F.row_number()
                 .over(
-                    partition_by=(src_tbl.ticker, F.date(src_tbl.datetime_utc)),
+                    partition_by=(src_tbl.ticker_id, src_tbl.date),
                     order_by=desc(src_tbl.datetime_utc),
                 )
                 .label("recent_rank"),
             )
             .where(
-                (F.date(src_tbl.datetime_utc) >= str(self.sync_start_date))
-                & (F.date(src_tbl.datetime_utc) <= str(self.sync_end_date))
+                src_tbl.date.between(str(self.sync_start_date), str(self.sync_end_date)),
+                src_tbl.source == self.source,
             )
             .cte("latest_per_day_data")
         )
@@ -58,39 +100,86 @@ class YFinanceIndexConstituentsComputer(SelectQuerySync):
         # Calculate market capitalization
         market_cap = latest_per_day_data.c.close * latest_per_day_data.c.num_shares_outstanding
 
-        # Order and assign rank to rows based on descending market cap
-        market_cap_rank = (
-            F.row_number()
-            .over(partition_by=latest_per_day_data.c.date, order_by=desc(market_cap))
-            .label("market_cap_rank")
-        )
-
-        market_cap_rank_data = (
+        market_caps = (
             select(
                 latest_per_day_data.c.date,
-                latest_per_day_data.c.ticker,
-                market_cap_rank,
+                latest_per_day_data.c.ticker_id,
+                market_cap.label("market_cap"),
             )
             .where(latest_per_day_data.c.recent_rank == 1)
-            .cte("market_cap_rank_data")
+            .cte("market_caps")
+        )
+
+        # Shift to the next trading day, once per date. Both are primary key lookups into the
+        # calendar table, and market cap dates which aren't trading days are dropped by the join.
+        trading_day = aliased(TradingDay)
+        next_trading_day = aliased(TradingDay)
+        next_date = (
+            select(F.min(next_trading_day.date))
+            .where(
+                next_trading_day.exchange == DEFAULT_EXCHANGE,
+                next_trading_day.date > trading_day.date,
+            )
+            .scalar_subquery()
         )
+        next_dates = (
+            select(trading_day.date, next_date.label("next_date"))
+            .where(
+                trading_day.exchange == DEFAULT_EXCHANGE,
+                trading_day.date.between(str(self.sync_start_date), str(self.sync_end_date)),
+            )
+            .cte("next_dates")
+        )
+
+        selects = []
+        for i, (universe, definitions) in enumerate(
+            group_by_universe(self.index_definitions).items()
+        ):
+            # Order and assign rank to rows based on descending market cap
+            market_cap_rank = (
+                F.row_number()
+                .over(partition_by=market_caps.c.date, order_by=desc(market_caps.c.market_cap))
+                .label("market_cap_rank")
+            )
+            market_cap_rank_data = select(
+                market_caps.c.date, market_caps.c.ticker_id, market_cap_rank
+            )
+            if universe is not None:
+                market_cap_rank_data = market_cap_rank_data.where(
+                    market_caps.c.ticker_id.in_(
+                        select(TickerUniverse.ticker_id).where(TickerUniverse.univ == universe)
+                    )
+                )
+            market_cap_rank_data = market_cap_rank_data.cte(f"market_cap_rank_data_{i}")
+
+            index_sizes = _literal_rows(
+                f"index_sizes_{i}",
+                [{"index_name": d.name, "num_stocks": d.num_stocks} for d in definitions],
+            )
+
+            selects.append(
+                select(
+                    next_dates.c.next_date.label("date"),
+                    market_cap_rank_data.c.ticker_id,
+                    literal(self.source).label("source"),
+                    index_sizes.c.index_name,
+                ).where(
+                    market_cap_rank_data.c.market_cap_rank <= index_sizes.c.num_stocks,
+                    next_dates.c.date == market_cap_rank_data.c.date,
+                )
+            )
 
-        return select(
-            F.date(market_cap_rank_data.c.date, "+1 day").label("date"),
-            market_cap_rank_data.c.ticker,
-            literal(self.source).label("source"),
-        ).where(market_cap_rank_data.c.market_cap_rank <= NUM_STOCKS_IN_INDEX)
+        return union_all(*selects) if len(selects) > 1 else selects[0]
 
 
-class YFinanceIndexLevelComputer(SelectQuerySync):
+class YFinanceIndexLevelComputer(MultiIndexSelectQuerySync):
     """
-    Compute the index level (OHLC).
+    Compute the index level (OHLC) of the indexes in one aggregation over their constituents, each
+    date being divided by the divisor applying to it.
     The table index_level supports storing levels for any interval and start time.
     YFinance supports computing levels only for 1-day intervals.
     """
 
-    source = "yfinance"
-
     time_interval = "1day"
 
     @property
@@ -100,38 +189,90 @@ class YFinanceIndexLevelComputer(SelectQuerySync):
     def check_data_availability(self):
         raise NotImplementedError
 
+    def get_divisor_timeline(self, index_name):
+        """
+        Return the (start_date, end_date, divisor) rows of the divisor timeline of the index,
+        clipped to the computed dates.
+
+        SQLite may bound the range scan of the price date index by the divisor dates rather than
+        by the computed ones, so unclipped divisor dates would make a daily run scan the prices of
+        every date.
+        """
+        range_start = str(self.sync_start_date)
+        range_end = str(self.sync_end_date + timedelta(days=1))
+        return [
+            (max(start_date, range_start), min(end_date, range_end), divisor)
+            for start_date, end_date, divisor in IndexLevelDivisorDAO(self.source, index_name)
+            .get_timeline()
+            .itertuples(index=False)
+            if start_date < range_end and end_date > range_start
+        ]
+
     def get_select_query(self):
         price_src_tbl = YFinanceTickerData
         constituents_src_tbl = IndexConstituents
 
+        # Weighting and divisor timeline of each index, range joined on the price dates
+        index_params = _literal_rows(
+            "index_params",
+            [
+                {
+                    "index_name": d.name,
+                    "weighting": d.weighting,
+                    "start_date": start_date,
+                    "end_date": end_date,
+                    "divisor": divisor,
+                }
+                for d in self.index_definitions
+                for start_date, end_date, divisor in self.get_divisor_timeline(d.name)
+            ],
+        )
+
         # Join condition
         join_condition = [
-            F.date(price_src_tbl.datetime_utc) == constituents_src_tbl.date,
-            price_src_tbl.ticker == constituents_src_tbl.ticker,
+            price_src_tbl.date == constituents_src_tbl.date,
+            price_src_tbl.ticker_id == constituents_src_tbl.ticker_id,
+            price_src_tbl.source == self.source,
+            constituents_src_tbl.source == self.source,
+            constituents_src_tbl.index_name == index_params.c.index_name,
+            price_src_tbl.date >= index_params.c.start_date,
+            price_src_tbl.date < index_params.c.end_date,
         ]
 
-        ticker_count = F.count(F.distinct(price_src_tbl.ticker))
+        ticker_count = F.count(F.distinct(price_src_tbl.ticker_id))
 
-        idx_divisor = IndexLevelDivisorDAO(source=self.source).get(self.sync_end_date)
+        def level(level_type):
+            price = getattr(price_src_tbl, level_type)
+            weight = case(
+                (
+                    index_params.c.weighting == "market_cap",
+                    price * price_src_tbl.num_shares_outstanding,
+                ),
+                else_=1 / price,
+            )
+            return (F.sum(weight) / index_params.c.divisor).label(level_type)
 
         # Select statement
         stmt = (
             select(
                 price_src_tbl.datetime_utc,
+                price_src_tbl.date,
                 literal(self.time_interval).label("time_interval"),
-                *[
-                    (F.sum(1 / getattr(price_src_tbl, level_type)) / idx_divisor).label(level_type)
-                    for level_type in ('open', 'high', 'low', 'close')
-                ],
+                *[level(level_type) for level_type in ('open', 'high', 'low', 'close')],
                 ticker_count.label("num_constituents"),
                 literal(self.source).label("source"),
+                index_params.c.index_name,
             )
             .where(
                 *join_condition,
-                F.date(price_src_tbl.datetime_utc) >= str(self.sync_start_date),
-                F.date(price_src_tbl.datetime_utc) <= str(self.sync_end_date),
+                price_src_tbl.date.between(str(self.sync_start_date), str(self.sync_end_date)),
+            )
+            .group_by(
+                index_params.c.index_name,
+                index_params.c.divisor,
+                price_src_tbl.datetime_utc,
+                price_src_tbl.date,
             )
-            .group_by(price_src_tbl.datetime_utc)
         )
 
         return stmt
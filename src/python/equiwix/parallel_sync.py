@@ -0,0 +1,147 @@
+"""
+Parallel historical recomputation of the tables synced by the index computers.
+
+The sync range is split into date partitions which are computed by a process pool. Each worker
+reads its partition in a single statement, i.e. from a consistent snapshot of the DB, and returns
+the rows instead of writing them. The parent process is the single writer: the rows of every
+partition are written in partition order, each in a transaction which also records the partition as
+completed in the `sync_checkpoint` table. An interrupted run thus resumes from the partition after
+the last completed one when run again with the same range.
+"""
+
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from .db import atomic_session, dispose_engines
+from .db.data_version import DataVersionDAO
+from .db.sync_checkpoint import SyncCheckpointDAO
+from .trading_calendar import get_trading_calendar
+from .util import Date
+
+DEFAULT_PARTITION_DAYS = 30
+
+
+def get_partitions(start_date, end_date, partition_days=DEFAULT_PARTITION_DAYS):
+    """Return the consecutive (start, end) ranges of `partition_days` days covering the range."""
+    start_date, end_date = Date(start_date), Date(end_date)
+    partitions = []
+    while start_date <= end_date:
+        partition_end = min(Date(start_date + timedelta(days=partition_days - 1)), end_date)
+        partitions.append((start_date, partition_end))
+        start_date = Date(partition_end + timedelta(days=1))
+    return partitions
+
+
+def _compute_partition(computer_cls, start_date, end_date, kwargs):
+    # Dates are passed as strings, `Date` can't be unpickled
+    computer = computer_cls(run_date=end_date, sync_start_date=start_date, **kwargs)
+    return computer.get_data_to_sync()
+
+
+class ParallelHistoricalSync:
+    def __init__(
+        self,
+        computer_cls,
+        run_date,
+        sync_start_date,
+        workers,
+        write_mode='insert',
+        partition_days=DEFAULT_PARTITION_DAYS,
+        **kwargs,
+    ):
+        """
+        Sync the range of a `SelectQuerySync` or `DataFrameSync` computer partition by partition.
+
+        The rows of a date only depend on the source data of that date for the supported
+        computers, e.g. the constituents of the market cap dates of a partition or the levels of
+        its dates, so the partitions are independent.
+
+        :param computer_cls: Computer class, instantiated for the whole range in this process to
+            write the rows and run its `post_sync`, and for each partition in the workers.
+        :param workers: Number of worker processes.
+        :param partition_days: Number of calendar days per partition.
+        :param kwargs: Extra arguments of the computer, e.g. index_names, storage or source.
+        """
+        if workers < 1:
+            raise ValueError('workers should be >= 1.')
+
+        self.computer_cls = computer_cls
+        self.computer = computer_cls(run_date, sync_start_date, write_mode=write_mode, **kwargs)
+        self.workers = workers
+        self.partition_days = partition_days
+        self.kwargs = kwargs
+
+    @property
+    def job(self):
+        """Checkpoint key of the sync, which the source and the computed indexes are part of."""
+        job = self.computer_cls.__name__
+        source = getattr(self.computer, 'source', None)
+        if source is not None:
+            job = f'{job}:{source}'
+        index_names = [d.name for d in getattr(self.computer, 'index_definitions', [])]
+        if not index_names:
+            return job
+        return f'{job}:{",".join(index_names)}'
+
+    def _write_partition(self, metrics, checkpoint_dao, partition, future):
+        # Waiting for the workers
+        with metrics.phase('fetch'):
+            data = future.result()
+        with metrics.phase('write'), atomic_session() as session:
+            self.computer._write(session, data)
+            checkpoint_dao.set(session, partition[1])
+            DataVersionDAO().bump(session, self.computer.table)
+        metrics.num_rows += len(data)
+
+        logging.info(
+            f'Data synced into {self.computer.table.__tablename__} for '
+            f'{partition[0]}:{partition[1]} ({len(data)} rows)'
+        )
+
+    def sync(self):
+        computer = self.computer
+        start_date, end_date = computer.sync_start_date, computer.sync_end_date
+        checkpoint_dao = SyncCheckpointDAO(self.job, start_date, end_date)
+        with atomic_session() as session:
+            completed_date = checkpoint_dao.get(session)
+
+        partitions = get_partitions(start_date, end_date, self.partition_days)
+        if completed_date is not None:
+            partitions = [p for p in partitions if str(p[1]) > completed_date]
+            logging.info(f'Resuming {self.job} after {completed_date}')
+
+        # Populated here if needed so that the workers only read
+        get_trading_calendar()
+
+        # One run in `sync_run`, the partitions being computed by the workers while it waits
+        with computer.instrumented(job=f'{type(self).__name__}:{self.job}') as metrics:
+            self._sync_partitions(metrics, checkpoint_dao, partitions)
+
+            with metrics.phase('write'), atomic_session() as session:
+                computer.post_sync(session)
+                checkpoint_dao.delete(session)
+                DataVersionDAO().bump(session, computer.table)
+
+        logging.info(
+            f'Data synced into {computer.table.__tablename__} for '
+            f'{start_date}:{end_date} in {len(partitions)} partitions ({metrics.num_rows} rows in '
+            f'{metrics.duration:.2f}s)'
+        )
+
+    def _sync_partitions(self, metrics, checkpoint_dao, partitions):
+        # Bounds the computed-but-unwritten partitions held in memory
+        max_in_flight = 2 * self.workers
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=dispose_engines) as executor:
+            in_flight = deque()
+            for partition in partitions:
+                future = executor.submit(
+                    _compute_partition, self.computer_cls, *map(str, partition), self.kwargs
+                )
+                in_flight.append((partition, future))
+                if len(in_flight) >= max_in_flight:
+                    self._write_partition(metrics, checkpoint_dao, *in_flight.popleft())
+
+            while in_flight:
+                self._write_partition(metrics, checkpoint_dao, *in_flight.popleft())
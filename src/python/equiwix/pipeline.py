@@ -0,0 +1,167 @@
+"""
+Daily pipeline syncing the ticker data of a date and computing the index constituents and levels
+from it, in a single process.
+
+The stages form a small DAG: the constituents of the next trading day (ranked on the market caps of
+the run date) and the levels of the run date (from its constituents, computed by the previous run)
+both depend on the synced ticker data only. Each stage records its completion in the
+`sync_checkpoint` table, in the (last) transaction which writes its rows, so that a re-run skips
+the completed stages and resumes from the one which failed. The sync stage commits its ticker
+batches as they are fetched, a failed one is thus best re-run with `fill_gaps` to only fetch the
+tickers it missed.
+
+The rows written by the sync stage are handed over to the NumPy computers of the other stages
+instead of being read back, when they are all the rows of the run date.
+"""
+
+import logging
+
+import pandas as pd
+from sqlalchemy import func, select
+
+from .constants import DEFAULT_SOURCE, PIPELINE_STAGES
+from .data_ingestion.constants import YFINANCE_START_OF_TIME
+from .data_ingestion.yfinance_sync import YFinanceDataSync
+from .db import atomic_session, get_session
+from .db.sync_checkpoint import SyncCheckpointDAO
+from .db.tables import YFinanceTickerData
+from .index_engine.numpy_computer import (PriceMatrix, YFinanceNumpyIndexConstituentsComputer,
+                                          YFinanceNumpyIndexLevelComputer)
+from .trading_calendar import get_trading_calendar
+from .util import Date
+
+# Stages each stage of `PIPELINE_STAGES` depends on
+STAGE_DEPENDENCIES = {'sync': (), 'constituents': ('sync',), 'levels': ('sync',)}
+
+
+class DailyPipeline:
+    job = 'DailyPipeline'
+
+    def __init__(
+        self,
+        run_date,
+        stages=PIPELINE_STAGES,
+        fill_gaps=False,
+        write_mode=None,
+        force=False,
+        sync_kwargs=None,
+        compute_kwargs=None,
+    ):
+        """
+        :param stages: Stages to run, a subset of `PIPELINE_STAGES`. Their dependencies must be
+            completed already if they are left out.
+        :param fill_gaps: Sync the trading days missing since `YFINANCE_START_OF_TIME` instead of
+            the run date only, see `YFinanceDataSync`.
+        :param write_mode: One of `WRITE_MODES`, upsert with `force` and insert otherwise by
+            default.
+        :param force: Re-run the stages which are already completed for the run date. Their rows
+            are already written, so the write mode can't be insert.
+        :param sync_kwargs: Extra arguments of `YFinanceDataSync`, e.g. workers or provider.
+        :param compute_kwargs: Extra arguments of the index computers, e.g. index_names or storage.
+        """
+        unknown = [stage for stage in stages if stage not in PIPELINE_STAGES]
+        if unknown:
+            raise ValueError(f'Unknown stages {unknown}, expected some of {PIPELINE_STAGES}')
+        if write_mode is None:
+            write_mode = 'upsert' if force else 'insert'
+        elif force and write_mode == 'insert':
+            raise ValueError('Completed stages can only be re-run with an upsert write mode.')
+
+        self.run_date = Date(run_date)
+        self.stages = [stage for stage in PIPELINE_STAGES if stage in stages]
+        self.fill_gaps = fill_gaps
+        self.write_mode = write_mode
+        self.force = force
+        self.sync_kwargs = sync_kwargs or {}
+        self.compute_kwargs = compute_kwargs or {}
+        # The indexes are computed from the ticker data of the provider synced from
+        provider = self.sync_kwargs.get('provider')
+        self.source = DEFAULT_SOURCE if provider is None else provider.name
+        self.prices = None
+
+    def _checkpoint_dao(self, stage):
+        return SyncCheckpointDAO(f'{self.job}:{stage}', self.run_date, self.run_date)
+
+    def get_completed_stages(self):
+        with atomic_session() as session:
+            return {
+                stage
+                for stage in PIPELINE_STAGES
+                if self._checkpoint_dao(stage).get(session) is not None
+            }
+
+    def get_computer(self, stage):
+        if stage == 'sync':
+            return YFinanceDataSync(
+                self.run_date,
+                YFINANCE_START_OF_TIME if self.fill_gaps else None,
+                write_mode=self.write_mode,
+                fill_gaps=self.fill_gaps,
+                keep_data=True,
+                **self.sync_kwargs,
+            )
+
+        computer_cls = {
+            'constituents': YFinanceNumpyIndexConstituentsComputer,
+            'levels': YFinanceNumpyIndexLevelComputer,
+        }[stage]
+        computer = computer_cls(
+            self.run_date, write_mode=self.write_mode, source=self.source, **self.compute_kwargs
+        )
+        if self.prices is not None:
+            computer.engine.prices = self.prices
+        return computer
+
+    def _set_prices(self, computer):
+        """Keep the synced rows of the run date for the next stages if they are all of them."""
+        if not computer.synced_data or computer.storage == 'parquet':
+            return
+        if self.compute_kwargs.get('storage', 'sqlite') != 'sqlite':
+            return
+
+        run_date = str(self.run_date)
+        data = pd.concat(computer.synced_data, ignore_index=True)
+        data = data[data['date'] == run_date]
+
+        # Rows synced by earlier runs, e.g. of tickers which failed this time, would be missing
+        session = get_session()
+        tbl = YFinanceTickerData
+        num_rows = session.execute(
+            select(func.count()).where(tbl.date == run_date, tbl.source == self.source)
+        ).scalar()
+        session.close()
+
+        if num_rows == len(data):
+            self.prices = PriceMatrix(data)
+        else:
+            logging.info(
+                f'{num_rows - len(data)} rows of {run_date} were synced before, the next stages '
+                f'read the prices from the DB'
+            )
+
+    def run(self):
+        if not get_trading_calendar().is_trading_day(self.run_date):
+            raise ValueError(f'{self.run_date} is not a trading day')
+
+        completed = self.get_completed_stages()
+        for stage in self.stages:
+            if stage in completed and not self.force:
+                logging.info(f'Stage {stage} of {self.run_date} already completed, skipping it')
+                continue
+
+            missing = [dep for dep in STAGE_DEPENDENCIES[stage] if dep not in completed]
+            if missing:
+                raise ValueError(f'Stage {stage} of {self.run_date} depends on {missing}')
+
+            computer = self.get_computer(stage)
+            checkpoint_dao = self._checkpoint_dao(stage)
+            computer.post_sync_hooks.append(
+                lambda session, dao=checkpoint_dao: dao.set(session, self.run_date)
+            )
+            computer.sync()
+            completed.add(stage)
+
+            if stage == 'sync':
+                self._set_prices(computer)
+
+        logging.info(f'Pipeline of {self.run_date} completed: {", ".join(self.stages)}')
@@ -0,0 +1,124 @@
+"""
+Per-phase timings and throughput of the syncs.
+
+Every `BaseSync.sync`, and `ParallelHistoricalSync.sync`, collects a `SyncMetrics`: the time spent
+fetching the data to sync, transforming it into the table format and writing it, the number of
+rows written and the latency of the individual provider calls. Once the sync completes or fails,
+its record is logged as a JSON message on the `equiwix.sync_metrics` logger and stored in the
+`sync_run` table (see `SyncRunDAO`), e.g. to find which phase of a nightly run got slower.
+"""
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .db import atomic_session
+from .db.sync_run import SyncRunDAO
+
+PHASES = ('fetch', 'transform', 'write')
+
+# Percentiles of the fetch latencies recorded, as (column suffix, percentile)
+LATENCY_PERCENTILES = (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))
+
+logger = logging.getLogger(__name__)
+
+
+class SyncMetrics:
+    def __init__(self, sync, job=None):
+        """
+        Timings of one run of `sync`, started on creation.
+
+        :param job: Name of the job in `sync_run`, defaults to the class name of `sync`.
+
+        The phases are timed in the thread running the sync. A phase entered within another one
+        is excluded from the outer one, e.g. the transform of the fetched data done while the sync
+        waits for the next chunk, so the phases add up to at most the duration of the run.
+        """
+        self.sync = sync
+        self.job = type(sync).__name__ if job is None else job
+        self.started_at_utc = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self.start = time.perf_counter()
+        self.duration = None
+        self.phase_durations = dict.fromkeys(PHASES, 0.0)
+        self.num_rows = 0
+        # Durations of the provider calls, appended by the fetch workers
+        self.fetch_latencies = []
+        self._phase_stack = []
+
+    @contextmanager
+    def phase(self, name):
+        if name not in PHASES:
+            raise ValueError(f'Invalid phase {name}, expected one of {PHASES}')
+
+        # [name, start, time spent in the nested phases]
+        current = [name, time.perf_counter(), 0.0]
+        self._phase_stack.append(current)
+        try:
+            yield
+        finally:
+            self._phase_stack.pop()
+            elapsed = time.perf_counter() - current[1]
+            self.phase_durations[name] += elapsed - current[2]
+            if self._phase_stack:
+                self._phase_stack[-1][2] += elapsed
+
+    def iter_phase(self, name, iterable):
+        """Iterate over `iterable`, timing the production of each of its items as phase `name`."""
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def add_fetch_latency(self, seconds):
+        self.fetch_latencies.append(seconds)
+
+    def stop(self):
+        self.duration = time.perf_counter() - self.start
+
+    def to_record(self, error=None):
+        """Return the row of the run in `sync_run`, `error` being the exception it failed with."""
+        sync = self.sync
+        record = {
+            'job': self.job,
+            'table_name': sync.table.__tablename__,
+            'sync_start_date': str(sync.sync_start_date),
+            'sync_end_date': str(sync.sync_end_date),
+            'write_mode': sync.write_mode,
+            'started_at_utc': self.started_at_utc,
+            'status': 'failed' if error is not None else 'success',
+            'error': repr(error)[:1000] if error is not None else None,
+            'duration_s': self.duration,
+            **{f'{name}_s': duration for name, duration in self.phase_durations.items()},
+            'num_rows': self.num_rows,
+            'rows_per_s': self.num_rows / self.duration if self.duration else None,
+            'num_fetches': len(self.fetch_latencies),
+        }
+
+        latencies = np.array(self.fetch_latencies)
+        for suffix, percentile in LATENCY_PERCENTILES:
+            column = f'fetch_latency_{suffix}_s'
+            record[column] = float(np.percentile(latencies, percentile)) if len(latencies) else None
+
+        return record
+
+    def report(self, error=None):
+        """Log the record of the run as JSON and store it, in a transaction of its own."""
+        record = self.to_record(error)
+        logger.info(json.dumps(record))
+
+        # The run history is best effort, it must not fail a sync whose data is committed
+        try:
+            with atomic_session() as session:
+                SyncRunDAO().record(session, record)
+        except Exception as e:
+            logging.warning(f'Could not record the run of {record["job"]}: {e}')
+
+        return record
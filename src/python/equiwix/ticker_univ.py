@@ -1,10 +1,12 @@
 import logging
 
 import pandas as pd
-from sqlalchemy import insert
+from sqlalchemy import insert, select
 
 from .db import atomic_session, fetch_query_results, get_session
-from .db.tables import TickerUniverse
+from .db.data_version import DataVersionDAO
+from .db.tables import Ticker, TickerUniverse
+from .db.ticker_dim import TickerDAO
 
 
 class TickerUniv:
@@ -14,16 +16,20 @@ class TickerUniv:
     def table(self):
         return TickerUniverse
 
-    def add(self, tickers):
-        data_dict = [{'univ': self.univ, 'ticker': ticker} for ticker in tickers]
+    def _insert(self, tickers):
         with atomic_session() as session:
+            ticker_ids = TickerDAO().get_ids(session, tickers, create=True)
+            data_dict = [{'univ': self.univ, 'ticker_id': int(t_id)} for t_id in ticker_ids]
             session.execute(insert(self.table), data_dict)
+            DataVersionDAO().bump(session, self.table)
 
+    def add(self, tickers):
+        self._insert(tickers)
         logging.info(f'Added {tickers} to the {self.univ} universe.')
 
     def get_tickers(self, all_univ=False):
         session = get_session()
-        qry = session.query(self.table.ticker)
+        qry = select(Ticker.ticker).join(self.table, self.table.ticker_id == Ticker.ticker_id)
         if not all_univ:
             qry = qry.where(self.table.univ == self.univ)
 
@@ -43,9 +49,5 @@ class SP500TickerUniv(TickerUniv):
 
     def add(self):
         tickers = self.get_tickers_to_sync()
-
-        data_dict = [{'univ': self.univ, 'ticker': ticker} for ticker in tickers]
-        with atomic_session() as session:
-            session.execute(insert(self.table), data_dict)
-
+        self._insert(tickers)
         logging.info(f'Added {len(tickers)} to the {self.univ} universe.')
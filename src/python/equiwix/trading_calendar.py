@@ -0,0 +1,164 @@
+"""
+Module providing the trading days of an exchange.
+
+The trading days of the supported date span are generated once with pandas_market_calendars and
+persisted in the `trading_calendar` table. They are then loaded once per process into a sorted
+array, on which range expansion, previous/next trading day and trading day arithmetic are binary
+searches.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from .db import atomic_session, get_db_uri, get_session
+from .db.tables import TradingDay
+from .util import Date
+
+DEFAULT_EXCHANGE = 'NYSE'
+
+# Span of the generated calendars
+TRADING_CALENDAR_START = Date(20000101)
+TRADING_CALENDAR_END = Date(20391231)
+
+_calendars = {}
+_calendars_lock = threading.Lock()
+
+
+def _to_days(dates):
+    """Convert a date or an array-like of dates into datetime64[D]."""
+    if isinstance(dates, (str, int)):
+        dates = Date(dates)
+    if np.ndim(dates) == 0:
+        return np.datetime64(pd.Timestamp(dates).date(), 'D')
+    return pd.DatetimeIndex(pd.to_datetime(dates)).to_numpy().astype('datetime64[D]')
+
+
+class TradingCalendar:
+    """Sorted trading days of an exchange."""
+
+    def __init__(self, days):
+        self.days = np.unique(_to_days(days))
+
+    @classmethod
+    def generate(cls, exchange=DEFAULT_EXCHANGE, start_date=None, end_date=None):
+        """Generate the calendar of `exchange` with pandas_market_calendars."""
+        import pandas_market_calendars as mcal
+
+        start_date = TRADING_CALENDAR_START if start_date is None else Date(start_date)
+        end_date = TRADING_CALENDAR_END if end_date is None else Date(end_date)
+        valid_days = mcal.get_calendar(exchange).valid_days(start_date, end_date)
+        return cls(valid_days.tz_localize(None))
+
+    def _check_bounds(self, positions):
+        if np.any(positions < 0) or np.any(positions >= len(self.days)):
+            raise ValueError(
+                f'Dates out of the trading calendar span {self.days[0]}:{self.days[-1]}'
+            )
+
+    def is_trading_day(self, dates):
+        """Return whether `dates` (a date or an array-like of dates) are trading days."""
+        days = _to_days(dates)
+        positions = np.searchsorted(self.days, days)
+        positions = np.minimum(positions, len(self.days) - 1)
+        return self.days[positions] == days
+
+    def range(self, start_date, end_date):
+        """Return the datetime64[D] array of the trading days in [start_date, end_date]."""
+        first = np.searchsorted(self.days, _to_days(start_date), side='left')
+        last = np.searchsorted(self.days, _to_days(end_date), side='right')
+        return self.days[first:last]
+
+    def offset(self, dates, num_days):
+        """
+        Return the trading day `num_days` trading days after (or before if negative) `dates`.
+
+        Dates which aren't trading days are first rolled to the previous trading day for positive
+        offsets, and to the next one for negative offsets.
+        """
+        days = _to_days(dates)
+        if num_days > 0:
+            positions = np.searchsorted(self.days, days, side='right') - 1 + num_days
+        else:
+            positions = np.searchsorted(self.days, days, side='left') + num_days
+
+        self._check_bounds(positions)
+        return self.days[positions]
+
+    def next(self, dates):
+        """Return the first trading day after `dates`."""
+        return self.offset(dates, 1)
+
+    def previous(self, dates):
+        """Return the last trading day before `dates`."""
+        return self.offset(dates, -1)
+
+
+class TradingCalendarDAO:
+    # Number of days written per executemany batch
+    write_batch_size = 10_000
+
+    def __init__(self, exchange=DEFAULT_EXCHANGE):
+        self.exchange = exchange
+
+    @property
+    def table(self):
+        return TradingDay
+
+    def get(self):
+        """Return the persisted `TradingCalendar` of the exchange, None if there is none."""
+        session = get_session()
+        qry = select(self.table.date).where(self.table.exchange == self.exchange)
+        days = session.execute(qry).scalars().all()
+        session.close()
+
+        return TradingCalendar(days) if days else None
+
+    def set(self, calendar, session=None):
+        """
+        Persist `calendar`, replacing the previous one of the exchange.
+
+        :param session: Session or connection to write with, a new atomic session if None.
+        """
+        if session is None:
+            with atomic_session() as session:
+                return self.set(calendar, session)
+
+        session.execute(self.table.__table__.delete().where(self.table.exchange == self.exchange))
+
+        # Compiled once and executed on the driver in batches, as in `BaseSync._write`
+        conn = session.connection() if isinstance(session, Session) else session
+        compiled = insert(self.table).compile(
+            dialect=conn.dialect, column_keys=['exchange', 'date']
+        )
+        days = calendar.days.astype(str).tolist()
+        data = {'exchange': [self.exchange] * len(days), 'date': days}
+        columns = [data[col] for col in compiled.positiontup]
+        for start in range(0, len(days), self.write_batch_size):
+            end = start + self.write_batch_size
+            conn.exec_driver_sql(
+                str(compiled), list(zip(*[values[start:end] for values in columns]))
+            )
+
+
+def get_trading_calendar(exchange=DEFAULT_EXCHANGE):
+    """
+    Return the `TradingCalendar` of `exchange`, loaded once per process.
+
+    The calendar is generated and persisted if the DB doesn't have it yet.
+    """
+    key = (get_db_uri(), exchange)
+    with _calendars_lock:
+        calendar = _calendars.get(key)
+        if calendar is None:
+            dao = TradingCalendarDAO(exchange)
+            calendar = dao.get()
+            if calendar is None:
+                calendar = TradingCalendar.generate(exchange)
+                dao.set(calendar)
+            _calendars[key] = calendar
+
+    return calendar
@@ -1,23 +1,34 @@
+import functools
 import os
-import subprocess
 from datetime import date
 
 from dateutil.parser import parse
 
+HOME_ENV_VAR = 'EQUIWIX_HOME'
 
+
+@functools.lru_cache(maxsize=None)
 def get_equiwix_home():
-    """Return the root directory of this repo."""
-    try:
-        # Run Git command to get repo root
-        output = subprocess.check_output(
-            ["git", "rev-parse", "--show-toplevel"],
-            stderr=subprocess.STDOUT,
-            text=True,
-            cwd=os.path.dirname(os.path.abspath(__file__)),  # Start from current file's dir
-        ).strip()
-        return output
-    except subprocess.CalledProcessError:
-        raise RuntimeError("Not inside a Git repository or Git is not installed")
+    """
+    Return the root directory of this repo.
+
+    The `EQUIWIX_HOME` env var takes precedence, otherwise it is the closest parent directory of
+    this file holding a `.git` entry, i.e. what `git rev-parse --show-toplevel` returns, without
+    spawning git.
+    """
+    if os.environ.get(HOME_ENV_VAR):
+        return os.environ[HOME_ENV_VAR]
+
+    path = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        # .git is a file in worktrees and submodules
+        if os.path.exists(os.path.join(path, '.git')):
+            return path
+
+        parent = os.path.dirname(path)
+        if parent == path:
+            raise RuntimeError(f"Not inside a Git repository, set the {HOME_ENV_VAR} env var")
+        path = parent
 
 
 class Date(date):
@@ -36,6 +47,7 @@ class Date(date):
         return super().__new__(cls, *args)
 
 
+EQUIWIX_START_OF_TIME = Date(19000101)
 EQUIWIX_END_OF_TIME = Date(20991231)
 
 # Index starts from price 100
@@ -1,14 +1,18 @@
 import argparse
 
 from equiwix.log_utils import add_logging_args, configure_logging
-from equiwix.ticker_univ import SP500TickerUniv, TickerUniv
 
 
 def add_ticker_manually(tickers):
+    # Imported by the sub-commands, as it loads the DB stack
+    from equiwix.ticker_univ import TickerUniv
+
     TickerUniv().add(tickers)
 
 def add_tickers_from_source(source):
     if source == "sp500":
+        from equiwix.ticker_univ import SP500TickerUniv
+
         SP500TickerUniv().add()
     else:
         raise ValueError(f"Unsupported source: {source}")
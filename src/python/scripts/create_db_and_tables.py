@@ -1,5 +1,6 @@
 """
 This script is used to create the database and tables for the Equiwix application.
+Databases created by an older version are migrated to the current schema.
 """
 
 from equiwix.db.creation import create_db_and_tables
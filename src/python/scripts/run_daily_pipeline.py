@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from equiwix.constants import PIPELINE_STAGES, WRITE_MODES
+from equiwix.data_ingestion.constants import STORAGES
+from equiwix.data_ingestion.providers import PROVIDERS, get_provider
+from equiwix.index_engine.definitions import INDEX_DEFINITIONS
+from equiwix.log_utils import add_logging_args, configure_logging
+from equiwix.util import Date
+
+
+def getargs():
+    parser = argparse.ArgumentParser(
+        description="Sync the ticker data of a date and compute the index constituents and "
+        "levels from it in one process. Completed stages are skipped when re-run."
+    )
+
+    parser.add_argument("date", type=Date, help="Trading day to run the pipeline for.")
+
+    parser.add_argument(
+        "--stages",
+        type=str,
+        nargs='+',
+        choices=PIPELINE_STAGES,
+        default=list(PIPELINE_STAGES),
+        help="Stages to run, all of them by default.",
+    )
+
+    parser.add_argument(
+        "--fill-gaps",
+        action="store_true",
+        help="Sync the trading days missing for each ticker instead of the date only.",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-run the stages already completed for the date, upserting their rows.",
+    )
+
+    parser.add_argument(
+        "--write-mode",
+        type=str,
+        choices=WRITE_MODES,
+        help="How the rows are written, see equiwix-sync_yfinance_data. upsert with --force and "
+        "insert otherwise by default.",
+    )
+
+    parser.add_argument(
+        "--provider",
+        type=str,
+        choices=list(PROVIDERS),
+        default='yfinance',
+        help="Market data provider the ticker data is fetched from.",
+    )
+
+    parser.add_argument(
+        "--provider-path",
+        type=str,
+        help="Dir of the CSV/Parquet dumps read by the file provider.",
+    )
+
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Number of concurrent fetch workers."
+    )
+
+    parser.add_argument(
+        "--batch-size", type=int, default=1, help="Number of tickers fetched per provider call."
+    )
+
+    parser.add_argument(
+        "--storage",
+        type=str,
+        choices=STORAGES,
+        default='sqlite',
+        help="Where the ticker data is written. The index computers read the prices from the "
+        "Parquet store unless sqlite is passed.",
+    )
+
+    parser.add_argument(
+        "--indexes",
+        type=str,
+        nargs='+',
+        choices=list(INDEX_DEFINITIONS),
+        help="Indexes computed, all the registered ones by default.",
+    )
+
+    add_logging_args(parser)
+
+    args = parser.parse_args()
+    if args.force and args.write_mode == 'insert':
+        parser.error('--force re-writes the rows of the completed stages, it needs an upsert mode')
+    return args
+
+
+def main():
+    args = getargs()
+
+    configure_logging(args.log_level)
+
+    # Imported once the arguments are parsed, as it loads the DB stack
+    from equiwix.pipeline import DailyPipeline
+
+    provider_kwargs = {'root': args.provider_path} if args.provider_path else {}
+    compute_kwargs = {'index_names': args.indexes}
+    if args.storage != 'sqlite':
+        compute_kwargs['storage'] = 'parquet'
+
+    DailyPipeline(
+        args.date,
+        stages=args.stages,
+        fill_gaps=args.fill_gaps,
+        write_mode=args.write_mode,
+        force=args.force,
+        sync_kwargs={
+            'provider': get_provider(args.provider, **provider_kwargs),
+            'workers': args.workers,
+            'batch_size': args.batch_size,
+            'storage': args.storage,
+        },
+        compute_kwargs=compute_kwargs,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
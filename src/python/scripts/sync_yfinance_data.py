@@ -1,18 +1,39 @@
 #!/usr/bin/env python3
 
 import argparse
+import logging
 
-from equiwix.data_ingestion.yfinance_sync import (YFINANCE_START_OF_TIME,
-                                                  YFinanceDataSync)
-from equiwix.index_engine.yfinance_computer import (
-    YFinanceIndexConstituentsComputer, YFinanceIndexLevelComputer)
+from equiwix.constants import WRITE_MODES
+from equiwix.data_ingestion.constants import (DEFAULT_MAX_CACHE_BYTES,
+                                              DEFAULT_SHARES_TTL_DAYS, STORAGES,
+                                              YFINANCE_START_OF_TIME)
+from equiwix.data_ingestion.providers import PROVIDERS, get_provider
+from equiwix.index_engine.definitions import INDEX_DEFINITIONS
 from equiwix.log_utils import add_logging_args, configure_logging
 from equiwix.util import Date
 
+# Index engines of the compute actions, see `get_computers`
+ENGINES = ('sql', 'numpy')
+
+
+def get_computers(engine):
+    """Return the (constituents, levels) computer classes of `engine`."""
+    # Imported once the arguments are parsed, as they load the DB stack
+    if engine == 'numpy':
+        from equiwix.index_engine.numpy_computer import (
+            YFinanceNumpyIndexConstituentsComputer, YFinanceNumpyIndexLevelComputer)
+
+        return YFinanceNumpyIndexConstituentsComputer, YFinanceNumpyIndexLevelComputer
+
+    from equiwix.index_engine.yfinance_computer import (
+        YFinanceIndexConstituentsComputer, YFinanceIndexLevelComputer)
+
+    return YFinanceIndexConstituentsComputer, YFinanceIndexLevelComputer
+
 
 def getargs():
-    actions = ['sync', 'compute_constituents', 'compute_levels']
-    modes = ['incremental', 'historical']
+    actions = ['sync', 'compute_constituents', 'compute_levels', 'compute_daily']
+    modes = ['incremental', 'historical', 'gaps']
 
     parser = argparse.ArgumentParser(
         description="Sync YFinance data and compute index constituents and levels using "
@@ -31,7 +52,111 @@ def getargs():
         choices=modes,
         default='incremental',
         help=f"Pass incremental for single day's sync and historical to sync from "
-        f"{YFINANCE_START_OF_TIME} till passed date.",
+        f"{YFINANCE_START_OF_TIME} till passed date. gaps only applies to the sync action, which "
+        f"then fetches the trading days missing for each ticker since {YFINANCE_START_OF_TIME}, "
+        f"e.g. missed days or the history of newly added tickers.",
+    )
+
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=ENGINES,
+        default='sql',
+        help="Engine used by the compute actions: SQL window functions or in-memory NumPy.",
+    )
+
+    parser.add_argument(
+        "--write-mode",
+        type=str,
+        choices=WRITE_MODES,
+        default='insert',
+        help="insert fails on already synced rows, upsert overwrites them and upsert_changed "
+        "only writes the rows whose values changed.",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of concurrent fetch workers used by the sync action.",
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Number of tickers fetched per provider call by the sync action.",
+    )
+
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="Number of retries per ticker batch before giving up on it.",
+    )
+
+    parser.add_argument(
+        "--shares-ttl-days",
+        type=int,
+        default=DEFAULT_SHARES_TTL_DAYS,
+        help="Number of days the stored shares outstanding of a ticker are used by the sync action "
+        "before being refetched.",
+    )
+
+    parser.add_argument(
+        "--provider",
+        type=str,
+        choices=list(PROVIDERS),
+        default='yfinance',
+        help="Market data provider the sync action fetches the ticker data from. The rows are "
+        "recorded with its name as their source, from which the compute actions compute the "
+        "indexes.",
+    )
+
+    parser.add_argument(
+        "--provider-path",
+        type=str,
+        help="Dir of the CSV/Parquet dumps read by the file provider.",
+    )
+
+    parser.add_argument(
+        "--provider-cache",
+        action="store_true",
+        help="Serve the bars of closed periods fetched by previous sync actions from the on-disk "
+        "provider cache (EQUIWIX_PROVIDER_CACHE_PATH, provider_cache/ at the root of the repo "
+        "by default).",
+    )
+
+    parser.add_argument(
+        "--provider-cache-max-mb",
+        type=int,
+        default=DEFAULT_MAX_CACHE_BYTES // 1024**2,
+        help="Size of the provider cache above which the least recently used entries are evicted.",
+    )
+
+    parser.add_argument(
+        "--storage",
+        type=str,
+        choices=STORAGES,
+        default='sqlite',
+        help="Where the sync action writes the ticker data. The numpy engine reads the prices "
+        "from the Parquet store unless sqlite is passed.",
+    )
+
+    parser.add_argument(
+        "--indexes",
+        type=str,
+        nargs='+',
+        choices=list(INDEX_DEFINITIONS),
+        help="Indexes computed by the compute actions, all the registered ones by default.",
+    )
+
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        help="Number of worker processes computing the date partitions of a historical "
+        "compute_constituents or compute_levels run. Interrupted runs resume from the last "
+        "completed partition.",
     )
 
     add_logging_args(parser)
@@ -44,17 +169,81 @@ def main():
 
     configure_logging(args.log_level)
 
+    if args.mode == 'gaps' and args.action != 'sync':
+        raise ValueError('The gaps mode only applies to the sync action')
+
     sync_start_date = None
-    if args.mode == 'historical':
+    if args.mode in ('historical', 'gaps'):
         sync_start_date = YFINANCE_START_OF_TIME
 
-    if args.action == 'sync':
-        YFinanceDataSync(run_date=args.date, sync_start_date=sync_start_date).sync()
-    elif args.action == 'compute_constituents':
-        YFinanceIndexConstituentsComputer(
-            run_date=args.date, sync_start_date=sync_start_date
+    # Storage the prices are read from by the compute actions
+    price_storage = 'sqlite' if args.storage == 'sqlite' else 'parquet'
+    # The compute actions read and write the rows of the provider's source
+    compute_kwargs = {'index_names': args.indexes, 'source': args.provider}
+    if price_storage != 'sqlite':
+        if args.engine == 'sql' and args.action in ('compute_constituents', 'compute_levels'):
+            raise ValueError('The sql engine can only read the prices from sqlite')
+        compute_kwargs['storage'] = price_storage
+
+    compute_actions = ('compute_constituents', 'compute_levels')
+
+    # The modules of each action are imported in its branch, as they load the DB stack
+    if args.parallel is not None:
+        if args.mode != 'historical' or args.action not in compute_actions:
+            raise ValueError('--parallel only applies to the historical compute actions')
+
+        from equiwix.parallel_sync import ParallelHistoricalSync
+
+        computers = dict(zip(compute_actions, get_computers(args.engine)))
+        ParallelHistoricalSync(
+            computers[args.action],
+            run_date=args.date,
+            sync_start_date=sync_start_date,
+            workers=args.parallel,
+            write_mode=args.write_mode,
+            **compute_kwargs,
+        ).sync()
+    elif args.action == 'sync':
+        from equiwix.data_ingestion.provider_cache import CachedProvider
+        from equiwix.data_ingestion.yfinance_sync import YFinanceDataSync
+
+        provider_kwargs = {'root': args.provider_path} if args.provider_path else {}
+        provider = get_provider(args.provider, **provider_kwargs)
+        if args.provider_cache:
+            provider = CachedProvider(provider, max_bytes=args.provider_cache_max_mb * 1024**2)
+
+        YFinanceDataSync(
+            run_date=args.date,
+            sync_start_date=sync_start_date,
+            write_mode=args.write_mode,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            max_retries=args.max_retries,
+            storage=args.storage,
+            provider=provider,
+            shares_ttl_days=args.shares_ttl_days,
+            fill_gaps=args.mode == 'gaps',
+        ).sync()
+
+        if args.provider_cache:
+            logging.info(provider.report())
+    elif args.action in compute_actions:
+        computers = dict(zip(compute_actions, get_computers(args.engine)))
+        computers[args.action](
+            run_date=args.date,
+            sync_start_date=sync_start_date,
+            write_mode=args.write_mode,
+            **compute_kwargs,
+        ).sync()
+    elif args.action == 'compute_daily':
+        if args.mode != 'incremental':
+            raise ValueError('compute_daily only supports the incremental mode')
+
+        from equiwix.index_engine.incremental_computer import \
+            YFinanceIncrementalIndexComputer
+
+        YFinanceIncrementalIndexComputer(
+            run_date=args.date, write_mode=args.write_mode, **compute_kwargs
         ).sync()
-    elif args.action == 'compute_levels':
-        YFinanceIndexLevelComputer(run_date=args.date, sync_start_date=sync_start_date).sync()
     else:
         raise ValueError(f'Unknown action {args.action}')
@@ -1,14 +1,23 @@
 import argparse
 
-from equiwix.index_engine.divisor import IndexLevelDivisorDAO
+from equiwix.index_engine.constants import DEFAULT_INDEX
+from equiwix.index_engine.definitions import INDEX_DEFINITIONS
 from equiwix.log_utils import add_logging_args, configure_logging
 
 
 def get_args():
-    parser = argparse.ArgumentParser(description="Update the divisor for a given source.")
+    parser = argparse.ArgumentParser(description="Update the divisor for a given source and index.")
     parser.add_argument("--source", required=True, help="The source identifier.")
+    parser.add_argument(
+        "--index", default=DEFAULT_INDEX, choices=list(INDEX_DEFINITIONS), help="The index name."
+    )
     parser.add_argument("--divisor", required=True, type=float, help="The divisor value.")
     parser.add_argument("--start_date", required=True, help="The start date for the divisor.")
+    parser.add_argument(
+        "--no-recompute",
+        action="store_true",
+        help="Don't recompute the already computed index levels affected by the new divisor.",
+    )
 
     add_logging_args(parser)
 
@@ -19,8 +28,13 @@ def main():
     args = get_args()
     configure_logging(args.log_level)
 
-    dao = IndexLevelDivisorDAO(args.source)
+    # Imported once the arguments are parsed, as it loads the DB stack
+    from equiwix.index_engine.divisor import IndexLevelDivisorDAO
+
+    dao = IndexLevelDivisorDAO(args.source, args.index)
     dao.set(args.divisor, args.start_date)
+    if not args.no_recompute:
+        dao.recompute_levels(args.start_date)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,62 @@
+"""
+Fixtures of the equiwix tests, which run against temporary sqlite DBs loaded with the synthetic
+markets of the benchmarks.
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+# First, as it puts the equiwix sources on the path
+from synthetic_market import generate_market, load_market
+
+from equiwix.db import create_db_and_tables, dispose_engines
+from equiwix.db.util import DB_PATH_ENV_VAR
+from equiwix.trading_calendar import get_trading_calendar
+
+# Enough tickers for the constituents of the default index to churn, over a quarter
+NUM_TICKERS, NUM_DAYS = 150, 60
+END_DATE = '2024-12-31'
+
+
+@pytest.fixture(scope='session')
+def template_db(tmp_path_factory):
+    """Path of an empty DB of the current schema, created once as its calendar is slow to build."""
+    path = str(tmp_path_factory.mktemp('template') / 'equiwix.db')
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv(DB_PATH_ENV_VAR, path)
+        create_db_and_tables()
+        dispose_engines()
+    # The copies only take the DB file
+    with sqlite3.connect(path) as conn:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return path
+
+
+@pytest.fixture
+def db(template_db, tmp_path, monkeypatch):
+    """Path of an empty DB of the current schema, which equiwix points at during the test."""
+    path = str(tmp_path / 'equiwix.db')
+    shutil.copy(template_db, path)
+    monkeypatch.setenv(DB_PATH_ENV_VAR, path)
+    yield path
+    dispose_engines()
+
+
+@pytest.fixture
+def days(db):
+    """Sorted ISO dates of the trading days of the synthetic market."""
+    return get_trading_calendar().range('2000-01-01', END_DATE)[-NUM_DAYS:].astype(str)
+
+
+@pytest.fixture
+def market(db, days):
+    """Synthetic market loaded into the DB, with a divisor of 1 for the default index."""
+    market = generate_market(NUM_TICKERS, days.astype('datetime64[D]'))
+    load_market(market)
+    return market
@@ -0,0 +1,18 @@
+"""Helpers shared by the tests."""
+
+import pandas as pd
+from sqlalchemy import delete, select
+
+from equiwix.db import atomic_session, get_engine
+
+
+def read_table(table):
+    """Return the rows of `table` as a DataFrame sorted by all its columns."""
+    data = pd.read_sql(select(table), get_engine())
+    return data.sort_values(list(data.columns), ignore_index=True)
+
+
+def clear(*tables):
+    with atomic_session() as session:
+        for table in tables:
+            session.execute(delete(table))
@@ -0,0 +1,94 @@
+"""Tests of the computed and persisted index composition changes."""
+
+import pandas as pd
+from sqlalchemy import insert
+
+from equiwix.db import atomic_session, get_session
+from equiwix.db.tables import IndexCompositionChange, IndexConstituents, Ticker
+from equiwix.index_engine.composition_changes import (IndexCompositionChangeDAO,
+                                                      compute_composition_changes)
+from equiwix.index_engine.yfinance_computer import YFinanceIndexConstituentsComputer
+from helpers import clear, read_table
+
+COMPOSITIONS = pd.Series(
+    [['AAA', 'BBB'], ['AAA', 'CCC'], ['AAA', 'CCC'], ['BBB', 'CCC', 'DDD']],
+    index=pd.to_datetime(['2024-12-23', '2024-12-24', '2024-12-26', '2024-12-27']),
+)
+
+EXPECTED_CHANGES = pd.DataFrame(
+    {
+        'date': pd.to_datetime(['2024-12-24', '2024-12-24', '2024-12-27', '2024-12-27',
+                                '2024-12-27']),
+        'ticker': ['CCC', 'BBB', 'BBB', 'DDD', 'AAA'],
+        'change': ['add', 'remove', 'add', 'add', 'remove'],
+    }
+)
+
+
+def test_compute_composition_changes():
+    pd.testing.assert_frame_equal(compute_composition_changes(COMPOSITIONS), EXPECTED_CHANGES)
+
+    # Same changes out of the rows of a DataFrame, in any order
+    rows = COMPOSITIONS.explode().rename('ticker').rename_axis('date').reset_index()
+    changes = compute_composition_changes(rows.sample(frac=1, random_state=0))
+    pd.testing.assert_frame_equal(changes, EXPECTED_CHANGES)
+
+
+def test_compute_composition_changes_without_changes():
+    assert compute_composition_changes(COMPOSITIONS.iloc[:1]).empty
+    assert compute_composition_changes(COMPOSITIONS.iloc[1:3]).empty
+
+
+def test_rebuild(db):
+    tickers = sorted(set(COMPOSITIONS.explode()))
+    ticker_ids = {ticker: ticker_id for ticker_id, ticker in enumerate(tickers, start=1)}
+    with atomic_session() as session:
+        session.execute(
+            insert(Ticker), [{'ticker_id': i, 'ticker': t} for t, i in ticker_ids.items()]
+        )
+        session.execute(
+            insert(IndexConstituents),
+            [
+                {
+                    'date': str(date.date()),
+                    'ticker_id': ticker_ids[ticker],
+                    'source': 'yfinance',
+                    'index_name': 'equiwix',
+                }
+                for date, composition in COMPOSITIONS.items()
+                for ticker in composition
+            ],
+        )
+        dao = IndexCompositionChangeDAO('yfinance')
+        dao.rebuild(session, '2024-12-23')
+        # The changes of the first rebuilt date are relative to the date before it
+        dao.rebuild(session, '2024-12-27')
+
+    session = get_session()
+    changes = IndexCompositionChangeDAO('yfinance').get(session)
+    session.close()
+    expected = EXPECTED_CHANGES.assign(date=EXPECTED_CHANGES['date'].dt.strftime('%Y-%m-%d'))
+    pd.testing.assert_frame_equal(
+        changes, expected.sort_values(['date', 'change', 'ticker'], ignore_index=True)
+    )
+
+
+def test_computed_in_two_ranges(market, days):
+    """Syncs over consecutive ranges persist the changes of a sync over the whole range."""
+    YFinanceIndexConstituentsComputer(days[29], days[0]).sync()
+    YFinanceIndexConstituentsComputer(days[-1], days[30]).sync()
+    changes = read_table(IndexCompositionChange)
+
+    clear(IndexCompositionChange)
+    with atomic_session() as session:
+        IndexCompositionChangeDAO('yfinance').rebuild(session, days[0])
+    pd.testing.assert_frame_equal(changes, read_table(IndexCompositionChange))
+
+    # Including the changes of the first date of the second range, relative to the date before
+    expected = compute_composition_changes(read_table(IndexConstituents), ticker_col='ticker_id')
+    columns = ['date', 'ticker_id', 'change']
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(
+        changes[columns].sort_values(columns, ignore_index=True),
+        expected[columns].sort_values(columns, ignore_index=True),
+    )
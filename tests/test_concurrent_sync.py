@@ -0,0 +1,102 @@
+"""Tests of the concurrent, batched ticker data sync against a local fake provider."""
+
+import logging
+import time
+
+import pytest
+from sqlalchemy import select
+
+from equiwix.data_ingestion.yfinance_sync import YFinanceDataSync
+from equiwix.db import get_session
+from equiwix.db.tables import Ticker, YFinanceTickerData
+from equiwix.ticker_univ import TickerUniv
+from fake_provider import FakeProvider
+
+START_DATE, END_DATE = '2024-05-01', '2024-05-31'
+TICKERS = [f'T{i:03d}' for i in range(20)]
+BATCH_SIZE = 5
+
+# Spread over the batches
+FAILING = {'T003', 'T011'}
+
+# High enough for the transient failures to never exhaust the retries of a call
+MAX_RETRIES = 10
+
+
+class RecordingProvider(FakeProvider):
+    """Fake provider recording the tickers of its history calls."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.history_calls = []
+
+    def history(self, tickers, start, end):
+        self.history_calls.append(tuple(tickers))
+        return super().history(tickers, start, end)
+
+
+@pytest.fixture
+def universe(db):
+    TickerUniv().add(TICKERS)
+    # Retries and failed fetches are expected
+    logging.disable(logging.ERROR)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+def get_synced_tickers():
+    session = get_session()
+    qry = (
+        select(Ticker.ticker)
+        .join(YFinanceTickerData, YFinanceTickerData.ticker_id == Ticker.ticker_id)
+        .distinct()
+    )
+    tickers = set(session.execute(qry).scalars())
+    session.close()
+    return tickers
+
+
+def run_sync(provider, workers, batch_size):
+    """Run a sync of the range from `provider`, and return it along with its duration."""
+    sync = YFinanceDataSync(
+        END_DATE,
+        START_DATE,
+        write_mode='upsert',
+        workers=workers,
+        batch_size=batch_size,
+        max_retries=MAX_RETRIES,
+        retry_backoff=0.001,
+        provider=provider,
+    )
+    start = time.perf_counter()
+    sync.sync()
+    return sync, time.perf_counter() - start
+
+
+def test_failures(universe):
+    provider = RecordingProvider(failure_rate=0.25, failing_tickers=FAILING)
+    sync, _ = run_sync(provider, workers=4, batch_size=BATCH_SIZE)
+
+    assert get_synced_tickers() == set(TICKERS) - FAILING
+    assert sync.failed_tickers == FAILING
+
+    # The failed batches are fetched again per ticker, and the failing tickers retried
+    single_calls = [call[0] for call in provider.history_calls if len(call) == 1]
+    batches = [TICKERS[i : i + BATCH_SIZE] for i in range(0, len(TICKERS), BATCH_SIZE)]
+    failed_batches = [batch for batch in batches if FAILING.intersection(batch)]
+    fallback_tickers = {ticker for batch in failed_batches for ticker in batch}
+    assert fallback_tickers <= set(single_calls)
+    assert all(single_calls.count(ticker) == MAX_RETRIES + 1 for ticker in FAILING)
+
+    # Transient failures retried
+    assert provider.num_calls['shares_outstanding'] > len(TICKERS) - len(FAILING)
+
+
+def test_scaling(universe):
+    # One call per ticker, so that the fetches dominate
+    _, single = run_sync(FakeProvider(latency=0.02), workers=1, batch_size=1)
+    _, concurrent = run_sync(FakeProvider(latency=0.02), workers=8, batch_size=1)
+
+    # Well below the number of workers, not to be flaky on loaded machines
+    assert single / concurrent >= 2
+    assert get_synced_tickers() == set(TICKERS)
@@ -0,0 +1,115 @@
+"""Tests of the interval encoding of the index constituents."""
+
+import pandas as pd
+import pytest
+from sqlalchemy import insert
+
+from equiwix.db import atomic_session, get_session
+from equiwix.db.tables import IndexConstituentInterval, IndexConstituents
+from equiwix.index_engine.constituent_intervals import IndexConstituentIntervalDAO
+from equiwix.index_engine.yfinance_computer import YFinanceIndexConstituentsComputer
+from equiwix.util import EQUIWIX_END_OF_TIME
+from helpers import clear, read_table
+
+END_OF_TIME = str(EQUIWIX_END_OF_TIME)
+
+# Ticker ids of the constituents per date
+COMPOSITIONS = {
+    '2024-12-23': [1, 2],
+    '2024-12-24': [1, 3],
+    '2024-12-26': [1, 3],
+    '2024-12-27': [2, 3],
+}
+
+
+def write_constituents(compositions):
+    rows = [
+        {'date': date, 'ticker_id': ticker_id, 'source': 'yfinance', 'index_name': 'equiwix'}
+        for date, ticker_ids in compositions.items()
+        for ticker_id in ticker_ids
+    ]
+    with atomic_session() as session:
+        session.execute(insert(IndexConstituents), rows)
+
+
+def rebuild(from_date):
+    with atomic_session() as session:
+        IndexConstituentIntervalDAO('yfinance').rebuild(session, from_date)
+
+
+def get_intervals():
+    return read_table(IndexConstituentInterval)[['ticker_id', 'start_date', 'end_date']]
+
+
+def get_constituents(dates):
+    session = get_session()
+    constituents = IndexConstituentIntervalDAO('yfinance').get_constituents(session, dates)
+    session.close()
+    return constituents
+
+
+def test_rebuild(db):
+    write_constituents(COMPOSITIONS)
+    rebuild('2024-12-23')
+
+    expected = pd.DataFrame(
+        [
+            (1, '2024-12-23', '2024-12-27'),
+            (2, '2024-12-23', '2024-12-24'),
+            (2, '2024-12-27', END_OF_TIME),
+            (3, '2024-12-24', END_OF_TIME),
+        ],
+        columns=['ticker_id', 'start_date', 'end_date'],
+    )
+    pd.testing.assert_frame_equal(get_intervals(), expected)
+
+
+def test_rebuild_from_date(db):
+    """A rebuild from a date keeps the memberships before it, and extends or closes open ones."""
+    write_constituents(COMPOSITIONS)
+    rebuild('2024-12-23')
+    write_constituents({'2024-12-30': [2, 4], '2024-12-31': [2, 3]})
+    rebuild('2024-12-30')
+    intervals = get_intervals()
+
+    clear(IndexConstituentInterval)
+    rebuild('2024-12-23')
+    pd.testing.assert_frame_equal(intervals, get_intervals())
+    assert (intervals['start_date'] == '2024-12-27').sum() == 1
+
+
+@pytest.mark.parametrize(
+    'dates',
+    [
+        list(COMPOSITIONS),
+        ['2024-12-24'],
+        # Before the first date
+        ['2024-12-20', '2024-12-26'],
+    ],
+)
+def test_get_constituents(db, dates):
+    write_constituents(COMPOSITIONS)
+    rebuild('2024-12-23')
+
+    expected = pd.DataFrame(
+        [(date, ticker_id) for date in dates for ticker_id in COMPOSITIONS.get(date, [])],
+        columns=['date', 'ticker_id'],
+    )
+    constituents = get_constituents(dates)
+    pd.testing.assert_frame_equal(constituents, expected, check_dtype=False)
+
+
+def test_computed_in_two_ranges(market, days):
+    """Syncs over consecutive ranges give the intervals of a sync over the whole range."""
+    YFinanceIndexConstituentsComputer(days[29], days[0]).sync()
+    YFinanceIndexConstituentsComputer(days[-1], days[30]).sync()
+    intervals = get_intervals()
+    constituents = read_table(IndexConstituents)
+
+    clear(IndexConstituentInterval)
+    rebuild(days[0])
+    pd.testing.assert_frame_equal(intervals, get_intervals())
+
+    # And they encode the per-day rows
+    decoded = get_constituents(sorted(constituents['date'].unique()))
+    pd.testing.assert_frame_equal(decoded, constituents[['date', 'ticker_id']])
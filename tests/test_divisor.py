@@ -0,0 +1,82 @@
+"""Tests of the divisor timeline and of the recomputation of the levels it applies to."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from equiwix.db.tables import IndexLevel
+from equiwix.index_engine.divisor import IndexLevelDivisorDAO
+from equiwix.index_engine.yfinance_computer import (YFinanceIndexConstituentsComputer,
+                                                    YFinanceIndexLevelComputer)
+from equiwix.util import EQUIWIX_END_OF_TIME, EQUIWIX_START_OF_TIME
+from helpers import read_table
+
+LEVEL_TYPES = ['open', 'high', 'low', 'close']
+
+
+@pytest.fixture
+def levels(market, days):
+    """Levels of the default index computed with a divisor of 1."""
+    YFinanceIndexConstituentsComputer(days[-1], days[0]).sync()
+    YFinanceIndexLevelComputer(days[-1], days[0]).sync()
+    return read_table(IndexLevel).set_index('date')[LEVEL_TYPES]
+
+
+def get_divisors(levels):
+    """Return the divisors applied to the current levels, relative to the `levels` ones."""
+    current = read_table(IndexLevel).set_index('date')[LEVEL_TYPES]
+    ratios = levels / current
+    # All the levels of a date share its divisor
+    assert np.allclose(ratios.to_numpy(), ratios[['close']].to_numpy())
+    return ratios['close'].round(9)
+
+
+def test_timeline(db):
+    dao = IndexLevelDivisorDAO('yfinance')
+    dao.set(1.0, '2024-01-02')
+    dao.set(4.0, '2024-03-01')
+    # Replaces the divisor set from the same date, and ends where the next one starts
+    dao.set(3.0, '2024-02-01')
+    dao.set(2.0, '2024-02-01')
+
+    expected = pd.DataFrame(
+        {
+            'start_date': [str(EQUIWIX_START_OF_TIME), '2024-02-01', '2024-03-01'],
+            'end_date': ['2024-02-01', '2024-03-01', str(EQUIWIX_END_OF_TIME)],
+            'divisor': [1.0, 2.0, 4.0],
+        }
+    )
+    pd.testing.assert_frame_equal(dao.get_timeline(), expected)
+    assert [dao.get(date) for date in ('2023-06-01', '2024-02-29', '2024-03-01')] == [1, 2, 4]
+
+
+def test_recompute_levels(levels, days):
+    dao = IndexLevelDivisorDAO('yfinance')
+    level_days = levels.index.to_numpy()
+
+    dao.set(2.0, days[30])
+    dao.recompute_levels(days[30])
+    expected = pd.Series(np.where(level_days < days[30], 1.0, 2.0), index=levels.index)
+    pd.testing.assert_series_equal(get_divisors(levels), expected, check_names=False)
+
+    # Only the dates of the new divisor are recomputed, until the start of the next one
+    dao.set(4.0, days[40])
+    dao.recompute_levels(days[40])
+    dao.set(3.0, days[35])
+    dao.recompute_levels(days[35])
+    expected = pd.Series(
+        np.select(
+            [level_days < days[30], level_days < days[35], level_days < days[40]],
+            [1.0, 2.0, 3.0],
+            4.0,
+        ),
+        index=levels.index,
+    )
+    pd.testing.assert_series_equal(get_divisors(levels), expected, check_names=False)
+
+
+def test_recompute_levels_without_levels(market, days):
+    dao = IndexLevelDivisorDAO('yfinance')
+    dao.set(2.0, days[30])
+    dao.recompute_levels(days[30])
+    assert read_table(IndexLevel).empty
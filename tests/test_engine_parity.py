@@ -0,0 +1,63 @@
+"""Tests of the parity of the NumPy index engine with the SQL computers."""
+
+import pandas as pd
+import pytest
+
+from equiwix.db.tables import (IndexCompositionChange, IndexConstituentInterval,
+                               IndexConstituents, IndexLevel)
+from equiwix.index_engine.constants import DEFAULT_INDEX
+from equiwix.index_engine.definitions import INDEX_DEFINITIONS, IndexDefinition, register_index
+from equiwix.index_engine.divisor import IndexLevelDivisorDAO
+from equiwix.index_engine.numpy_computer import (YFinanceNumpyIndexConstituentsComputer,
+                                                 YFinanceNumpyIndexLevelComputer)
+from equiwix.index_engine.yfinance_computer import (YFinanceIndexConstituentsComputer,
+                                                    YFinanceIndexLevelComputer)
+from helpers import clear, read_table
+from synthetic_market import SYNTHETIC_UNIVERSE
+
+CONSTITUENT_TABLES = (IndexConstituents, IndexConstituentInterval, IndexCompositionChange)
+
+
+@pytest.fixture
+def index_names(market, days):
+    """
+    Names of the computed indexes: the default one, whose divisor changes within the market, and a
+    market cap weighted one of the synthetic universe.
+    """
+    IndexLevelDivisorDAO('yfinance').set(2.0, days[30])
+    definition = register_index(
+        IndexDefinition('equiwix50', 50, universe=SYNTHETIC_UNIVERSE, weighting='market_cap')
+    )
+    IndexLevelDivisorDAO('yfinance', definition.name).set(1e9, days[0])
+    yield [DEFAULT_INDEX, definition.name]
+    del INDEX_DEFINITIONS[definition.name]
+
+
+def test_constituents(index_names, days):
+    YFinanceIndexConstituentsComputer(days[-1], days[0]).sync()
+    expected = {table: read_table(table) for table in CONSTITUENT_TABLES}
+    clear(*CONSTITUENT_TABLES)
+
+    YFinanceNumpyIndexConstituentsComputer(days[-1], days[0]).sync()
+
+    constituents = expected[IndexConstituents]
+    assert set(constituents['index_name']) == set(index_names)
+    # Dated the trading day after their market caps, with some churn
+    assert constituents['date'].min() == days[1]
+    assert constituents['date'].nunique() == len(days)
+    assert len(expected[IndexCompositionChange]) > 0
+    for table in CONSTITUENT_TABLES:
+        pd.testing.assert_frame_equal(read_table(table), expected[table])
+
+
+def test_levels(index_names, days):
+    YFinanceIndexConstituentsComputer(days[-1], days[0]).sync()
+    YFinanceIndexLevelComputer(days[-1], days[0]).sync()
+    expected = read_table(IndexLevel)
+    clear(IndexLevel)
+
+    YFinanceNumpyIndexLevelComputer(days[-1], days[0]).sync()
+
+    # Every day with constituents and bars, i.e. but the first one
+    assert len(expected) == len(index_names) * (len(days) - 1)
+    pd.testing.assert_frame_equal(read_table(IndexLevel), expected, check_exact=False, rtol=1e-9)
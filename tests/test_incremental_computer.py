@@ -0,0 +1,49 @@
+"""Tests of the constituent intervals and composition changes appended by the daily runs."""
+
+import pandas as pd
+
+from equiwix.db import atomic_session
+from equiwix.db.tables import IndexCompositionChange, IndexConstituentInterval, IndexConstituents
+from equiwix.index_engine.composition_changes import IndexCompositionChangeDAO
+from equiwix.index_engine.constituent_intervals import IndexConstituentIntervalDAO
+from equiwix.index_engine.incremental_computer import YFinanceIncrementalIndexComputer
+from equiwix.index_engine.yfinance_computer import (YFinanceIndexConstituentsComputer,
+                                                    YFinanceIndexLevelComputer)
+from helpers import clear, read_table
+
+
+def assert_rebuilt(days):
+    """Check the intervals and changes against their rebuild out of the constituents."""
+    intervals = read_table(IndexConstituentInterval)
+    changes = read_table(IndexCompositionChange)
+
+    clear(IndexConstituentInterval, IndexCompositionChange)
+    with atomic_session() as session:
+        IndexConstituentIntervalDAO('yfinance').rebuild(session, days[0])
+        IndexCompositionChangeDAO('yfinance').rebuild(session, days[0])
+    pd.testing.assert_frame_equal(intervals, read_table(IndexConstituentInterval))
+    pd.testing.assert_frame_equal(changes, read_table(IndexCompositionChange))
+
+
+def test_daily_runs(market, days):
+    YFinanceIndexConstituentsComputer(days[39], days[0]).sync()
+    YFinanceIndexLevelComputer(days[39], days[0]).sync()
+    for date in days[40:]:
+        YFinanceIncrementalIndexComputer(date).sync()
+
+    # Constituents up to the day after the last run
+    assert read_table(IndexConstituents)['date'].nunique() == len(days)
+    changes = read_table(IndexCompositionChange)
+    assert (changes['date'] > days[40]).any()
+    assert_rebuilt(days)
+
+
+def test_rerun_of_past_date(market, days):
+    YFinanceIndexConstituentsComputer(days[49], days[0]).sync()
+    YFinanceIndexLevelComputer(days[49], days[0]).sync()
+    for date in days[50:]:
+        YFinanceIncrementalIndexComputer(date).sync()
+
+    # Rebuilds rather than appends, as later dates were already run
+    YFinanceIncrementalIndexComputer(days[52], write_mode='upsert').sync()
+    assert_rebuilt(days)
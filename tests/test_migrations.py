@@ -0,0 +1,161 @@
+"""Tests of the migrations of the DBs created by older versions of equiwix."""
+
+import sqlite3
+
+import pytest
+
+from equiwix.db import migrate_db
+from equiwix.db.migrations import (MIGRATIONS, add_ticker_data_sources,
+                                   allow_unknown_shares_outstanding, build_shares_outstanding,
+                                   drop_index_state_levels)
+from equiwix.db.tables import IndexState, YFinanceTickerData
+
+# yfinance_ticker_data before allow_unknown_shares_outstanding, without its source column
+# before add_ticker_data_sources
+LEGACY_TICKER_DATA = """
+CREATE TABLE yfinance_ticker_data (
+    ticker_id INTEGER NOT NULL, datetime_utc TEXT NOT NULL, {source} date TEXT, open REAL,
+    high REAL, low REAL, close REAL, num_shares_outstanding INTEGER NOT NULL,
+    PRIMARY KEY (ticker_id, datetime_utc {source_key})
+) WITHOUT ROWID
+"""
+
+
+def execute(db, *statements):
+    """Run `statements` on the DB at `db` and return the rows of the last one."""
+    conn = sqlite3.connect(db)
+    try:
+        for statement in statements:
+            rows = conn.execute(statement).fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+    return rows
+
+
+def get_columns(db, table):
+    return [row[1] for row in execute(db, f'PRAGMA table_info({table.__tablename__})')]
+
+
+def rollback_to(db, migration, *statements):
+    """Give the DB the schema of `statements` and the version before `migration`."""
+    execute(db, *statements, f'PRAGMA user_version = {MIGRATIONS.index(migration)}')
+
+
+def replace_ticker_data(db, migration, with_source):
+    rollback_to(
+        db,
+        migration,
+        'DROP INDEX ix_yfinance_ticker_data_date_ticker',
+        'DROP TABLE yfinance_ticker_data',
+        LEGACY_TICKER_DATA.format(
+            source='source VARCHAR(20) NOT NULL,' if with_source else '',
+            source_key=', source' if with_source else '',
+        ),
+    )
+
+
+def test_fresh_db_at_last_version(db):
+    assert execute(db, 'PRAGMA user_version') == [(len(MIGRATIONS),)]
+
+    # Nothing left to apply
+    migrate_db()
+    assert execute(db, 'PRAGMA user_version') == [(len(MIGRATIONS),)]
+
+
+def test_add_ticker_data_sources(db):
+    replace_ticker_data(db, add_ticker_data_sources, with_source=False)
+    execute(
+        db,
+        "INSERT INTO yfinance_ticker_data VALUES "
+        "(1, '2024-12-30 05:00:00', '2024-12-30', 1.0, 2.0, 0.5, 1.5, 10)",
+    )
+
+    migrate_db()
+
+    assert get_columns(db, YFinanceTickerData) == [
+        c.name for c in YFinanceTickerData.__table__.columns
+    ]
+    rows = execute(db, 'SELECT ticker_id, source, date, close FROM yfinance_ticker_data')
+    assert rows == [(1, 'yfinance', '2024-12-30', 1.5)]
+    # The same bar from another provider is a row of its own
+    execute(
+        db,
+        "INSERT INTO yfinance_ticker_data (ticker_id, datetime_utc, source, date, close) "
+        "VALUES (1, '2024-12-30 05:00:00', 'file', '2024-12-30', 1.6)",
+    )
+    # And the date index is back
+    indexes = execute(db, "PRAGMA index_list(yfinance_ticker_data)")
+    assert 'ix_yfinance_ticker_data_date_ticker' in {row[1] for row in indexes}
+
+
+def test_allow_unknown_shares_outstanding(db):
+    replace_ticker_data(db, allow_unknown_shares_outstanding, with_source=True)
+    with pytest.raises(sqlite3.IntegrityError):
+        execute(
+            db,
+            "INSERT INTO yfinance_ticker_data (ticker_id, datetime_utc, source) "
+            "VALUES (1, '2024-12-30 05:00:00', 'yfinance')",
+        )
+
+    migrate_db()
+
+    execute(
+        db,
+        "INSERT INTO yfinance_ticker_data (ticker_id, datetime_utc, source) "
+        "VALUES (1, '2024-12-30 05:00:00', 'yfinance')",
+    )
+    assert execute(db, 'SELECT num_shares_outstanding FROM yfinance_ticker_data') == [(None,)]
+
+
+def test_build_shares_outstanding(db):
+    bars = [
+        (1, '2024-12-26', 10),
+        (1, '2024-12-27', 10),
+        (1, '2024-12-30', 20),
+        (1, '2024-12-31', 10),
+        (2, '2024-12-30', 5),
+    ]
+    rollback_to(
+        db,
+        build_shares_outstanding,
+        *[
+            "INSERT INTO yfinance_ticker_data (ticker_id, datetime_utc, source, date, "
+            f"num_shares_outstanding) VALUES ({ticker_id}, '{date} 05:00:00', 'yfinance', "
+            f"'{date}', {shares})"
+            for ticker_id, date, shares in bars
+        ],
+    )
+
+    migrate_db()
+
+    # One row per change of value, refetched by the next sync
+    rows = execute(
+        db,
+        'SELECT ticker_id, start_date, num_shares_outstanding, fetched_at_utc '
+        'FROM shares_outstanding ORDER BY ticker_id, start_date',
+    )
+    assert rows == [
+        (1, '2024-12-26', 10, '1970-01-01 00:00:00'),
+        (1, '2024-12-30', 20, '1970-01-01 00:00:00'),
+        (1, '2024-12-31', 10, '1970-01-01 00:00:00'),
+        (2, '2024-12-30', 5, '1970-01-01 00:00:00'),
+    ]
+
+
+def test_drop_index_state_levels(db):
+    rollback_to(
+        db,
+        drop_index_state_levels,
+        'ALTER TABLE index_state ADD COLUMN level_datetime_utc TEXT',
+        'ALTER TABLE index_state ADD COLUMN level_close REAL',
+        "INSERT INTO index_state VALUES "
+        "('yfinance', 'equiwix', '2024-12-31', '1,2,3', '2024-12-30 05:00:00', 1.5)",
+    )
+
+    migrate_db()
+
+    assert get_columns(db, IndexState) == [c.name for c in IndexState.__table__.columns]
+    assert execute(db, 'SELECT * FROM index_state') == [
+        ('yfinance', 'equiwix', '2024-12-31', '1,2,3')
+    ]
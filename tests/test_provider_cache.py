@@ -0,0 +1,150 @@
+"""Tests of the on-disk provider cache against a local fake provider."""
+
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from equiwix.data_ingestion.provider_cache import CachedProvider
+from equiwix.data_ingestion.providers import FileProvider
+from equiwix.util import Date
+from fake_provider import FakeProvider
+
+TICKERS = ['AAA', 'BBB', 'CCC']
+
+# Closed range, whose bars are cached
+START, END = Date('2024-01-01'), Date('2024-03-01')
+
+
+class DroppingProvider(FakeProvider):
+    """Fake provider omitting `dropped` from its next response, like a throttled batch download."""
+
+    def __init__(self, dropped):
+        super().__init__()
+        self.dropped = set(dropped)
+
+    def history(self, tickers, start, end):
+        result = super().history(tickers, start, end)
+        for ticker in self.dropped:
+            result.pop(ticker, None)
+        self.dropped = set()
+        return result
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / 'provider_cache')
+
+
+def assert_same_bars(a, b):
+    assert a.keys() == b.keys()
+    for ticker in a:
+        pd.testing.assert_frame_equal(a[ticker], b[ticker])
+
+
+def test_hits_and_misses(root):
+    provider = FakeProvider()
+    cache = CachedProvider(provider, root=root)
+
+    first = cache.history(TICKERS, START, END)
+    second = cache.history(TICKERS, START, END)
+
+    stats = cache.stats()
+    assert stats['misses'] == stats['hits'] == len(TICKERS)
+    assert stats['hit_rate'] == 0.5
+    assert stats['files'] == len(TICKERS)
+    # Hits served without a provider call
+    assert provider.num_calls['history'] == 1
+    assert_same_bars(first, second)
+
+
+def test_open_range(root):
+    provider = FakeProvider()
+    cache = CachedProvider(provider, root=root)
+
+    today = Date(pd.Timestamp.now('America/New_York'))
+    start = today - pd.Timedelta(days=30)
+    for _ in range(2):
+        cache.history(TICKERS, start, today + pd.Timedelta(days=1))
+
+    # Always fetched, and never written
+    stats = cache.stats()
+    assert stats['bypassed'] == 2 * len(TICKERS)
+    assert provider.num_calls['history'] == 2
+    assert stats['files'] == stats['hits'] == stats['misses'] == 0
+
+
+def test_missing_tickers(root):
+    provider = DroppingProvider(dropped=['BBB'])
+    cache = CachedProvider(provider, root=root)
+
+    assert 'BBB' not in cache.history(TICKERS, START, END)
+    assert cache.stats()['files'] == len(TICKERS) - 1
+
+    # Refetched, then cached
+    assert 'BBB' in cache.history(TICKERS, START, END)
+    assert provider.num_calls['history'] == 2
+    assert cache.history(TICKERS, START, END).keys() == set(TICKERS)
+    assert provider.num_calls['history'] == 2
+
+
+def test_eviction(root):
+    provider = FakeProvider()
+    cache = CachedProvider(provider, root=root)
+
+    for ticker in TICKERS:
+        cache.history([ticker], START, END)
+        # The eviction orders the files by modification time
+        time.sleep(0.05)
+    # AAA becomes the most recently used file, BBB the least recently used one
+    cache.history(['AAA'], START, END)
+
+    paths = {ticker: cache._get_path(ticker, START, END) for ticker in TICKERS}
+    cache.max_bytes = os.path.getsize(paths['AAA']) + os.path.getsize(paths['CCC'])
+    cache.evict()
+    assert {ticker for ticker, path in paths.items() if os.path.exists(path)} == {'AAA', 'CCC'}
+
+    cache.history(TICKERS, START, END)
+    stats = cache.stats()
+    assert stats['evictions'] >= 1
+    # Only the evicted ticker fetched again
+    assert provider.num_calls['history'] == 4
+    assert stats['bytes'] <= cache.max_bytes
+
+
+def write_dump(root, close):
+    """Write a dump of the bars of `TICKERS` in the closed range, all closing at `close`."""
+    os.makedirs(root, exist_ok=True)
+    dates = pd.bdate_range(START, END - pd.Timedelta(days=1))
+    pd.DataFrame(
+        [(ticker, date, close, close, close, close) for ticker in TICKERS for date in dates],
+        columns=['ticker', 'date', 'open', 'high', 'low', 'close'],
+    ).to_csv(os.path.join(root, 'dump.csv'), index=False)
+
+
+def get_close(bars):
+    return {hist['Close'].iloc[0] for hist in bars.values()}
+
+
+def test_file_dumps(root, tmp_path):
+    dump_a, dump_b = str(tmp_path / 'a'), str(tmp_path / 'b')
+    write_dump(dump_a, 1.0)
+    write_dump(dump_b, 2.0)
+
+    cache_a = CachedProvider(FileProvider(dump_a), root=root)
+    assert get_close(cache_a.history(TICKERS, START, END)) == {1.0}
+    assert get_close(cache_a.history(TICKERS, START, END)) == {1.0}
+    assert cache_a.stats()['hits'] == len(TICKERS)
+
+    # Other dump dirs aren't served the cached bars
+    cache_b = CachedProvider(FileProvider(dump_b), root=root)
+    assert get_close(cache_b.history(TICKERS, START, END)) == {2.0}
+    assert cache_b.stats()['hits'] == 0
+
+    # Neither are updated dumps, newer than the cached bars
+    time.sleep(0.05)
+    write_dump(dump_a, 3.0)
+    updated = CachedProvider(FileProvider(dump_a), root=root)
+    assert get_close(updated.history(TICKERS, START, END)) == {3.0}
+    assert updated.stats()['hits'] == 0
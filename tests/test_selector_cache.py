@@ -0,0 +1,98 @@
+"""Tests of the cache of the selector results and of its invalidation by the syncs."""
+
+import pandas as pd
+import pytest
+
+from equiwix.index_engine.divisor import IndexLevelDivisorDAO
+from equiwix.index_engine.selectors import (IndexConstituentsDateSelector,
+                                            IndexLevelDateSelector, SelectorCache)
+from equiwix.index_engine.yfinance_computer import (YFinanceIndexConstituentsComputer,
+                                                    YFinanceIndexLevelComputer)
+
+
+@pytest.fixture
+def computed(market, days):
+    """Constituents and levels of the first half of the market."""
+    YFinanceIndexConstituentsComputer(days[29], days[0]).sync()
+    YFinanceIndexLevelComputer(days[29], days[0]).sync()
+
+
+def select(selector, dates):
+    """Return the result of `selector` for `dates`, along with the same selection uncached."""
+    uncached = type(selector)('yfinance', cache=None)
+    return selector.select(dates), uncached.select(dates)
+
+
+def test_hits(computed, days):
+    cache = SelectorCache()
+    selector = IndexLevelDateSelector('yfinance', cache=cache)
+
+    selections = [
+        (f'{days[5]}:{days[20]}', 'misses'),
+        (f'{days[5]}:{days[20]}', 'hits'),
+        # Within the cached range
+        (f'{days[10]}:{days[15]}', 'hits'),
+        (f'{days[0]}:{days[20]}', 'misses'),
+    ]
+    for dates, counter in selections:
+        stats = cache.stats()
+        result, expected = select(selector, dates)
+        pd.testing.assert_frame_equal(result, expected)
+        assert cache.stats()[counter] == stats[counter] + 1
+
+
+def test_results_copied(computed, days):
+    selector = IndexLevelDateSelector('yfinance', cache=SelectorCache())
+    result = selector.select(f'{days[5]}:{days[20]}')
+    result['close'] = 0.0
+
+    assert (selector.select(f'{days[5]}:{days[20]}')['close'] > 0).all()
+
+
+def test_invalidated_by_level_syncs(computed, days):
+    cache = SelectorCache()
+    selector = IndexLevelDateSelector('yfinance', cache=cache)
+    dates = f'{days[0]}:{days[-1]}'
+    before = selector.select(dates)
+
+    dao = IndexLevelDivisorDAO('yfinance')
+    dao.set(2.0, days[10])
+    dao.recompute_levels(days[10])
+
+    misses = cache.stats()['misses']
+    result, expected = select(selector, dates)
+    assert cache.stats()['misses'] == misses + 1
+    pd.testing.assert_frame_equal(result, expected)
+    assert (result['close'].iloc[10:] < before['close'].iloc[10:]).all()
+
+
+def test_invalidated_by_constituent_syncs(computed, days):
+    cache = SelectorCache()
+    selector = IndexConstituentsDateSelector('yfinance', cache=cache)
+    dates = f'{days[0]}:{days[-1]}'
+    before = selector.select(dates)
+
+    YFinanceIndexConstituentsComputer(days[-1], days[30]).sync()
+
+    result, expected = select(selector, dates)
+    pd.testing.assert_series_equal(result, expected)
+    assert len(before) == 30
+    assert len(result) == len(days) - 1
+
+
+def test_eviction(computed, days):
+    cache = SelectorCache(max_entries=2)
+    selector = IndexLevelDateSelector('yfinance', cache=cache)
+    for i in range(3):
+        selector.select(f'{days[i * 10]}:{days[i * 10 + 5]}')
+    assert cache.stats()['entries'] == 2
+
+    # The least recently used entry was evicted
+    misses = cache.stats()['misses']
+    selector.select(f'{days[0]}:{days[5]}')
+    assert cache.stats()['misses'] == misses + 1
+
+    # Results larger than the cache aren't kept
+    cache = SelectorCache(max_bytes=1)
+    IndexLevelDateSelector('yfinance', cache=cache).select(f'{days[0]}:{days[5]}')
+    assert cache.stats()['entries'] == 0
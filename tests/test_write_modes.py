@@ -0,0 +1,117 @@
+"""Tests of the write modes of the syncs on rows already in their table."""
+
+import pandas as pd
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from equiwix.base_sync import DataFrameSync
+from equiwix.db import atomic_session, get_session
+from equiwix.db.tables import IndexConstituents, YFinanceTickerData
+
+
+class FrameSync(DataFrameSync):
+    """Sync of the rows of a DataFrame into `table`."""
+
+    def __init__(self, table, data, write_mode):
+        super().__init__('2024-12-31', '2024-12-30', write_mode=write_mode)
+        self._table = table
+        self.data = data
+
+    @property
+    def table(self):
+        return self._table
+
+    def get_data_to_sync(self):
+        return self.data
+
+
+@pytest.fixture
+def bars(db):
+    """Bars already synced into the ticker data table."""
+    bars = pd.DataFrame(
+        {
+            'ticker_id': [1, 2, 3],
+            'datetime_utc': ['2024-12-30 05:00:00'] * 3,
+            'source': 'yfinance',
+            'date': ['2024-12-30'] * 3,
+            'close': [10.0, 20.0, 30.0],
+            'num_shares_outstanding': [100, 200, 300],
+        }
+    )
+    FrameSync(YFinanceTickerData, bars, 'insert').sync()
+    return bars
+
+
+@pytest.fixture
+def num_updates(db):
+    """Return the number of rows of the ticker data table updated since the fixture set up."""
+    with atomic_session() as session:
+        conn = session.connection()
+        conn.exec_driver_sql('CREATE TABLE updated_bars (ticker_id INTEGER)')
+        conn.exec_driver_sql(
+            'CREATE TRIGGER count_updates AFTER UPDATE ON yfinance_ticker_data '
+            'BEGIN INSERT INTO updated_bars VALUES (new.ticker_id); END'
+        )
+
+    def get_num_updates():
+        session = get_session()
+        qry = 'SELECT count(*) FROM updated_bars'
+        num_rows = session.connection().exec_driver_sql(qry).scalar()
+        session.close()
+        return num_rows
+
+    return get_num_updates
+
+
+def get_closes():
+    tbl = YFinanceTickerData
+    session = get_session()
+    closes = dict(session.execute(select(tbl.ticker_id, tbl.close)).all())
+    session.close()
+    return closes
+
+
+def test_invalid_write_mode(db):
+    with pytest.raises(ValueError, match='Invalid write_mode'):
+        FrameSync(YFinanceTickerData, pd.DataFrame(), 'replace')
+
+
+def test_insert_fails_on_synced_rows(bars):
+    rerun = bars.assign(close=bars['close'] + 1)
+    with pytest.raises(IntegrityError):
+        FrameSync(YFinanceTickerData, rerun, 'insert').sync()
+
+    # Nothing written
+    assert get_closes() == {1: 10.0, 2: 20.0, 3: 30.0}
+
+
+@pytest.mark.parametrize('write_mode, expected_updates', [('upsert', 3), ('upsert_changed', 1)])
+def test_upsert(bars, num_updates, write_mode, expected_updates):
+    new_bar = bars.iloc[[0]].assign(ticker_id=4, close=40.0)
+    rerun = pd.concat([bars.assign(close=[10.0, 21.0, 30.0]), new_bar])
+
+    FrameSync(YFinanceTickerData, rerun, write_mode).sync()
+
+    assert get_closes() == {1: 10.0, 2: 21.0, 3: 30.0, 4: 40.0}
+    # upsert_changed leaves the unchanged rows alone
+    assert num_updates() == expected_updates
+
+
+def test_upsert_primary_key_only_table(db):
+    """Tables without any column to update skip the conflicting rows."""
+    constituents = pd.DataFrame(
+        {
+            'date': ['2024-12-30', '2024-12-30'],
+            'ticker_id': [1, 2],
+            'source': 'yfinance',
+            'index_name': 'equiwix',
+        }
+    )
+    FrameSync(IndexConstituents, constituents.iloc[:1], 'insert').sync()
+    FrameSync(IndexConstituents, constituents, 'upsert').sync()
+
+    session = get_session()
+    ticker_ids = session.execute(select(IndexConstituents.ticker_id)).scalars().all()
+    session.close()
+    assert sorted(ticker_ids) == [1, 2]